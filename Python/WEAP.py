@@ -41,6 +41,13 @@ class WEAP():
         eday = self.config.getint('TIMINGS', 'eday')
         self.edate = dt.date(eyear, emonth, eday) #-end date for the reference scenario
         
+        #-stages that write files are skipped if their settings and inputs did not change since the last run
+        from other_functions.stagecache import StageCache
+        if self.config.has_section('STAGE_CACHE'):
+            self.stages = StageCache(self.config.get('STAGE_CACHE', 'stage_cache_file'), self.config, self.config.getint('STAGE_CACHE', 'use_stage_cache'))
+        else:
+            self.stages = StageCache(os.path.join(self.tempDir, 'stage_cache.json'), self.config, False)
+        
         #-Connect to the WEAP API
         self.WEAP=win32com.client.Dispatch('WEAP.WEAPApplication')
         while not self.WEAP.ProgramStarted:
@@ -179,7 +186,8 @@ class WEAP():
             #-check if observed streamflow should be processed
             self.processQobs = self.config.getint('TSPROCESSING', 'processQobs')
             if self.processQobs:
-                get_TS.writeQobs()
+                max_age = self.config.getfloat('STAGE_CACHE', 'Qobs_max_age') if self.config.has_option('STAGE_CACHE', 'Qobs_max_age') else None
+                self.stages.run('Qobs', get_TS.writeQobs, config_keys=['TSPROCESSING'], outputs=[self.config.get('TSPROCESSING', 'Qobs_csv')], max_age=max_age)
                 
                 
     def processLowFlows(self):
@@ -211,8 +219,18 @@ class WEAP():
             #-check if consent data should be extracted from database
             self.get_crc_db = self.config.getint('CONSENTS', 'get_crc_db')
             if self.get_crc_db:
-                from consents.consents import get_CRC_DB
-                self.crc_df, lMessageList = get_CRC_DB(self.config)
+                from consents.consents import get_CRC_DB, get_CRC_CSV
+                #-the messages of the extraction (also printed by get_CRC_DB) are kept; there are none if the outputs of the last run are reused
+                def extract():
+                    self.crc_df, self.lMessageList = get_CRC_DB(self.config)
+                def load():
+                    self.crc_df = get_CRC_CSV(self)
+                    self.lMessageList = []
+                max_age = self.config.getfloat('STAGE_CACHE', 'crc_db_max_age') if self.config.has_option('STAGE_CACHE', 'crc_db_max_age') else None
+                self.stages.run('crc_db', extract, config_keys=['TIMINGS', 'DB_CACHE', ('CONSENTS', 'SWAZS'), ('CONSENTS', 'well_cutoff_depth'), ('CONSENTS', 'incremental')],
+                                inputs=[os.path.join(self.crc_dir, self.config.get('CONSENTS', 'discharge_csv'))],
+                                outputs=[os.path.join(self.crc_dir, self.config.get('CONSENTS', 'crc_csv_out')), os.path.join(self.crc_dir, self.config.get('CONSENTS', 'wapTS_csv_out'))],
+                                load=load, max_age=max_age)
             #-otherwise read data from csv
             else:
                 from consents.consents import get_CRC_CSV
@@ -253,7 +271,22 @@ class WEAP():
             
             #-Write time-series with concent being active (yes/no) and another time-series for the consent/wap combination for each day 
             from consents.consents import crc_wap_active_ts
-            crc_wap_active_ts(self)
+            from consents.activity import interval_file
+            from other_functions.weapcsv import manifest_file, read_manifest
+            def load_active():
+                self.crc_active_csv = os.path.join(self.crc_dir, self.config.get('CONSENTS', 'crc_active_csv'))
+                self.crc_wap_active_csv = os.path.join(self.crc_dir, self.config.get('CONSENTS', 'crc_wap_active_csv'))
+            load_active()
+            def outputs():
+                #-with sharding, the manifests and the shards listed in them are outputs as well
+                files = [self.crc_active_csv, self.crc_wap_active_csv, interval_file(self.crc_active_csv), interval_file(self.crc_wap_active_csv)]
+                if self.config.has_option('CONSENTS', 'active_shard_size') and self.config.getint('CONSENTS', 'active_shard_size') > 0:
+                    for f in [self.crc_active_csv, self.crc_wap_active_csv]:
+                        manifest = read_manifest(f)
+                        files += [manifest_file(f)] + (manifest['files'] if manifest is not None else [])
+                return files
+            self.stages.run('crc_active', lambda: crc_wap_active_ts(self), config_keys=['TIMINGS', ('CONSENTS', 'active_shard_size')],
+                            inputs=[os.path.join(self.crc_dir, self.config.get('CONSENTS', 'crc_csv_out_final'))], outputs=outputs, load=load_active)
             
             #-if user wants to remove WAPs for certain activity, then do so
             self.remove_SW_WAPs = self.config.getint('CONSENTS', 'remove_SW_WAPs')
@@ -297,7 +330,8 @@ class WEAP():
                 print('Trying to reading consents details from csv-file into a dataframe...')
                 self.crc_dir = self.config.get('CONSENTS', 'crc_dir')
                 csv_file = os.path.join(self.crc_dir, self.config.get('CONSENTS', 'crc_csv_out_final'))
-                self.crc_df = pd.read_csv(os.path.join(self.crc_dir, csv_file), parse_dates=[1,2,3,39,40], dayfirst=True)
+                from consents.crctable import read_crc_table
+                self.crc_df = read_crc_table(os.path.join(self.crc_dir, csv_file))
                 print('Consents details successfully read into a pandas dataframe.')
             except:
                 print('Consents details could not be read. Check if "crc_csv_out_final" is specified in the config file.')                
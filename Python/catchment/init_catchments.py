@@ -11,6 +11,7 @@ from simpledbf import Dbf5
 import datetime as dt
 
 from other_functions.reproject import reproject
+from other_functions.weapcsv import format_dates, read_weap_csv
 
 #-Authorship information-###################################################################
 __author__ = 'Wilco Terink'
@@ -178,12 +179,12 @@ def setRiverbedCatchmentProps(WEAP, catch_df, catchmentDir):
     catch_df = None; del catch_df
     
     #-Read kc table from csv file into dataframe
-    kc_df = pd.read_csv(os.path.join(catchmentDir, 'Kc_rb.csv'), parse_dates=True, dayfirst=True, index_col=0)
+    kc_df = read_weap_csv(os.path.join(catchmentDir, 'Kc_rb.csv'))
     #-Calculate average monthly kc
     kc_df_month = kc_df.groupby([kc_df.index.month]).mean()
     kc_df = None; del kc_df
     #-Get the column IDs to loop over and assign values for in WEAP
-    ids = list(pd.read_csv(os.path.join(catchmentDir, 'Precipitation_rb.csv'), parse_dates=True, dayfirst=True, index_col=0).columns.astype(np.int))
+    ids = list(read_weap_csv(os.path.join(catchmentDir, 'Precipitation_rb.csv')).columns.astype(np.int))
     for ID in ids:
         csv_column = ids.index(ID)+1
         s = '\\Demand Sites and Catchments\\RB_Catchment_' + str(ID)
@@ -283,23 +284,23 @@ def postprocessSPHY(config, catchmentDir, catch_df, selSdate, selEdate):
         f = f.loc[selSdate:selEdate]
         #-reset index and re-format Date column to dd/mm/yyyy, otherwise WEAP doesn't understand it. Day first.
         f.reset_index(inplace=True)
-        f['Date'] = f['Date'].dt.strftime('%d/%m/%Y')
+        f['Date'] = format_dates(f['Date'])
         #-Write to csv-file
         f.to_csv(os.path.join(catchmentDir, k + '.csv'), index=False)
 
     #-Create a csv-file for the specific runoff [MCM per day] of the non-riverbed catchment area
-    surface_runoff = pd.read_csv(os.path.join(catchmentDir, 'SurfaceRunoff.csv'),parse_dates=True, dayfirst=True, index_col=0)
-    drainage = pd.read_csv(os.path.join(catchmentDir, 'Drainage.csv'),parse_dates=True, dayfirst=True, index_col=0)
-    snowr = pd.read_csv(os.path.join(catchmentDir, 'SnowRunoff.csv'),parse_dates=True, dayfirst=True, index_col=0)
-    glacr = pd.read_csv(os.path.join(catchmentDir, 'GlacierRunoff.csv'),parse_dates=True, dayfirst=True, index_col=0)
-    basf = pd.read_csv(os.path.join(catchmentDir, 'Baseflow.csv'),parse_dates=True, dayfirst=True, index_col=0)
+    surface_runoff = read_weap_csv(os.path.join(catchmentDir, 'SurfaceRunoff.csv'))
+    drainage = read_weap_csv(os.path.join(catchmentDir, 'Drainage.csv'))
+    snowr = read_weap_csv(os.path.join(catchmentDir, 'SnowRunoff.csv'))
+    glacr = read_weap_csv(os.path.join(catchmentDir, 'GlacierRunoff.csv'))
+    basf = read_weap_csv(os.path.join(catchmentDir, 'Baseflow.csv'))
     Qspec = (surface_runoff + drainage + basf + snowr + glacr) / 1000 #-in m per day
     #-Convert mm/day to MCM/day
     landArea = catch_df[['Land area km2']].transpose() * 1000000  #-Calculate land area in m2
     Qspec = Qspec.multiply(landArea.iloc[0].values, axis=1) #-specific runoff in m3/day
     Qspec = Qspec / 1000000 #-MCM
     Qspec.reset_index(inplace=True)
-    Qspec['Date'] = Qspec['Date'].dt.strftime('%d/%m/%Y')
+    Qspec['Date'] = format_dates(Qspec['Date'])
     Qspec.to_csv(os.path.join(catchmentDir, 'Qspec_MCM.csv'), index=False)
 
     #-Create a csv-file for the riverbed fluxes
@@ -330,6 +331,6 @@ def postprocessSPHY(config, catchmentDir, catch_df, selSdate, selEdate):
         f = f.loc[selSdate:selEdate]
         #-reset index and re-format Date column to dd/mm/yyyy, otherwise WEAP doesn't understand it. Day first.
         f.reset_index(inplace=True)
-        f['Date'] = f['Date'].dt.strftime('%d/%m/%Y')
+        f['Date'] = format_dates(f['Date'])
         #-Write to csv-file
         f.to_csv(os.path.join(catchmentDir, k + '.csv'), index=False)
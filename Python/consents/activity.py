@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+
+import pandas as pd
+import numpy as np
+
+from other_functions.intervals import interval_cols, interval_file, write_intervals, read_intervals, month_window, active_matrix, DateIntervalIndex
+
+# Authorship information-###################################################################
+__author__ = 'Wilco Terink'
+__copyright__ = 'Wilco Terink'
+__version__ = '1.0'
+__email__ = 'wilco.terink@ecan.govt.nz'
+__date__ = 'August 2020'
+############################################################################################
+
+'''
+Compact representation of consent activity. A consent (or consent/WAP combination) is active between fmDate and toDate, and
+optionally only in the months from from_month up to and including to_month. Instead of a dense days x records grid, only these four
+values are kept per record (written to a small csv-file next to the dense activity csv-file), and the grid is only created for the
+period and records that are asked for. The interval table and its expansion to the grid are shared with the results scripts
+(other_functions/intervals.py).
+'''
+
+
+def expand_daily(df, sdate, edate):
+    '''
+    Returns a long table with a row for each day between sdate and edate (inclusive) on which a record of df is active: between
+    fmDate and toDate, and in the month window from_month - to_month (if df has these columns). The columns are Date and Month,
+    followed by the other columns of df (without fmDate and toDate). The rows are sorted by date, and within a date by the order of
+    the records in df. The rows are created at once by repeating each record over its days (np.repeat) and adding the day offsets.
+    '''
+    #-Only the records that are active on at least one day of the period are expanded (on whole days, like the expansion)
+    index = DateIntervalIndex(pd.to_datetime(df['fmDate']).dt.normalize(), pd.to_datetime(df['toDate']).dt.normalize())
+    df = df.iloc[index.active(pd.Timestamp(sdate).normalize(), pd.Timestamp(edate).normalize())]
+    s = np.datetime64(pd.Timestamp(sdate).date(), 'D')
+    e = np.datetime64(pd.Timestamp(edate).date(), 'D')
+    fm = pd.to_datetime(df['fmDate']).values.astype('datetime64[D]')
+    to = pd.to_datetime(df['toDate']).values.astype('datetime64[D]')
+    valid = ~np.isnat(fm) & ~np.isnat(to)
+    #-number of days of each record within the period
+    start = np.where(valid, np.maximum(fm, s), s)
+    n = np.where(valid, (np.minimum(to, e) - start).astype(np.int64) + 1, 0)
+    n = np.maximum(n, 0)
+
+    rec = np.repeat(np.arange(len(df)), n)
+    dates = start[rec] + (np.arange(n.sum()) - np.repeat(np.cumsum(n) - n, n)).astype('timedelta64[D]')
+    month = dates.astype('datetime64[M]').astype(np.int64) % 12 + 1
+    if 'from_month' in df.columns and 'to_month' in df.columns:
+        keep = month_window(month, df['from_month'].values[rec], df['to_month'].values[rec])
+        rec = rec[keep]; dates = dates[keep]; month = month[keep]
+    #-sort by date (stable, so the order of the records is kept within a date)
+    order = np.argsort(dates, kind='mergesort')
+
+    out = df.drop(['fmDate', 'toDate'], axis=1).iloc[rec[order]].reset_index(drop=True)
+    out.insert(0, 'Date', dates[order].astype('datetime64[ns]'))
+    out.insert(1, 'Month', month[order])
+    return out
+
+
+class ConsentActivity():
+    '''
+    Activity of a set of records (columns), kept as one interval (fmDate, toDate) and month window (from_month, to_month) per record.
+    Records without a month window (from_month and to_month missing in the table) are active in all months.
+
+    Usage:
+        act = crc_wap_activity(crc_df)
+        act.write(interval_file(crc_wap_active_csv))
+        act = read_activity(interval_file(crc_wap_active_csv))
+        df = act.expand(dt.date(2010, 1, 1), dt.date(2010, 12, 31), columns=['CRC012345_WAP1'])
+    '''
+
+    def __init__(self, intervals):
+        '''
+        intervals: DataFrame with the record names as index and the columns fmDate, toDate, and optionally from_month and to_month
+        '''
+        self.intervals = intervals
+        self.monthly = 'from_month' in intervals.columns and 'to_month' in intervals.columns
+
+    @property
+    def columns(self):
+        return self.intervals.index
+
+    def matrix(self, dates, columns=None):
+        '''
+        Returns the uint8 array (dates x columns) with the activity of columns (all records if None) on dates. Columns that are not
+        in the table are never active. Only the columns that are active between the first and last date (found with a DateIntervalIndex)
+        are compared with each date.
+        '''
+        df = self.intervals if columns is None else self.intervals.reindex(columns)
+        out = np.zeros((len(dates), len(df)), dtype=np.uint8)
+        if len(dates) == 0:
+            return out
+        d = pd.DatetimeIndex(dates)
+        pos = DateIntervalIndex(df['fmDate'], df['toDate']).active(d.min(), d.max())
+        df = df.iloc[pos]
+        if self.monthly:
+            out[:, pos] = active_matrix(dates, df['fmDate'], df['toDate'], df['from_month'], df['to_month'])
+        else:
+            out[:, pos] = active_matrix(dates, df['fmDate'], df['toDate'])
+        return out
+
+    def expand(self, start, end, columns=None):
+        '''
+        Returns a DataFrame (uint8) with the daily activity between start and end (inclusive) for columns (all records if None).
+        The index are the dates (named 'Date').
+        '''
+        dates = pd.date_range(start, end, freq='D', name='Date')
+        cols = self.columns if columns is None else columns
+        return pd.DataFrame(self.matrix(dates, columns), index=dates, columns=cols)
+
+    def expand_bits(self, start, end, columns=None):
+        '''
+        Same as expand, but returns the dates and the activity packed to bits along the dates (np.packbits), i.e. an array of
+        ceil(days / 8) x columns bytes. Use np.unpackbits(bits, axis=0, count=len(dates)) to get the uint8 array back.
+        '''
+        dates = pd.date_range(start, end, freq='D', name='Date')
+        return dates, np.packbits(self.matrix(dates, columns), axis=0)
+
+    def write(self, csv_file):
+        '''
+        Write the interval table to csv_file.
+        '''
+        write_intervals(self.intervals, csv_file)
+
+
+def read_activity(csv_file):
+    '''
+    Read the interval table that was written with ConsentActivity.write.
+    '''
+    return ConsentActivity(read_intervals(csv_file))
+
+
+def crc_activity(crc_df):
+    '''
+    Returns the ConsentActivity of the consents in crc_df (the interval of the first record of each consent).
+    '''
+    crc_unique = pd.unique(crc_df['crc']); crc_unique = crc_unique[~pd.isnull(crc_unique)]
+    return ConsentActivity(crc_df.groupby('crc')[['fmDate', 'toDate']].first().reindex(crc_unique))
+
+
+def crc_wap_activity(crc_df):
+    '''
+    Returns the ConsentActivity of the consent/WAP combinations (named crc_wap_name_long) of the records in crc_df that are not
+    discharge consents. If a combination occurs more than once, then the last record is used (at the position of the first one). The
+    consent of each combination is kept in the column crc.
+    '''
+    df = crc_df.loc[crc_df['Activity']!='Discharge water to water', ['crc', 'wap_name_long'] + interval_cols]
+    crc_wap = (df['crc'].astype(str) + '_' + df['wap_name_long'].astype(str)).values
+    rec = pd.Series(np.arange(len(crc_wap)), index=crc_wap).groupby(level=0, sort=False).last()
+    df = df.iloc[rec.values][['crc'] + interval_cols]
+    df.index = rec.index
+    return ConsentActivity(df)
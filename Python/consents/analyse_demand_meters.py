@@ -6,7 +6,12 @@ import numpy as np
 #from scipy import stats
 from matplotlib.ticker import MaxNLocator
 rcParams.update({'font.size': 8})
-import os
+import os, sys
+
+#-activity uses the interval functions that are shared with the results scripts (Python/other_functions)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from crctable import read_crc_table
+from activity import expand_daily
 
 
 pd.options.display.max_columns = 100
@@ -90,7 +95,7 @@ def demand_estimation_matrix(crc_csv, wap_csv, irf_csv, etr_csv, eta_csv, etp_cs
     ETp_ts_df = pd.read_csv(etp_csv, parse_dates = [0], index_col=0, dayfirst=True)
     P_ts_df = pd.read_csv(p_csv, parse_dates = [0], index_col=0, dayfirst=True)
     #-Read the detailed consent information and sub-catchment the WAPs belong to into a dataframe
-    crc_df = pd.read_csv(crc_csv, parse_dates=[1,2, 39, 40],dayfirst=True)
+    crc_df = read_crc_table(crc_csv)
     WAP_subcatchment_df = pd.read_csv(catchment_csv)
     
     #-Get start and end date for which to extract the data
@@ -132,67 +137,10 @@ def demand_estimation_matrix(crc_csv, wap_csv, irf_csv, etr_csv, eta_csv, etp_cs
     crc_df.drop(['wap_max_rate [l/s]', 'wap_max_rate_pro_rata [l/s]', 'wap_max_vol_pro_rata [m3]', 'wap_return_period [d]', 'wap_max_rate [m3]', 'wap_max_rate_pro_rata [m3]', 'metered'],axis=1, inplace=True)
     crc_df.dropna(how='all', inplace=True)
     
-    #-Define columns of dataframe to be created
-    cols = list(crc_df.columns.drop(['fmDate', 'toDate']))
-    cols.insert(0, 'Date')
-    cols.insert(1, 'Month')
-    cols.insert(2,'active')
-
-    #-Initialize dataframe
-    df = pd.DataFrame(columns=cols)
-    dates_range = pd.date_range(sdate, edate, freq='D')
-    df_full = df.copy()
-    #-Convert dates to pandas datetime format
-    sdate = pd.to_datetime(sdate)
-    edate = pd.to_datetime(edate)
-    #-Loop over all the consents/waps in the table, make a dataframe for the date range in which they were active, and add it to the final dataframe
-    for c in crc_df.iterrows():
-        fmDate = c[1]['fmDate']
-        toDate = c[1]['toDate']
-        if (fmDate<= edate) & (toDate>= sdate):
-            print(c[1]['wap'])
-            #-Temporaray dataframe for current consent/wap
-            df_temp = df.copy()
-            df_temp['Date'] = pd.date_range(c[1]['fmDate'], c[1]['toDate'], freq='D')
-            df_temp['Month'] = df_temp['Date'].dt.strftime('%m')
-            df_temp['Month'] = df_temp['Month'].astype(np.int) 
-            df_temp['crc'] = c[1]['crc']
-            df_temp['wap'] = c[1]['wap']
-            df_temp['Activity'] = c[1]['Activity']
-            df_temp['use_type'] = c[1]['use_type']
-            df_temp['complex_allo'] = c[1]['complex_allo']
-            df_temp['lowflow_restriction'] = c[1]['lowflow_restriction']
-            df_temp['from_month'] = c[1]['from_month']
-            df_temp['to_month'] = c[1]['to_month']
-            df_temp['wap_max_vol [m3]'] =   c[1]['wap_max_vol [m3]']
-            df_temp['active'] = 0
-            mlist = []
-            if c[1]['from_month'] < c[1]['to_month']:
-                for m in range(int(c[1]['from_month']), int(c[1]['to_month'])+1):
-                    mlist.append(m)
-            elif c[1]['from_month'] > c[1]['to_month']:
-                for m in range(int(c[1]['from_month']), 12+1):
-                    mlist.append(m)
-                for m in range(1, int(c[1]['to_month']) + 1):
-                    mlist.append(m)
-            else:
-                mlist.append(int(c[1]['from_month']))
-            df_temp.loc[df_temp['Month'].isin(mlist), 'active'] = 1
-                              
-            #-Concat temporary dataframe to final dataframe
-            df_full = pd.concat([df_full, df_temp])
-            df_temp = None; del df_temp
+    #-Expand the consents/waps to a record for each day of the period on which they were active (between fmDate and toDate and from_month up to to_month)
+    df_final = expand_daily(crc_df, sdate, edate)
     crc_df = None; del crc_df
-    
-    #-Merge for the period of interest only
-    df_final = pd.DataFrame(columns=['Date'])
-    df_final['Date'] = dates_range
-    df_final = pd.merge(df_final, df_full, how='left', on='Date')
-    df_full = None; del df_full
-    #-Drop records where consent is not executed
-    df_final.loc[df_final['active']!=1] = np.nan
-    df_final.dropna(how='all', inplace=True)
-    df_final.drop(['from_month', 'to_month', 'active'], axis=1, inplace=True)
+    df_final.drop(['from_month', 'to_month'], axis=1, inplace=True)
     df_final.drop_duplicates(inplace=True)
     
     #-Group by date and wap to calculate the maximum volume that may be extracted from a wap on a specific date
@@ -295,7 +243,7 @@ def get_WAP_alloc_metered_ts(crc_csv, wap_ts_csv):
     edate = wap_ts_df.index[-1]; edate = edate.to_pydatetime().date()
 
     #-Read the detailed consent information and sub-catchment the WAPs belong to into a dataframe
-    crc_df = pd.read_csv(crc_csv, parse_dates=[1,2, 39, 40],dayfirst=True)
+    crc_df = read_crc_table(crc_csv)
     
     crc_df = crc_df[['crc', 'wap', 'fmDate', 'toDate', 'from_month', 'to_month', 'Activity', 'use_type', 'complex_allo', 'metered', 'lowflow_restriction',
                      'wap_max_rate [l/s]', 'wap_max_rate_pro_rata [l/s]', 'wap_max_vol_pro_rata [m3]', 'wap_return_period [d]']]
@@ -333,68 +281,10 @@ def get_WAP_alloc_metered_ts(crc_csv, wap_ts_csv):
     crc_df.loc[(crc_df['wap_max_vol [m3]']==0) | pd.isna(crc_df['wap_max_vol [m3]'])] = np.nan
     crc_df.dropna(how='all', inplace=True)
     
-    #-Define columns of dataframe to be created 
-    cols = list(crc_df.columns.drop(['fmDate', 'toDate']))
-    cols.insert(0, 'Date')
-    cols.insert(1, 'Month')
-    cols.insert(2,'active')
-    
-    #-Initialize dataframe
-    df = pd.DataFrame(columns=cols)
-    dates_range = pd.date_range(sdate, edate, freq='D')
-    df_full = df.copy()
-    #-Convert dates to pandas datetime format
-    sdate = pd.to_datetime(sdate)
-    edate = pd.to_datetime(edate)
-    #-Loop over all the consents/waps in the table, make a dataframe for the date range in which they were active, and add it to the final dataframe
-    for c in crc_df.iterrows():
-        fmDate = c[1]['fmDate']
-        toDate = c[1]['toDate']
-        if (fmDate<= edate) & (toDate>= sdate):
-            print(c[1]['wap'])
-            #-Temporaray dataframe for current consent/wap
-            df_temp = df.copy()
-            df_temp['Date'] = pd.date_range(c[1]['fmDate'], c[1]['toDate'], freq='D')
-            df_temp['Month'] = df_temp['Date'].dt.strftime('%m')
-            df_temp['Month'] = df_temp['Month'].astype(np.int) 
-            df_temp['crc'] = c[1]['crc']
-            df_temp['wap'] = c[1]['wap']
-            df_temp['Activity'] = c[1]['Activity']
-            df_temp['use_type'] = c[1]['use_type']
-            df_temp['complex_allo'] = c[1]['complex_allo']
-            df_temp['lowflow_restriction'] = c[1]['lowflow_restriction']
-            df_temp['from_month'] = c[1]['from_month']
-            df_temp['to_month'] = c[1]['to_month']
-            df_temp['wap_max_vol [m3]'] =   c[1]['wap_max_vol [m3]']
-            df_temp['active'] = 0
-            mlist = []
-            if c[1]['from_month'] < c[1]['to_month']:
-                for m in range(int(c[1]['from_month']), int(c[1]['to_month'])+1):
-                    mlist.append(m)
-            elif c[1]['from_month'] > c[1]['to_month']:
-                for m in range(int(c[1]['from_month']), 12+1):
-                    mlist.append(m)
-                for m in range(1, int(c[1]['to_month']) + 1):
-                    mlist.append(m)
-            else:
-                mlist.append(int(c[1]['from_month']))
-            df_temp.loc[df_temp['Month'].isin(mlist), 'active'] = 1
-            
-            #-Concat temporary dataframe to final dataframe
-            df_full = pd.concat([df_full, df_temp])
-            df_temp = None; del df_temp
+    #-Expand the consents/waps to a record for each day of the period on which they were active (between fmDate and toDate and from_month up to to_month)
+    df_final = expand_daily(crc_df, sdate, edate)
     crc_df = None; del crc_df
-    
-    #-Merge for the period of interest only
-    df_final = pd.DataFrame(columns=['Date'])
-    df_final['Date'] = dates_range
-    df_final = pd.merge(df_final, df_full, how='left', on='Date')
-    df_full = None; del df_full
-    
-    #-Drop records where consent is not executed
-    df_final.loc[df_final['active']!=1] = np.nan
-    df_final.dropna(how='all', inplace=True)
-    df_final.drop(['Month', 'from_month', 'to_month', 'active'], axis=1, inplace=True)
+    df_final.drop(['Month', 'from_month', 'to_month'], axis=1, inplace=True)
     df_final.drop_duplicates(inplace=True)
     
     #-Group by date and wap to calculate the maximum volume that may be extracted from a wap on a specific date
@@ -2,11 +2,19 @@
 
 import pandas as pd
 import numpy as np
-import pdsql, os, sys
+import os, sys
 import datetime as dt
 
 from groundwater.stream_depletion import Theis
 from other_functions.reproject import reproject
+from database.snapshot import rd_sql, init_snapshot, filter_where_in, key_strings
+from database.querygraph import QueryGraph
+from database.loader import TableLoader
+from database.query import init_queries, report_queries, query_log
+from consents.incremental import previous_meter, previous_consents, frames_hash, write_run_stamp
+from consents.crctable import read_crc_table, write_crc_table
+from consents.activity import crc_activity, crc_wap_activity, interval_file
+from other_functions.weapcsv import format_dates, read_weap_csv, write_weap_csv, write_weap_csv_shards, read_columns
 
 # Authorship information-###################################################################
 __author__ = 'Wilco Terink'
@@ -54,6 +62,12 @@ def get_CRC_DB(config):
         - Time-series of metered WAPs for the consents that have been selected in the dataframe above.
     '''
 
+    # Tables that are in the snapshot cache (if configured) are read from the local snapshot instead of the database
+    init_snapshot(config)
+    # Long where_in lists are split in batches or staged in a temporary table on the server (if configured)
+    init_queries(config)
+    first_query = len(query_log)
+
     # Extract period from config file for which to select the consents (active during that period)
     syear = config.getint('TIMINGS', 'syear') - 1
     smonth = config.getint('TIMINGS', 'smonth')
@@ -86,11 +100,36 @@ def get_CRC_DB(config):
     # list to add warnings/erros
     lMessageList = []
 
+    # Maximum number of database queries that run at the same time
+    db_threads = config.getint('CONSENTS', 'db_threads')
+    # Incremental mode: the meter readings of the previous run are reused (see consents.incremental)
+    incremental = config.has_option('CONSENTS', 'incremental') and config.getint('CONSENTS', 'incremental')
+    stamp_file = os.path.join(crc_dir, config.get('CONSENTS', 'run_stamp')) if config.has_option('CONSENTS', 'run_stamp') else None
+
+    # Tables that are read several times are fetched once, with all the columns that are needed. The first reads of the take and divert tables are
+    # for all consents, so the later reads by WAP or consent number are served from memory.
+    tables = TableLoader()
+    tables.request('sql02prod', 'DataWarehouse', 'D_ACC_Act_Water_TakeWaterPermitAuthorisation', col_names = ['RecordNumber'])
+    tables.request('sql02prod', 'DataWarehouse', 'D_ACC_Act_Water_TakeWaterPermitAuthorisation',
+                   col_names = ['RecordNumber', 'Activity', 'B1_PER_ID3', 'ConsentedAnnualVolume_m3year', 'ComplexAllocations', 'HasAlowflowRestrictionCondition'])
+    tables.request('sql02prod', 'DataWarehouse', 'D_ACC_Act_Water_DivertWater_Water', col_names = ['RecordNumber'])
+    tables.request('sql02prod', 'DataWarehouse', 'D_ACC_Act_Water_DivertWater_Water',
+                   col_names = ['RecordNumber', 'Activity', 'B1_PER_ID3', 'HasAlowflowRestrictionCondition', 'WAP', 'MaxRate_ls', 'Volume_m3', 'ConsecutiveDayPeriod'])
+
+    # Queries that do not depend on other queries, except for the screen details that only need the WAPs in the SWAZs
+    print('Getting all surface- and groundwater take consents and the WAPs located within the selected Surface Water Allocation Zones...')
+    g = QueryGraph(db_threads)
+    g.add('all_take_consents', tables.rd_sql, 'sql02prod', 'DataWarehouse', 'D_ACC_Act_Water_TakeWaterPermitAuthorisation', col_names = ['RecordNumber'])
+    g.add('all_divert_consents', tables.rd_sql, 'sql02prod', 'DataWarehouse', 'D_ACC_Act_Water_DivertWater_Water', col_names = ['RecordNumber'])
+    g.add('SWAZ_WAPs', rd_sql, 'sql02prod', 'DataWarehouse', 'D_SW_WellsDetails', col_names = ['WellNo', 'SWAllocationZone', 'Depth'], where_in={'SWAllocationZone': SWAZs})
+    g.add('WAP_screens', lambda SWAZ_WAPs: rd_sql('sql03prod', 'Wells', 'SCREEN_DETAILS', col_names = ['WELL_NO', 'TOP_SCREEN'], where_in={'WELL_NO': SWAZ_WAPs['WellNo'].tolist()}),
+          depends=['SWAZ_WAPs'])
+    q = g.run()
+
     # Get consent numbers that are only related to takes and diverts
-    print('Getting all surface- and groundwater take consents...')
-    all_take_consents = pdsql.mssql.rd_sql('sql02prod', 'DataWarehouse', 'D_ACC_Act_Water_TakeWaterPermitAuthorisation', col_names = ['RecordNumber'])
+    all_take_consents = q['all_take_consents']
     all_take_consents.drop_duplicates(inplace=True)
-    all_divert_consents = pdsql.mssql.rd_sql('sql02prod', 'DataWarehouse', 'D_ACC_Act_Water_DivertWater_Water', col_names = ['RecordNumber'])
+    all_divert_consents = q['all_divert_consents']
     all_divert_consents.drop_duplicates(inplace=True)
     all_take_divert_consents = pd.concat([all_take_consents, all_divert_consents])
     all_take_divert_consents.drop_duplicates(inplace=True)
@@ -98,7 +137,7 @@ def get_CRC_DB(config):
 
     #-Get all the WAPs that are within one of the selected SWAZs from the D_SW_WellsDetails table
     print('Filtering WAPs located within the selected Surface Water Allocation Zones...')
-    SWAZ_WAPs = pdsql.mssql.rd_sql('sql02prod', 'DataWarehouse', 'D_SW_WellsDetails', col_names = ['WellNo', 'SWAllocationZone', 'Depth'], where_in={'SWAllocationZone': SWAZs})
+    SWAZ_WAPs = q['SWAZ_WAPs']
     SWAZ_WAPs.rename(columns={'SWAllocationZone':'SWAZ'}, inplace=True)
 
     # Filter out WAPs that OR have a screen depth <=Z m or a bore depth of <=Z (the or condition is needed because not all Wells have screens).
@@ -108,7 +147,7 @@ def get_CRC_DB(config):
     #-First get the wells that have a depth <=Z m
     WAP_depth_Zm = SWAZ_WAPs.loc[(SWAZ_WAPs['Depth']<=well_cutoff_depth) | (pd.isna(SWAZ_WAPs['Depth'])), ['WellNo']]
     #-Get Wells with top_screen <=Z m
-    WAP_screens = pdsql.mssql.rd_sql('sql03prod', 'Wells', 'SCREEN_DETAILS', col_names = ['WELL_NO', 'TOP_SCREEN'], where_in={'WELL_NO': SWAZ_WAPs['WellNo'].tolist()})
+    WAP_screens = q['WAP_screens']
     WAP_screens = WAP_screens.groupby('WELL_NO')['TOP_SCREEN'].min().reset_index()
     WAP_screens = WAP_screens.loc[WAP_screens['TOP_SCREEN'] <= well_cutoff_depth]
     WAP_screens.rename(columns={'WELL_NO': 'WellNo'}, inplace=True)
@@ -122,8 +161,12 @@ def get_CRC_DB(config):
     WAP_depth_Zm = None; WAP_screens = None; WAP_Zm = None; del WAP_depth_Zm, WAP_screens, WAP_Zm
 
     #-Get all the consents related to the WAPs within the selected SWAZs
-    SWAZ_WAP_consents1 = pdsql.mssql.rd_sql('sql02prod', 'DataWarehouse', 'D_ACC_Act_Water_TakeWaterWAPAllocation', col_names = ['RecordNumber', 'WAP'], where_in={'WAP': list(SWAZ_WAPs['WellNo'])})
-    SWAZ_WAP_consents2 = pdsql.mssql.rd_sql('sql02prod', 'DataWarehouse', 'D_ACC_Act_Water_DivertWater_Water', col_names = ['RecordNumber', 'WAP'], where_in={'WAP': list(SWAZ_WAPs['WellNo'])})
+    g = QueryGraph(db_threads)
+    g.add('SWAZ_WAP_consents1', rd_sql, 'sql02prod', 'DataWarehouse', 'D_ACC_Act_Water_TakeWaterWAPAllocation', col_names = ['RecordNumber', 'WAP'], where_in={'WAP': list(SWAZ_WAPs['WellNo'])})
+    g.add('SWAZ_WAP_consents2', tables.rd_sql, 'sql02prod', 'DataWarehouse', 'D_ACC_Act_Water_DivertWater_Water', col_names = ['RecordNumber', 'WAP'], where_in={'WAP': list(SWAZ_WAPs['WellNo'])})
+    q = g.run()
+    SWAZ_WAP_consents1 = q['SWAZ_WAP_consents1']
+    SWAZ_WAP_consents2 = q['SWAZ_WAP_consents2']
     SWAZ_WAP_consents = pd.concat([SWAZ_WAP_consents1, SWAZ_WAP_consents2])
     SWAZ_WAP_consents.drop_duplicates(subset='RecordNumber', inplace=True)
     SWAZ_WAP_consents1 = None; SWAZ_WAP_consents2 = None
@@ -143,7 +186,7 @@ def get_CRC_DB(config):
     SWAZ_WAP_consents = None; del SWAZ_WAP_consents
 
     #-Get all the consents from the F_ACC_Permit table from the DataWarehouse that are part of the all_consents selection
-    df = pdsql.mssql.rd_sql('sql02prod', 'DataWarehouse', 'F_ACC_Permit', col_names = ['B1_ALT_ID','fmDate','toDate','toDateText','Given Effect To','Expires','OriginalRecord','ParentAuthorisations','ChildAuthorisations','HolderAddressFullName'], where_in={'B1_ALT_ID': all_consents.tolist()})
+    df = rd_sql('sql02prod', 'DataWarehouse', 'F_ACC_Permit', col_names = ['B1_ALT_ID','fmDate','toDate','toDateText','Given Effect To','Expires','OriginalRecord','ParentAuthorisations','ChildAuthorisations','HolderAddressFullName'], where_in={'B1_ALT_ID': all_consents.tolist()})
     df['toDate'] = pd.to_datetime(df['toDate'], errors='coerce')
     df['fmDate'] = pd.to_datetime(df['fmDate'], errors='coerce')
     df['Given Effect To'] = pd.to_datetime(df['Given Effect To'], errors='coerce')
@@ -159,21 +202,11 @@ def get_CRC_DB(config):
     #-If 'Given Effect To' date is later than 'fmDate', then the 'fmDate' field is set to 'Given Effect To'
     df2.loc[(df2['fmDate'] < df2['Given Effect To']),'fmDate']=  df2['Given Effect To']
 
-    #-Unique consent numbers of 'OriginalRecord'
-    ori_records = pd.unique(df2['OriginalRecord'])
-    df2_columns = list(df2.columns)
-    fmDate_index = df2_columns.index('fmDate')
-    toDate_index = df2_columns.index('toDate')
     #-Make sure toDate is always 1 day before the fmDate of the child consent. Required to make sure that a consent isn't active twice on one day
-    for c in ori_records:
-        #-select the consents that belong to the same group (have same parent so to speak)
-        df_short = df2.loc[df2['OriginalRecord']==c]
-        for i in range(0,len(df_short)-1):
-            toDate = df_short.iloc[i,toDate_index] #-toDate of current record
-            fmDate = df_short.iloc[i+1,fmDate_index] #-fromDate of child record
-            if toDate == fmDate: #-cannot be equal. If so, then decrease the todate of the current record with one day
-                df_short.iloc[i, toDate_index] = toDate - dt.timedelta(days=1)
-        df2.loc[df2['OriginalRecord']==c] = df_short
+    #-The child record is the next record that belongs to the same group (same 'OriginalRecord', so to speak same parent)
+    child_fmDate = df2.groupby('OriginalRecord')['fmDate'].shift(-1)
+    #-toDate cannot be equal to the fmDate of the child. If so, then decrease the toDate of the current record with one day
+    df2.loc[df2['toDate'] == child_fmDate, 'toDate'] = df2['toDate'] - dt.timedelta(days=1)
     #-get rid of old dataframes
     df = df2.copy()
     df1 = None; df2 = None; del df1, df2
@@ -189,23 +222,168 @@ def get_CRC_DB(config):
     #-drop discharge consents not part of the df
     discharge_consents = discharge_consents.loc[discharge_consents['RecordNumber'].isin(df['crc'])]
 
+    #-Now the consents are known, the remaining queries (except for the metered time-series) are run together. Queries that depend on results that are only available
+    #-after merging below (the WAPs, B1_PER_ID3s, and consents in df1) are run with a superset of the values, and the results are filtered with the exact values below.
+    print('Retrieve consent, WAP, discharge, location, stream depletion, and associated consent details...')
+    crcs = df['crc'].tolist()
+    # Get the surface and groundwater takes for the selected consent numbers
+    crcAllo1 = tables.rd_sql('sql02prod', 'DataWarehouse', 'D_ACC_Act_Water_TakeWaterPermitAuthorisation',
+                             col_names = ['RecordNumber', 'Activity', 'B1_PER_ID3', 'ConsentedAnnualVolume_m3year', 'ComplexAllocations', 'HasAlowflowRestrictionCondition'], where_in={'RecordNumber': crcs})
+    # Do the same for the diversions. For the diversions also the wap maximum rate (MaxRate_ls), wap max volume pro rata (Volume_m3), and wap return period (ConsecutiveDayPeriod) are extracted.
+    crcAllo2 = tables.rd_sql('sql02prod', 'DataWarehouse', 'D_ACC_Act_Water_DivertWater_Water', col_names = ['RecordNumber', 'Activity', 'B1_PER_ID3', 'HasAlowflowRestrictionCondition', 'WAP', 'MaxRate_ls', 'Volume_m3', 'ConsecutiveDayPeriod'], where_in = {'RecordNumber': crcs})
+    # The combined volumes and the associated consents are fetched in one query (consents OR B1_PER_ID3s). The B1_PER_ID3s in df1 are a subset of the
+    # B1_PER_ID3s of the takes and diverts. The keys are compared as strings (key_strings), whether they are read as numbers or not.
+    B1_PER_ID3s = pd.unique(key_strings(pd.concat([crcAllo1['B1_PER_ID3'], crcAllo2['B1_PER_ID3']])).dropna()).tolist()
+    tables.request('sql02prod', 'DataWarehouse', 'D_ACC_Act_Water_AssociatedPermits', col_names = ['RecordNumber', 'CombinedAnnualVol_m3'], where_in={'RecordNumber': crcs})
+    tables.request('sql02prod', 'DataWarehouse', 'D_ACC_Act_Water_AssociatedPermits', col_names = ['B1_PER_ID3', 'RecordNumber','RecordNumberASIT'], where_in = {'B1_PER_ID3': B1_PER_ID3s})
+    g = QueryGraph(db_threads)
+    g.add('combVol', tables.rd_sql, 'sql02prod', 'DataWarehouse', 'D_ACC_Act_Water_AssociatedPermits', col_names = ['RecordNumber', 'CombinedAnnualVol_m3'], where_in={'RecordNumber': crcs})
+    g.add('crcWapAllo', rd_sql, 'sql02prod', 'DataWarehouse', 'D_ACC_Act_Water_TakeWaterWAPAllocation',
+          col_names = ['RecordNumber', 'Activity', 'FromMonth', 'ToMonth', 'SWAllocationBlock', 'WAP', 'MaxRateForWAP_ls', 'AllocationRate_ls', 'CustomVol_m3', 'CustomPeriodDays',
+                       'IncludeInSWAllocation', 'FirstStreamDepletionRate'], where_in={'RecordNumber': crcs, 'WAP': SWAZ_WAPs['WellNo'].tolist()})
+    g.add('crcActWaterUse', rd_sql, 'sql02prod', 'DataWarehouse', 'D_ACC_Act_Water_TakeWaterPermitUse', col_names=['RecordNumber', 'MaxRate_ls', 'Volume_m3', 'ConsecutiveDayPeriod', 'WaterUse'],
+          where_in = {'RecordNumber': crcs})
+    g.add('df_discharge', rd_sql, 'sql02prod', 'DataWarehouse', 'D_ACC_Act_Discharge_ContaminantToWater', col_names = ['RecordNo', 'Discharge Rate (l/s)', 'Volume (m3)'],
+          where_in = {'RecordNo': discharge_consents['RecordNumber'].tolist()})
+    # The consents in df1 are a subset of the consents in df
+    g.add('hydro_crc_allo_df', rd_sql, 'edwprod01', 'Hydro', 'CrcAllo', col_names = ['crc', 'take_type', 'use_type'], where_in = {'crc': crcs})
+    # The WAPs in df1 are a subset of the WAPs in the SWAZs and the WAPs of the diverts
+    g.add('extsite_df', rd_sql, 'edwprod01', 'Hydro', 'ExternalSite', col_names = ['ExtSiteID', 'NZTMX', 'NZTMY'],
+          where_in = {'ExtSiteID': pd.unique(pd.concat([SWAZ_WAPs['WellNo'], crcAllo2['WAP'].dropna().astype(str)])).tolist()})
+    # The groundwater take WAPs in df1 are a subset of the WAPs in the SWAZs
+    g.add('sd_df', rd_sql, 'sql03prod', 'Wells', 'Well_StreamDepletion_Locations', col_names = ['Well_No', 'NZTMX', 'NZTMY','Distance','T_Estimate','S'], where_in = {'Well_No': SWAZ_WAPs['WellNo'].tolist()})
+    g.add('ass_crc_df', tables.rd_sql, 'sql02prod', 'DataWarehouse', 'D_ACC_Act_Water_AssociatedPermits', col_names = ['B1_PER_ID3', 'RecordNumber','RecordNumberASIT'], where_in = {'B1_PER_ID3': B1_PER_ID3s})
+    q = g.run()
+    tables = None; del tables
+
+    #-In incremental mode, the consent details of the previous run are reused if the tables (and period and SWAZs) they are derived from
+    #-did not change. The change signal is a hash of these tables, that is kept in the run stamp (see consents.incremental).
+    consents_hash = frames_hash([df, discharge_consents, SWAZ_WAPs, crcAllo1, crcAllo2] + [q[k] for k in sorted(q)], [sdate, edate, sorted(SWAZs)])
+    df1 = previous_consents(stamp_file, crc_csv_out, consents_hash) if incremental else None
+    if df1 is None:
+        df1 = derive_consents(df, discharge_consents, SWAZ_WAPs, crcAllo1, crcAllo2, q, month_dict, yes_no_dict)
+    df = None; discharge_consents = None; crcAllo1 = None; crcAllo2 = None; del df, discharge_consents, crcAllo1, crcAllo2
+
+    #-get metered data in [m3]
+    print('Merging info on water meters...')
+    df1['wap'] = df1['wap'].astype(str)
+    waps = list(pd.unique(df1['wap']))
+    new_waps = []
+    for w in waps:
+        if '/' in w:
+            new_waps.append(w)
+    waps = new_waps; new_waps = None; 
+    nrWaps = len(waps)
+    #-in incremental mode, only the readings since shortly before the previous run are read for the WAPs of the previous run
+    prev_meter, from_date = None, None
+    if incremental:
+        prev_meter, from_date = previous_meter(stamp_file, wapTS_csv_out, sdate, SWAZs, config.getint('CONSENTS', 'incremental_lookback'))
+    old_waps = [w for w in waps if prev_meter is not None and w in prev_meter.columns]
+    new_waps = [w for w in waps if w not in old_waps]
+    #-get the wap abstraction data for rivers (9) and aquifer (12) for the waps present in the df1
+    #-only the records between sdate and edate are read (filtered on the server), in chunks with float32 values and categorical WAP numbers to limit memory use
+    g = QueryGraph(db_threads)
+    for name, w, d in [('new_waps', new_waps, sdate), ('old_waps', old_waps, from_date)]:
+        if w:
+            g.add(name, rd_sql, 'edwprod01', 'Hydro', 'TSDataNumericDaily', col_names = ['ExtSiteID', 'DatasetTypeID', 'DateTime', 'Value'], where_in = {'ExtSiteID': w, 'DatasetTypeID': [9, 12]},
+                  from_date=d.strftime('%Y-%m-%d'), to_date=edate.strftime('%Y-%m-%d'), date_col='DateTime', dtypes={'ExtSiteID': 'category', 'Value': 'float32'})
+    qm = g.run()
+    if qm:
+        df = pd.concat([qm[k] for k in ['new_waps', 'old_waps'] if k in qm], ignore_index=True)
+    else:
+        df = pd.DataFrame(columns=['ExtSiteID', 'DatasetTypeID', 'DateTime', 'Value'])
+    qm = None; del qm
+    df['DateTime'] = pd.to_datetime(df['DateTime'])
+    df = df.loc[(df['DateTime']>=pd.Timestamp(sdate)) & (df['DateTime']<=pd.Timestamp(edate))]
+    df.rename(columns={'DateTime': 'Date'}, inplace=True)
+    df['ExtSiteID'] = df['ExtSiteID'].astype(str)
+    #-Set non-reliable valuues (<0) to NaN
+    df.loc[df['Value']<0, 'Value'] = np.nan
+    #-A WAP can only have one value per day. If a WAP has multiple DatasetTypeIDs, then the first valid value is used (lowest DatasetTypeID first)
+    df.sort_values(by=['ExtSiteID', 'Date', 'DatasetTypeID'], inplace=True)
+    for w in pd.unique(df.loc[df.duplicated(subset=['ExtSiteID', 'Date']), 'ExtSiteID']):
+        lMessage = w + ' has multiple DatasetTypeIDs assigned to it. This is not possible and needs to be checked; i.e. a WAP can not be a divert and surface water take at the same time!!'
+        lMessageList.append(lMessage) 
+        print(lMessage)
+    df = df.groupby(['ExtSiteID', 'Date'], sort=False)['Value'].first().reset_index()
+    #-fill df_meter (dates x WAPs) with abstraction data
+    df_meter = df.pivot(index='Date', columns='ExtSiteID', values='Value')
+    df_meter = df_meter.reindex(index=pd.date_range(sdate, edate, freq='D'), columns=waps).astype(np.float32)
+    df_meter.rename_axis('Date', inplace=True)
+    df_meter.columns.name = None
+    #-WAPs with records are metered, and the metered period runs from the first to the last valid (>=0) value
+    metered_waps = set(df['ExtSiteID']) & set(waps)
+    if prev_meter is not None:
+        #-add the readings of the previous run before from_date, and re-validate which WAPs are metered
+        before = df_meter.index < from_date
+        df_meter.loc[before, old_waps] = prev_meter.reindex(index=df_meter.index[before], columns=old_waps).values
+        metered_waps |= set(w for w in old_waps if df_meter[w].notna().any())
+    nrMeteredWaps = float(len(metered_waps))
+    #-the first and last valid date of each WAP are found with argmax over the (dates x WAPs) validity matrix, from the top and from the
+    #-bottom; WAPs without any valid value are dropped
+    valid = df_meter.notna().to_numpy()
+    metered_dates = pd.DataFrame({'first': df_meter.index[valid.argmax(axis=0)], 'last': df_meter.index[len(df_meter) - 1 - valid[::-1].argmax(axis=0)]}, index=df_meter.columns)
+    metered_dates = metered_dates.loc[valid.any(axis=0)]
+    prev_meter = None; valid = None; del prev_meter, valid
+    df1['metered'] = np.where(df1['wap'].isin(metered_waps), 1., np.where(df1['wap'].isin(waps), 0., np.nan))
+    df1['metered_fmDate'] = df1['wap'].map(format_dates(metered_dates['first']))
+    df1['metered_toDate'] = df1['wap'].map(format_dates(metered_dates['last']))
+    metered_waps = None; metered_dates = None; del metered_waps, metered_dates
+    percMetered = (nrMeteredWaps / nrWaps) * 100
+    lMessage = '%.2f%% of the WAPs is metered.' %(percMetered)
+    print(lMessage)
+    lMessageList.append(lMessage)
+    
+    #-write WAP meter time-series to csv-file
+    print('Writing metered time-series of WAPs to csv-file...')
+    df_meter = df_meter.loc[:, df_meter.columns.notnull()]
+    write_weap_csv(df_meter, wapTS_csv_out)
+
+    #-write final dataframe to csv-file
+    print('Writing final consent/WAP/details dataframe to csv-file...')
+    df1.drop_duplicates(inplace=True)
+
+    ###-re-organize order of columns
+    df_final = df1[['crc', 'fmDate', 'toDate', 'Given Effect To', 'HolderAddressFullName', 'Activity', 'use_type', 'from_month', 'to_month', 'SWAZ',
+                'in_sw_allo', 'allo_block', 'complex_allo', 'complex_allo_comment', 'crc_ann_vol [m3]', 'crc_ann_vol_combined [m3]', 'crc_vol_return_period [m3]', 'crc_return_period [d]',
+                'crc_max_rate [l/s]', 'associated_crcs', 'wap', 'wap_max_rate [l/s]', 'wap_max_rate_pro_rata [l/s]', 'wap_max_vol_pro_rata [m3]',
+                'wap_return_period [d]', 'wap_NZTMX', 'wap_NZTMY', 'wap_sd_NZTMX', 'wap_sd_NZTMY', 'Distance', 'T_Estimate','S', 'Connection', 'discharge_rate [l/s]',
+                'discharge_volume [m3]', 'discharge_NZTMX', 'discharge_NZTMY', 'metered', 'metered_fmDate', 'metered_toDate', 'lowflow_restriction']]
+    df_final.loc[pd.isna(df_final['complex_allo']),'complex_allo'] = 0
+    df_final.loc[pd.isna(df_final['lowflow_restriction']),'lowflow_restriction'] = 0
+    df_final.loc[df_final.Activity == 'Discharge water to water', 'wap'] = np.nan
+
+    df1 = None; q = None; del df1, q;
+    df_final['fmDate'] = format_dates(df_final['fmDate'])
+    df_final['toDate'] = format_dates(df_final['toDate'])
+    df_final['Given Effect To'] = format_dates(df_final['Given Effect To'])
+    write_crc_table(df_final, crc_csv_out)
+    if stamp_file is not None:
+        write_run_stamp(stamp_file, sdate, edate, SWAZs, consents_hash)
+
+    print('Database queries (number, rows, and time [s] per table):')
+    print(report_queries(first_query))
+    print('Finished filtering consent and WAP info.')
+
+    return df_final, lMessageList
+
+def derive_consents(df, discharge_consents, SWAZ_WAPs, crcAllo1, crcAllo2, q, month_dict, yes_no_dict):
+    '''
+    Derive the consent/WAP details (all the columns of the consent table, except for the metered columns) from the tables that were
+    read by get_CRC_DB: the active consents (df), the discharge consents, the WAPs in the SWAZs, the take and divert consents, and the
+    results of the other queries (q). Returns the consent/WAP dataframe (df1).
+    '''
+
     #-Get dataframe of all water takes and diverts on consent level
     print('Retrieve take and divert info on consent level...')
-    # Get the surface and groundwater takes for the selected consent numbers
-    crcAllo1 = pdsql.mssql.rd_sql('sql02prod', 'DataWarehouse', 'D_ACC_Act_Water_TakeWaterPermitAuthorisation', 
-                                 col_names = ['RecordNumber', 'Activity', 'B1_PER_ID3', 'ConsentedAnnualVolume_m3year', 'ComplexAllocations',
-                                              'HasAlowflowRestrictionCondition'], where_in={'RecordNumber': df['crc'].tolist()})
     crcAllo1.drop_duplicates(inplace=True)
-
-    # Do the same for the diversions. For the diversions also the wap maximum rate (MaxRate_ls), wap max volume pro rata (Volume_m3), and wap return period (ConsecutiveDayPeriod) are extracted.
-    crcAllo2 = pdsql.mssql.rd_sql('sql02prod', 'DataWarehouse', 'D_ACC_Act_Water_DivertWater_Water', col_names = ['RecordNumber', 'Activity', 'B1_PER_ID3', 'HasAlowflowRestrictionCondition', 'WAP', 'MaxRate_ls', 'Volume_m3', 'ConsecutiveDayPeriod'], where_in = {'RecordNumber': df['crc'].tolist()})
     crcAllo2.drop_duplicates(inplace=True)
 
     # Concat together
     crcAllo = pd.concat([crcAllo1, crcAllo2], axis=0)
     crcAllo1 = None; crcAllo2 = None;
     # Get combined annual volume
-    combVol = pdsql.mssql.rd_sql('sql02prod', 'DataWarehouse', 'D_ACC_Act_Water_AssociatedPermits', col_names = ['RecordNumber', 'CombinedAnnualVol_m3'], where_in={'RecordNumber': df['crc'].tolist()})
+    combVol = q['combVol']
     crcAllo = pd.merge(crcAllo, combVol, how='left', on='RecordNumber')
     combVol = None
     # Cleanup
@@ -228,10 +406,7 @@ def get_CRC_DB(config):
 
     #-Get dataframe of all water takes and diverts on WAP level
     print('Retrieve take and divert info on WAP level...')
-    crcWapAllo = pdsql.mssql.rd_sql('sql02prod', 'DataWarehouse', 'D_ACC_Act_Water_TakeWaterWAPAllocation',
-                                    col_names = ['RecordNumber', 'Activity', 'FromMonth', 'ToMonth', 'SWAllocationBlock', 'WAP', 'MaxRateForWAP_ls', 
-                                                 'AllocationRate_ls', 'CustomVol_m3', 'CustomPeriodDays', 'IncludeInSWAllocation', 'FirstStreamDepletionRate'],
-                                    where_in={'RecordNumber': df['crc'].tolist(), 'WAP': SWAZ_WAPs['WellNo'].tolist()})
+    crcWapAllo = q['crcWapAllo']
 
     crcWapAllo.rename(columns={'RecordNumber': 'crc', 'SWAllocationBlock': 'allo_block', 'WAP': 'wap', 'MaxRateForWAP_ls': 'wap_max_rate [l/s]', 'FromMonth': 'from_month',
                                'ToMonth': 'to_month', 'AllocationRate_ls': 'wap_max_rate_pro_rata [l/s]', 'CustomVol_m3': 'wap_max_vol_pro_rata [m3]',
@@ -251,9 +426,7 @@ def get_CRC_DB(config):
     crcWapAllo.replace({'in_sw_allo': yes_no_dict}, inplace=True)
 
     print('Retrieve max rate, volume, and return period on consent level...')
-    crcActWaterUse = pdsql.mssql.rd_sql('sql02prod', 'DataWarehouse', 'D_ACC_Act_Water_TakeWaterPermitUse',
-                                        col_names=['RecordNumber', 'MaxRate_ls', 'Volume_m3', 'ConsecutiveDayPeriod', 'WaterUse'],
-                                        where_in = {'RecordNumber': df['crc'].tolist()})
+    crcActWaterUse = q['crcActWaterUse']
     crcActWaterUse.rename(columns={'RecordNumber': 'crc', 'MaxRate_ls': 'crc_max_rate [l/s]', 'Volume_m3': 'crc_vol_return_period [m3]', 'ConsecutiveDayPeriod': 'crc_return_period [d]', 'WaterUse': 'Use'}, inplace=True)
     #-some consents have a crc_max_rate of '0', which is not possible. These are set to NaN
     crcActWaterUse.loc[crcActWaterUse['crc_max_rate [l/s]']=='0', 'crc_max_rate [l/s]'] = np.nan
@@ -273,7 +446,7 @@ def get_CRC_DB(config):
 
     #-get discharge consent conditions and merge
     print('Get discharge consent details and merge...')
-    df_discharge = pdsql.mssql.rd_sql('sql02prod', 'DataWarehouse', 'D_ACC_Act_Discharge_ContaminantToWater', col_names = ['RecordNo', 'Discharge Rate (l/s)', 'Volume (m3)'], where_in = {'RecordNo': discharge_consents['RecordNumber'].tolist()})
+    df_discharge = q['df_discharge']
     df_discharge.rename(columns={'Discharge Rate (l/s)': 'discharge_rate [l/s]', 'Volume (m3)': 'discharge_volume [m3]'}, inplace=True)
     #-if rates and/or volumes are zero or missing, then drop rows
 
@@ -307,14 +480,12 @@ def get_CRC_DB(config):
 
     diversions = None
     crcAllo.drop(['wap', 'wap_max_rate [l/s]', 'wap_max_vol_pro_rata [m3]', 'wap_return_period [d]'], axis=1, inplace=True)
-    # copy missing blanks
-    crc_unique = pd.unique(df1.crc).tolist()
-    for c in crc_unique:
-        df_sel = df.loc[(df.crc == c) & pd.notna(df.fmDate)]
-        df1.loc[(df1.crc == c) & (df1.Activity == 'Divert Surface Water'), 'fmDate'] = df_sel.fmDate.iloc[0]
-        df1.loc[(df1.crc == c) & (df1.Activity == 'Divert Surface Water'), 'toDate'] = df_sel.toDate.iloc[0]
-        df1.loc[(df1.crc == c) & (df1.Activity == 'Divert Surface Water'), 'Given Effect To'] = df_sel['Given Effect To'].iloc[0]
-        df1.loc[(df1.crc == c) & (df1.Activity == 'Divert Surface Water'), 'HolderAddressFullName'] = df_sel['HolderAddressFullName'].iloc[0]
+    # copy missing blanks: the diverts get the dates and holder of the first record of the consent in df
+    crc_first = df.loc[pd.notna(df.fmDate)].drop_duplicates(subset='crc').set_index('crc')
+    divert = df1.Activity == 'Divert Surface Water'
+    for col in ['fmDate', 'toDate', 'Given Effect To', 'HolderAddressFullName']:
+        df1.loc[divert, col] = df1.loc[divert, 'crc'].map(crc_first[col]).values
+    crc_first = None; divert = None; del crc_first, divert
     # Assume empty fields for from_month and to_month are from 1 to 12
     df1.loc[pd.isna(df1.from_month), 'from_month'] = 1
     df1.loc[pd.isna(df1.to_month), 'to_month'] = 12
@@ -331,7 +502,8 @@ def get_CRC_DB(config):
     waps = pd.unique(df1['wap'])
 
     #-add the WAP NZTMX and NZTMY
-    extsite_df = pdsql.mssql.rd_sql('edwprod01', 'Hydro', 'ExternalSite', col_names = ['ExtSiteID', 'NZTMX', 'NZTMY'], where_in = {'ExtSiteID': waps.tolist()})
+    extsite_df = q['extsite_df']
+    extsite_df = extsite_df.loc[filter_where_in(extsite_df, {'ExtSiteID': waps.tolist()})]
     extsite_df.rename(columns={'NZTMX': 'wap_NZTMX', 'NZTMY': 'wap_NZTMY'}, inplace=True)
     extsite_df.drop_duplicates(inplace=True)
     df1 = pd.merge(df1, extsite_df, how='left', left_on='wap', right_on='ExtSiteID')
@@ -342,7 +514,8 @@ def get_CRC_DB(config):
     #-get stream depletion info and merge with df1
     print('Get stream depletion details and merge...')
     waps = pd.unique(df1.loc[df1['Activity']=='Take Groundwater','wap'])
-    sd_df = pdsql.mssql.rd_sql('sql03prod', 'Wells', 'Well_StreamDepletion_Locations', col_names = ['Well_No', 'NZTMX', 'NZTMY','Distance','T_Estimate','S'], where_in = {'Well_No': waps.tolist()})
+    sd_df = q['sd_df']
+    sd_df = sd_df.loc[filter_where_in(sd_df, {'Well_No': waps.tolist()})]
     waps = None; del waps
     sd_df.rename(columns={'Well_No': 'wap', 'NZTMX': 'wap_sd_NZTMX', 'NZTMY': 'wap_sd_NZTMY'}, inplace=True)
 
@@ -365,19 +538,13 @@ def get_CRC_DB(config):
 
     #-check for associated consents and add to df1
     print('Get associated consents, and add these as a list of comma-separated consent numbers...')
-    df1['B1_PER_ID3'] = df1['B1_PER_ID3'].astype(str)
-    unique_B1_PER_ID3 = pd.unique(df1['B1_PER_ID3'])
-    ass_crc_df = pdsql.mssql.rd_sql('sql02prod', 'DataWarehouse', 'D_ACC_Act_Water_AssociatedPermits', col_names = ['B1_PER_ID3', 'RecordNumber','RecordNumberASIT'], where_in = {'B1_PER_ID3': unique_B1_PER_ID3.tolist()})
-    df1['associated_crcs'] = np.nan
-    for i in unique_B1_PER_ID3:
-        crc_list = ''
-        ass_crc = ass_crc_df.loc[ass_crc_df['B1_PER_ID3'] == i, 'RecordNumberASIT'].values
-        if len(ass_crc) > 0:
-            for j in ass_crc:
-                crc_list += j
-                if j != ass_crc[-1]:
-                    crc_list += ', '
-            df1.loc[df1['B1_PER_ID3'] == i, 'associated_crcs'] = crc_list
+    df1['B1_PER_ID3'] = key_strings(df1['B1_PER_ID3'])
+    unique_B1_PER_ID3 = pd.unique(df1['B1_PER_ID3'].dropna())
+    ass_crc_df = q['ass_crc_df'].copy()
+    ass_crc_df['B1_PER_ID3'] = key_strings(ass_crc_df['B1_PER_ID3'])
+    ass_crc_df = ass_crc_df.loc[filter_where_in(ass_crc_df, {'B1_PER_ID3': unique_B1_PER_ID3.tolist()})]
+    ass_crc = ass_crc_df.dropna(subset=['RecordNumberASIT']).groupby('B1_PER_ID3')['RecordNumberASIT'].agg(', '.join)
+    df1['associated_crcs'] = df1['B1_PER_ID3'].map(ass_crc)
     unique_B1_PER_ID3 = None; ass_crc = None; del unique_B1_PER_ID3, ass_crc
 
     #-add crcActWaterUse
@@ -386,7 +553,8 @@ def get_CRC_DB(config):
 
     #-Mike's allo table for water use
     print('Merging water use type and irrigated area...')
-    hydro_crc_allo_df = pdsql.mssql.rd_sql('edwprod01', 'Hydro', 'CrcAllo', col_names = ['crc', 'take_type', 'use_type'], where_in = {'crc': df1['crc'].tolist()})
+    hydro_crc_allo_df = q['hydro_crc_allo_df']
+    hydro_crc_allo_df = hydro_crc_allo_df.loc[filter_where_in(hydro_crc_allo_df, {'crc': df1['crc'].tolist()})]
     df1 = pd.merge(df1, hydro_crc_allo_df, how='left', left_on=['crc', 'Activity'], right_on=['crc', 'take_type'])
     df1.drop('take_type', axis=1, inplace=True)
     hydro_crc_allo_df = None; del hydro_crc_allo_df
@@ -394,91 +562,8 @@ def get_CRC_DB(config):
     df1.loc[pd.isna(df1['use_type']), 'use_type'] = df1['Use']
     df1.drop('Use', axis=1, inplace=True)
 
-    #-get metered data in [m3]
-    print('Merging info on water meters...')
-    df1['metered'] = np.nan
-    df1['metered_fmDate'] = np.nan
-    df1['metered_toDate'] = np.nan
-    df1['wap'] = df1['wap'].astype(str)
-    waps = list(pd.unique(df1['wap']))
-    new_waps = []
-    for w in waps:
-        if '/' in w:
-            new_waps.append(w)
-    waps = new_waps; new_waps = None; 
-    nrWaps = len(waps)
-    df_meter = pd.DataFrame(index=pd.date_range(sdate, edate, freq='D'), columns=waps)
-    df_meter.rename_axis('Date', inplace=True)
-    #-get the wap abstraction data for rivers (9) and aquifer (12) for the waps present in the df1
-    df = pdsql.mssql.rd_sql('edwprod01', 'Hydro', 'TSDataNumericDaily', col_names = ['ExtSiteID', 'DatasetTypeID', 'DateTime', 'Value'], where_in = {'ExtSiteID': waps, 'DatasetTypeID': [9, 12]})
-    df['DateTime'] = pd.to_datetime(df['DateTime'])
-    df = df.loc[(df['DateTime']>=pd.Timestamp(sdate)) & (df['DateTime']<=pd.Timestamp(edate))]
-    df.rename(columns={'DateTime': 'Date'}, inplace=True)
-    #-fill df_meter with abstraction data
-    nrMeteredWaps = 0.
-    for w in waps:
-        #print w
-        df_sel = df.loc[df['ExtSiteID']==w,['Date', 'Value']]
-        df_sel.set_index('Date', inplace=True)
-        #-Set non-reliable valuues (<0) to NaN
-        df_sel.loc[df_sel['Value']<0] = np.nan
-        df_sel.rename(columns={'Value': w}, inplace=True)
-        if len(df_sel)>0:
-            nrMeteredWaps+=1
-            df1.loc[df1['wap']==w, 'metered'] = 1
-            d = df_sel.loc[df_sel[w]>=0]
-            sd = d.index[0].strftime('%d/%m/%Y')
-            ed = d.index[-1].strftime('%d/%m/%Y')
-            df1.loc[df1['wap']==w, 'metered_fmDate'] = sd 
-            df1.loc[df1['wap']==w, 'metered_toDate'] = ed
-        else:
-            df1.loc[df1['wap']==w, 'metered'] = 0
-        try:
-            df_meter[[w]] = df_sel
-        except:
-            lMessage = w + ' has multiple DatasetTypeIDs assigned to it. This is not possible and needs to be checked; i.e. a WAP can not be a divert and surface water take at the same time!!'
-            lMessageList.append(lMessage) 
-            print(lMessage)
-            #-use the first occuring entry two prevent double datasettypeids
-            df_sel.reset_index(inplace=True)
-            df_sel = df_sel.groupby('Date').first()
-            df_meter[[w]] = df_sel
-    percMetered = (nrMeteredWaps / nrWaps) * 100
-    lMessage = '%.2f%% of the WAPs is metered.' %(percMetered)
-    print(lMessage)
-    lMessageList.append(lMessage)
-    
-    #-write WAP meter time-series to csv-file
-    print('Writing metered time-series of WAPs to csv-file...')
-    df_meter.reset_index(inplace=True)
-    df_meter['Date'] = df_meter['Date'].dt.strftime('%d/%m/%Y')
-    df_meter.set_index('Date', inplace=True)
-    df_meter = df_meter.loc[:, df_meter.columns.notnull()]
-    df_meter.to_csv(wapTS_csv_out)
-
-    #-write final dataframe to csv-file
-    print('Writing final consent/WAP/details dataframe to csv-file...')
-    df1.drop_duplicates(inplace=True)
-
-    ###-re-organize order of columns
-    df_final = df1[['crc', 'fmDate', 'toDate', 'Given Effect To', 'HolderAddressFullName', 'Activity', 'use_type', 'from_month', 'to_month', 'SWAZ',
-                'in_sw_allo', 'allo_block', 'complex_allo', 'complex_allo_comment', 'crc_ann_vol [m3]', 'crc_ann_vol_combined [m3]', 'crc_vol_return_period [m3]', 'crc_return_period [d]',
-                'crc_max_rate [l/s]', 'associated_crcs', 'wap', 'wap_max_rate [l/s]', 'wap_max_rate_pro_rata [l/s]', 'wap_max_vol_pro_rata [m3]',
-                'wap_return_period [d]', 'wap_NZTMX', 'wap_NZTMY', 'wap_sd_NZTMX', 'wap_sd_NZTMY', 'Distance', 'T_Estimate','S', 'Connection', 'discharge_rate [l/s]',
-                'discharge_volume [m3]', 'discharge_NZTMX', 'discharge_NZTMY', 'metered', 'metered_fmDate', 'metered_toDate', 'lowflow_restriction']]
-    df_final.loc[pd.isna(df_final['complex_allo']),'complex_allo'] = 0
-    df_final.loc[pd.isna(df_final['lowflow_restriction']),'lowflow_restriction'] = 0
-    df_final.loc[df_final.Activity == 'Discharge water to water', 'wap'] = np.nan
-
-    df1 = None; del df1;
-    df_final['fmDate'] = df_final['fmDate'].dt.strftime('%d/%m/%Y')
-    df_final['toDate'] = df_final['toDate'].dt.strftime('%d/%m/%Y')
-    df_final['Given Effect To'] = df_final['Given Effect To'].dt.strftime('%d/%m/%Y')
-    df_final.to_csv(crc_csv_out, index=False)
+    return df1
 
-    print('Finished filtering consent and WAP info.')
-
-    return df_final, lMessageList
 
 def get_CRC_CSV(self):    
     '''
@@ -491,7 +576,7 @@ def get_CRC_CSV(self):
     #-Get csv-file with detailed consent information
     crc_csv = os.path.join(self.crc_dir, self.config.get('CONSENTS', 'crc_csv_out'))
     
-    crc_df = pd.read_csv(crc_csv, parse_dates = [1,2,3,39,40], dayfirst=True)
+    crc_df = read_crc_table(crc_csv)
 
     return crc_df
 
@@ -600,7 +685,7 @@ def cleanup_crc_df(self):
     use_type_dict = {'Irrigation - Pasture': 'Irrigation', 'Irrigation - Mixed': 'Irrigation', 'Aquaculture': 'Other', 'Community Water Supply': 'Domestic', 'Cooling Water (non HVAC)': 'Hydropower',
                      'Recreation/Sport': 'Other', 'Domestic Use': 'Domestic', 'Irrigation - Arable (Cropping)': 'Irrigation', 'Firefighting': 'Other',
                      'Industrial Use - Other': 'Other', 'Construction': 'Other', 'Augment Flow/Wetland': 'Other', 'Power Generation': 'Hydropower', 'Viticulture': 'Other'}
-    self.crc_df['use_type_renamed'] = self.crc_df['use_type']
+    self.crc_df['use_type_renamed'] = self.crc_df['use_type'].astype(object)
     self.crc_df.replace({'use_type_renamed': use_type_dict},inplace=True)
     
     #-link consumption to consent/wap based on use_type_renamed
@@ -616,7 +701,7 @@ def cleanup_crc_df(self):
     #-cleanup
     self.crc_df.drop_duplicates(inplace=True)
     self.crc_df.sort_values(by='crc', inplace=True)
-    self.crc_df.to_csv(csv_file, index=False)
+    write_crc_table(self.crc_df, csv_file)
     
     
 
@@ -644,66 +729,26 @@ def crc_wap_active_ts(self):
     #-Get csv-files to write to
     self.crc_active_csv = os.path.join(self.crc_dir, self.config.get('CONSENTS', 'crc_active_csv'))
     self.crc_wap_active_csv = os.path.join(self.crc_dir, self.config.get('CONSENTS', 'crc_wap_active_csv'))
-
-    #-Create Active/Inactive (1,0) time-series for consents    
-    crc_unique = pd.unique(self.crc_df['crc']); crc_unique = crc_unique[~pd.isnull(crc_unique)]
-    i = pd.date_range(sdate, edate, freq='D')
-    crc_active = pd.DataFrame(columns=crc_unique, index=i)
-    crc_active.rename_axis('Date', inplace=True)
-    df_group = self.crc_df.groupby('crc')['fmDate', 'toDate'].first()
-    for c in crc_unique:
-        i = df_group.loc[c, ['fmDate', 'toDate']].values
-        df_sel = pd.DataFrame(columns=[c], index=pd.date_range(i[0], i[1], freq='D'))
-        df_sel.rename_axis('Date', inplace=True)
-        df_sel[c] = 1
-        crc_active[[c]] = df_sel
-    crc_active.fillna(0, inplace=True)
-    crc_active.reset_index(inplace=True)
-    crc_active['Date'] = crc_active['Date'].dt.strftime('%d/%m/%Y')
-    crc_active.set_index('Date', inplace=True)
-    df_sel = None; df_group = None; del df_sel, df_group
-    #-write to csv
-    crc_active.to_csv(self.crc_active_csv)
+    #-Maximum number of columns of the narrow csv-files (shards) that WEAP reads the time-series from (0 = WEAP reads the csv-files above)
+    shard_size = self.config.getint('CONSENTS', 'active_shard_size') if self.config.has_option('CONSENTS', 'active_shard_size') else 0
+
+    #-Create Active/Inactive (1,0) time-series for consents. The intervals are written next to (and after) the csv-file, so the activity can be
+    #-expanded for any period and set of consents later without reading the dense time-series.
+    crc_active = crc_activity(self.crc_df)
+    df = crc_active.expand(sdate, edate)
+    write_weap_csv(df, self.crc_active_csv)
+    write_weap_csv_shards(df, self.crc_active_csv, shard_size)
+    crc_active.write(interval_file(self.crc_active_csv))
+    crc_active = None; df = None; del crc_active, df
      
     #-Create Active/Inactive (1,0) for each of the records in crc_df (combination of crc and wap) that is not a discharge consent
     #-for WAPs only look at the non-discharge records
-    #crc_df = self.crc_df.loc[self.crc_df['Activity']!='Discharge water to water',['crc', 'wap', 'fmDate', 'toDate', 'from_month', 'to_month']]
-    crc_df = self.crc_df.loc[self.crc_df['Activity']!='Discharge water to water',['crc', 'wap_name_long', 'fmDate', 'toDate', 'from_month', 'to_month']]
-    i = pd.date_range(sdate, edate, freq='D')
-    crc_wap_active = pd.DataFrame(index=i)
-    crc_wap_active.rename_axis('Date', inplace=True)
-    for i in crc_df.iterrows():
-        df_sel = pd.DataFrame()
-        #v = i[1]['crc'] + '_' + i[1]['wap']
-        v = i[1]['crc'] + '_' + i[1]['wap_name_long']
-        df_sel['Date'] = pd.date_range(i[1]['fmDate'], i[1]['toDate'], freq='D')
-        df_sel['Month'] = df_sel['Date'].dt.strftime('%m')
-        df_sel['Month'] = df_sel['Month'].astype(np.int) 
-        df_sel['from_month'] = i[1]['from_month']
-        df_sel['to_month'] = i[1]['to_month']
-        df_sel['active'] = 0
-
-        mlist = []
-        if i[1]['from_month'] < i[1]['to_month']:
-            for m in range(int(i[1]['from_month']), int(i[1]['to_month'])+1):
-                mlist.append(m)
-        elif i[1]['from_month'] > i[1]['to_month']:
-            for m in range(int(i[1]['from_month']), 12+1):
-                mlist.append(m)
-            for m in range(1, int(i[1]['to_month']) + 1):
-                mlist.append(m)
-        else:
-            mlist.append(int(i[1]['from_month']))
-        df_sel.loc[df_sel['Month'].isin(mlist), 'active'] = 1
-
-        df_sel.set_index('Date', inplace=True)
-        crc_wap_active[v] = df_sel['active']
-    crc_wap_active.fillna(0, inplace=True)    
-    crc_wap_active.reset_index(inplace=True)
-    crc_wap_active['Date'] = crc_wap_active['Date'].dt.strftime('%d/%m/%Y')
-    crc_wap_active.set_index('Date', inplace=True)
-    #-write to csv
-    crc_wap_active.to_csv(self.crc_wap_active_csv)
+    crc_wap_active = crc_wap_activity(self.crc_df)
+    df = crc_wap_active.expand(sdate, edate)
+    write_weap_csv(df, self.crc_wap_active_csv)
+    #-all WAPs of a consent are written to the same shard
+    write_weap_csv_shards(df, self.crc_wap_active_csv, shard_size, groups=list(crc_wap_active.intervals['crc']))
+    crc_wap_active.write(interval_file(self.crc_wap_active_csv))
 
 
 def add_latlon_coordinates(crc_df):
@@ -1009,12 +1054,9 @@ def init_Consents_OtherAssumptions(self):
     #-check if WAPs branch exists under Key Assumptions. This is required before Other Assumptions\Consents can be added
     b = self.WEAP.BranchExists('\\Key Assumptions\\WAPs')
     if b:
-        #-Columns of crc active and crc_wap_active dataframes
-        df = pd.read_csv(self.crc_active_csv, index_col=0)
-        crc_cols = list(df.columns)
-        df = pd.read_csv(self.crc_wap_active_csv, index_col=0)
-        crc_wap_cols = list(df.columns)
-        df = None; del df 
+        #-File and column number of each consent and crc/wap in the crc active and crc_wap_active time-series (the shards if these were written)
+        crc_cols = read_columns(self.crc_active_csv)
+        crc_wap_cols = read_columns(self.crc_wap_active_csv)
         
         #-All consents except discharge consents
         df = self.crc_df.loc[self.crc_df['Activity']!='Discharge water to water']
@@ -1037,7 +1079,7 @@ def init_Consents_OtherAssumptions(self):
             #-Add Active branch to consent 
             c_Active = b.AddChild('Active')
             c_Active.Variables('Annual Activity Level').ScaleUnit = 'No Unit'
-            c_Active.Variables('Annual Activity Level').Expression = 'ReadFromFile(' + self.crc_active_csv + ', ' + str(crc_cols.index(c)+1) + ', , , , Interpolate)'
+            c_Active.Variables('Annual Activity Level').Expression = 'ReadFromFile(' + crc_cols[c][0] + ', ' + str(crc_cols[c][1]) + ', , , , Interpolate)'
                
             #-Get the WAPs belonging to the conent
             df_short = df.loc[df['crc']==c]
@@ -1057,7 +1099,7 @@ def init_Consents_OtherAssumptions(self):
                 #-Add Active branch to WAP
                 w_Active = wap_branch.AddChild('Active')
                 w_Active.Variables('Annual Activity Level').ScaleUnit = 'No Unit'
-                w_Active.Variables('Annual Activity Level').Expression = 'ReadFromFile(' + self.crc_wap_active_csv + ', ' + str(crc_wap_cols.index(crc_wap)+1) + ', , , , Interpolate)'
+                w_Active.Variables('Annual Activity Level').Expression = 'ReadFromFile(' + crc_wap_cols[crc_wap][0] + ', ' + str(crc_wap_cols[crc_wap][1]) + ', , , , Interpolate)'
                 #-Add BAllocated variable to WAP
                 bbb = wap_branch.AddChild('Ballocated')
                 bbb.Variables('Annual Activity Level').ScaleUnit = 'No Unit'
@@ -1526,7 +1568,7 @@ def set_demand_to_csv_ts(self):
     
     csvF = os.path.join(self.crc_dir, self.config.get('CONSENTS_PART_2', 'demand'))
     
-    df = pd.read_csv(csvF, index_col=[0], dayfirst=True, parse_dates=True)
+    df = read_weap_csv(csvF)
     cols = list(df.columns)
 
     
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+
+import pandas as pd
+import os
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+# Authorship information-###################################################################
+__author__ = 'Wilco Terink'
+__copyright__ = 'Wilco Terink'
+__version__ = '1.0'
+__email__ = 'wilco.terink@ecan.govt.nz'
+__date__ = 'August 2020'
+############################################################################################
+
+'''
+Reading and writing of the consent tables (crc_csv_out and crc_csv_out_final). Next to the csv-file (which is kept for WEAP and
+to be checked/edited by hand), the table is written as a Parquet file with the same name and an explicit schema. Readers load the
+Parquet file if it is not older than the csv-file, so columns are found by name and dates do not have to be parsed again. If the
+csv-file was edited after it was written, or pyarrow is not installed, then the csv-file is read and the schema is applied to it.
+'''
+
+#-Schema of the consent table
+date_cols = ['fmDate', 'toDate', 'Given Effect To', 'metered_fmDate', 'metered_toDate']
+category_cols = ['Activity', 'use_type', 'SWAZ']
+month_cols = ['from_month', 'to_month']
+
+
+def binary_file(csv_file):
+    '''
+    Parquet file that belongs to csv_file.
+    '''
+    return os.path.splitext(csv_file)[0] + '.parquet'
+
+
+def set_schema(df, categorical=False):
+    '''
+    Set the types of the consent table columns: datetimes, and if categorical categories and nullable integers (Int8) for the months.
+    Otherwise the categories are returned as strings (object) and the months as floats (missing months are nan), as read from the
+    csv-file, so new labels can be assigned and int() can be called on the months. Columns that are not in df are skipped.
+    '''
+    for c in date_cols:
+        if c in df.columns and not pd.api.types.is_datetime64_any_dtype(df[c]):
+            df[c] = pd.to_datetime(df[c], dayfirst=True)
+    for c in month_cols:
+        if c in df.columns:
+            df[c] = df[c].astype('Int8') if categorical else df[c].astype('float64')
+    for c in category_cols:
+        if c in df.columns:
+            df[c] = df[c].astype('category') if categorical else df[c].astype(object)
+    return df
+
+
+def write_crc_table(df, csv_file):
+    '''
+    Write the consent table to csv_file, and to the Parquet file that belongs to it (if pyarrow is installed).
+    '''
+    df.to_csv(csv_file, index=False)
+    if pyarrow is not None:
+        set_schema(df.copy(), categorical=True).to_parquet(binary_file(csv_file), index=False)
+
+
+def read_crc_table(csv_file, categorical=False):
+    '''
+    Read the consent table that was written to csv_file. The Parquet file is read if it exists, pyarrow is installed, and it is not
+    older than csv_file. Otherwise csv_file is read. Activity, use_type and SWAZ are returned as categories, and from_month and
+    to_month as nullable integers, if categorical is True (only for readers that do not assign new labels or need plain numbers).
+    '''
+    pq_file = binary_file(csv_file)
+    if pyarrow is not None and os.path.isfile(pq_file) and os.path.getmtime(pq_file) >= os.path.getmtime(csv_file):
+        df = pd.read_parquet(pq_file)
+    else:
+        df = pd.read_csv(csv_file)
+    return set_schema(df, categorical)
@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+
+import pandas as pd
+import numpy as np
+import os, json, hashlib
+import datetime as dt
+
+from other_functions.weapcsv import read_weap_csv
+from consents.crctable import read_crc_table
+
+# Authorship information-###################################################################
+__author__ = 'Wilco Terink'
+__copyright__ = 'Wilco Terink'
+__version__ = '1.0'
+__email__ = 'wilco.terink@ecan.govt.nz'
+__date__ = 'August 2020'
+############################################################################################
+
+'''
+Incremental refresh of the consent table and metered WAP time-series extracted by get_CRC_DB. Each run writes a run stamp (json-file)
+with the time of the run, the period and SWAZs it was run for, and a hash of the tables the consent details were derived from.
+A next run for the same start date and SWAZs reuses the meter readings in the previous wapTS_csv_out, and only reads the readings
+from the database from shortly before the previous run onwards (readings may be added a while after the reading date). WAPs that
+were not part of the previous run are read for the whole period. The consent details in the previous crc_csv_out are reused if the
+hash of the tables they are derived from did not change (the tables themselves are still read, but mostly from the snapshot cache).
+Remove the run stamp to derive the consent details again after the derivation itself was changed.
+'''
+
+#-Metered columns of the consent table, which are derived from the meter readings in each run
+meter_cols = ['metered', 'metered_fmDate', 'metered_toDate']
+
+
+def read_run_stamp(stamp_file):
+    '''
+    Returns the run stamp as a dictionary, or None if there is no run stamp.
+    '''
+    if stamp_file is None or not os.path.isfile(stamp_file):
+        return None
+    with open(stamp_file) as f:
+        return json.load(f)
+
+
+def write_run_stamp(stamp_file, sdate, edate, SWAZs, consents_hash=None):
+    '''
+    Write the run stamp for a run between sdate and edate for the list of SWAZs. consents_hash is the frames_hash of the tables the
+    consent details were derived from.
+    '''
+    stamp = {'run': dt.datetime.now().strftime('%Y-%m-%d %H:%M:%S'), 'sdate': sdate.strftime('%Y-%m-%d'), 'edate': edate.strftime('%Y-%m-%d'), 'SWAZs': sorted(SWAZs),
+             'consents': consents_hash}
+    with open(stamp_file, 'w') as f:
+        json.dump(stamp, f, indent=4)
+
+
+def previous_meter(stamp_file, wapTS_csv, sdate, SWAZs, lookback_days):
+    '''
+    Returns the metered WAP time-series of the previous run (DataFrame with dates as index and WAPs as columns) and the date from
+    which the readings should be read again. Returns None, None if there is no previous run for the same start date and SWAZs, in
+    which case all readings should be read.
+    '''
+    stamp = read_run_stamp(stamp_file)
+    if stamp is None or not os.path.isfile(wapTS_csv):
+        print('No previous run found; all meter readings are extracted.')
+        return None, None
+    if stamp['sdate'] != sdate.strftime('%Y-%m-%d') or stamp['SWAZs'] != sorted(SWAZs):
+        print('Previous run was for another period or other SWAZs; all meter readings are extracted.')
+        return None, None
+
+    prev_meter = read_weap_csv(wapTS_csv, index_col='Date')
+    prev_meter = prev_meter.astype(np.float32)
+    #-Read again from lookback_days before the end of the previous period or the previous run (whichever is first)
+    last_date = min(pd.Timestamp(stamp['edate']), pd.Timestamp(stamp['run']).normalize())
+    from_date = max(pd.Timestamp(sdate), last_date - pd.Timedelta(days=lookback_days))
+    print('Reusing meter readings of the previous run (%s) up to %s.' %(stamp['run'], (from_date - pd.Timedelta(days=1)).strftime('%d-%m-%Y')))
+    return prev_meter, from_date
+
+
+def frames_hash(frames, values=()):
+    '''
+    MD5 hash of the column names and contents of a list of DataFrames, and of a list of other values (e.g. the period), used as the
+    change signal of the consent details.
+    '''
+    h = hashlib.md5()
+    for df in frames:
+        h.update(repr([str(c) for c in df.columns]).encode('utf-8'))
+        h.update(pd.util.hash_pandas_object(df, index=False).values.tobytes())
+    h.update(repr([str(v) for v in values]).encode('utf-8'))
+    return h.hexdigest()
+
+
+def previous_consents(stamp_file, crc_csv, consents_hash):
+    '''
+    Returns the consent details of the previous run (the consent table in crc_csv without the metered columns) if these were derived
+    from the same tables (the consents_hash in the run stamp is the same). Returns None otherwise, in which case the consent details
+    should be derived again.
+    '''
+    stamp = read_run_stamp(stamp_file)
+    if stamp is None or stamp.get('consents') != consents_hash or not os.path.isfile(crc_csv):
+        print('Consent details changed since the previous run; all consent details are derived.')
+        return None
+    print('Consent details did not change since the previous run (%s); reusing these.' %stamp['run'])
+    df = read_crc_table(crc_csv)
+    return df.drop([c for c in meter_cols if c in df.columns], axis=1)
@@ -0,0 +1,9 @@
+# -*- coding: utf-8 -*-
+
+#-Authorship information-###################################################################
+__author__ = 'Wilco Terink'
+__copyright__ = 'Wilco Terink'
+__version__ = '1.0'
+__email__ = 'wilco.terink@ecan.govt.nz'
+__date__ ='August 2020'
+############################################################################################
\ No newline at end of file
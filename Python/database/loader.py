@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+
+import pandas as pd
+import threading
+
+from database.snapshot import rd_sql, filter_where_in
+from database.query import unique_values
+
+#-Authorship information-###################################################################
+__author__ = 'Wilco Terink'
+__copyright__ = 'Wilco Terink'
+__version__ = '1.0'
+__email__ = 'wilco.terink@ecan.govt.nz'
+__date__ ='August 2020'
+############################################################################################
+
+
+class TableLoader():
+    '''
+    Per-run loader for tables that are read several times with different columns and filters (e.g. D_ACC_Act_Water_DivertWater_Water
+    in get_CRC_DB). The reads of a table are declared first with request(). At the first read the table is fetched once from the
+    database with the union of the declared columns and the widest filter, and the read itself and all later reads are served from
+    memory.
+
+    Usage:
+        tables = TableLoader()
+        tables.request('sql02prod', 'DataWarehouse', 'D_ACC_Act_Water_DivertWater_Water', col_names=['RecordNumber'])
+        tables.request('sql02prod', 'DataWarehouse', 'D_ACC_Act_Water_DivertWater_Water', col_names=['RecordNumber', 'WAP'], where_in={'WAP': waps})
+        df = tables.rd_sql('sql02prod', 'DataWarehouse', 'D_ACC_Act_Water_DivertWater_Water', col_names=['RecordNumber', 'WAP'], where_in={'WAP': waps})
+
+    The widest filter is no filter if one of the requests has no where_in. Otherwise the values of the where_in lists are combined
+    per column, and the conditions on different columns are combined with OR. For this the table is fetched once per column (so each
+    fetch is split into batches and can be served from the snapshot cache), and the rows that were fetched for a previous column are
+    left out. A request with more than one where_in condition only adds the condition of its first column (the other conditions are
+    applied in memory). Reads that are not covered by the fetched table (e.g. because they were not declared) are read from the
+    database directly.
+    '''
+
+    def __init__(self):
+        self.tables = {}
+        self.lock = threading.Lock()
+
+    def key(self, server, database, table):
+        return ('%s.%s.%s' %(server, database, table)).lower()
+
+    def request(self, server, database, table, col_names, where_in=None):
+        '''
+        Declare a read of col_names from table with the where_in filter. Must be called before the first read of the table.
+        '''
+        with self.lock:
+            t = self.tables.setdefault(self.key(server, database, table), {'columns': [], 'where_in': {}, 'full': False, 'df': None, 'lock': threading.Lock()})
+            if t['df'] is not None:
+                raise ValueError('%s.%s.%s is already fetched; requests should be declared before the first read' %(server, database, table))
+            for c in col_names + list(where_in or {}):
+                if c not in t['columns']:
+                    t['columns'].append(c)
+            if not where_in:
+                t['full'] = True
+            else:
+                col = list(where_in)[0]
+                t['where_in'].setdefault(col, []).extend(where_in[col])
+
+    def rd_sql(self, server, database, table, col_names, where_in=None):
+        '''
+        Same as pdsql.mssql.rd_sql (for the table, col_names and where_in arguments). The table is fetched on the first read, and
+        the where_in filter is applied in memory.
+        '''
+        t = self.tables.get(self.key(server, database, table))
+        if t is None:
+            return rd_sql(server, database, table, col_names=col_names, where_in=where_in)
+        with t['lock']:
+            if t['df'] is None:
+                t['df'] = self.fetch(server, database, table, t)
+        if not self.covers(t, col_names, where_in):
+            print('%s.%s.%s is read again, because the request was not declared.' %(server, database, table))
+            return rd_sql(server, database, table, col_names=col_names, where_in=where_in)
+
+        df = t['df']
+        if where_in:
+            df = df.loc[filter_where_in(df, where_in)]
+        return df[col_names].reset_index(drop=True)
+
+    def fetch(self, server, database, table, t):
+        '''
+        Fetch the union of the columns of all requests, with the widest filter.
+        '''
+        if t['full']:
+            return rd_sql(server, database, table, col_names=t['columns'])
+        dfs = []
+        done = {}
+        for c, values in t['where_in'].items():
+            df = rd_sql(server, database, table, col_names=t['columns'], where_in={c: unique_values(values)})
+            #-Rows that match the condition of a previous column are already fetched
+            for d, d_values in done.items():
+                df = df.loc[~filter_where_in(df, {d: d_values})]
+            dfs.append(df)
+            done[c] = values
+        return pd.concat(dfs, ignore_index=True) if len(dfs) > 1 else dfs[0]
+
+    def covers(self, t, col_names, where_in):
+        '''
+        Returns True if all rows and columns of the read are part of the fetched table.
+        '''
+        if any(c not in t['df'].columns for c in col_names + list(where_in or {})):
+            return False
+        if t['full']:
+            return True
+        #-The read is covered if the values of one of its conditions are a subset of the fetched values of that column
+        for c, values in (where_in or {}).items():
+            if c in t['where_in'] and set(normalize(values)) <= set(normalize(t['where_in'][c])):
+                return True
+        return False
+
+
+def normalize(values):
+    '''
+    Values of a where_in list as compared by SQL Server (strings case-insensitive and without trailing spaces).
+    '''
+    return [v.upper().rstrip() if isinstance(v, str) else v for v in values]
+
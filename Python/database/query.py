@@ -0,0 +1,263 @@
+# -*- coding: utf-8 -*-
+
+import pandas as pd
+import itertools, threading, time
+from pandas.api.types import union_categoricals
+try:
+    import pdsql
+except ImportError:
+    pdsql = None
+
+from database.querygraph import QueryGraph
+
+#-Authorship information-###################################################################
+__author__ = 'Wilco Terink'
+__copyright__ = 'Wilco Terink'
+__version__ = '1.0'
+__email__ = 'wilco.terink@ecan.govt.nz'
+__date__ ='August 2020'
+############################################################################################
+
+'''
+Reading from the SQL Server databases with long where_in lists. Long lists result in huge IN clauses, which can exceed the
+parameter limits of SQL Server and give poor query plans. Lists longer than the batch size are therefore either:
+    - split into batches that are queried concurrently, after which the results are concatenated ('batch'), or
+    - staged in a temporary table on the server, which is joined in the query ('temp').
+
+All queries use one pooled engine per server and database (and user), so connections are reused between queries instead of being
+set up again for every query. The number of rows and the time of each query are logged.
+
+Results can also be read in chunks that are converted to smaller types (e.g. float32 values and categorical site IDs) as they
+arrive.
+
+The settings are read from the [DB_QUERIES] section of the config file:
+    where_in_batch_size = 2000      (0 = never split or stage)
+    where_in_method = batch         (batch or temp)
+    max_connections = 4             (maximum number of database connections that are open at the same time)
+    chunk_rows = 200000             (number of rows per chunk when results are converted to other types)
+    log_queries = 1                 (print the number of rows and time of each query)
+'''
+
+#-Settings (set by init_queries)
+batch_size = 0
+method = 'batch'
+max_connections = 4
+chunk_rows = 200000
+log_queries = False
+#-Limits the number of open database connections over all threads
+connections = threading.BoundedSemaphore(max_connections)
+
+#-Pooled engines by (server, database, username)
+engines = {}
+engines_lock = threading.Lock()
+#-Server, database, table, number of rows, and time [s] of all queries
+query_log = []
+
+
+def init_queries(config):
+    '''
+    Set the where_in batch settings from the [DB_QUERIES] section of the config file. Without this section, where_in lists are
+    never split.
+    '''
+    global batch_size, method, max_connections, connections, chunk_rows, log_queries
+    if not config.has_section('DB_QUERIES'):
+        return
+    batch_size = config.getint('DB_QUERIES', 'where_in_batch_size')
+    method = config.get('DB_QUERIES', 'where_in_method').strip().lower()
+    if method not in ['batch', 'temp']:
+        raise ValueError("where_in_method should be 'batch' or 'temp', not '%s'" %method)
+    max_connections = config.getint('DB_QUERIES', 'max_connections')
+    connections = threading.BoundedSemaphore(max_connections)
+    if config.has_option('DB_QUERIES', 'chunk_rows'):
+        chunk_rows = config.getint('DB_QUERIES', 'chunk_rows')
+    if config.has_option('DB_QUERIES', 'log_queries'):
+        log_queries = bool(config.getint('DB_QUERIES', 'log_queries'))
+
+
+def get_engine(server, database, username=None, password=None):
+    '''
+    Returns the engine for server and database. The engine is created the first time, and then reused for all queries to that
+    database; the connections are kept in the pool of the engine.
+    '''
+    key = (server.lower(), database.lower(), username)
+    with engines_lock:
+        if key not in engines:
+            engines[key] = pdsql.mssql.create_engine('mssql', server, database, username=username, password=password)
+        return engines[key]
+
+
+def dispose_engines():
+    '''
+    Close all pooled connections.
+    '''
+    with engines_lock:
+        for engine in engines.values():
+            engine.dispose()
+        engines.clear()
+
+
+def log_query(server, database, table, start, df):
+    '''
+    Add a query to the query log, and print it if log_queries is set.
+    '''
+    seconds = time.time() - start
+    query_log.append((server, database, table, len(df), seconds))
+    if log_queries:
+        print('%s.%s.%s: %d rows in %.2f s' %(server, database, table, len(df), seconds))
+
+
+def report_queries(first=0):
+    '''
+    Returns a DataFrame with the number of queries, rows, and total time per table from the query log, starting at query number
+    first.
+    '''
+    log = pd.DataFrame(query_log[first:], columns=['server', 'database', 'table', 'rows', 'seconds'])
+    report = log.groupby(['server', 'database', 'table']).agg(queries=('rows', 'size'), rows=('rows', 'sum'), seconds=('seconds', 'sum'))
+    return report.sort_values('seconds', ascending=False)
+
+
+def unique_values(values):
+    '''
+    Unique values of a where_in list, keeping the order. Strings are compared case-insensitive and without trailing spaces (like
+    SQL Server), so a record can never match values in two different batches.
+    '''
+    seen = set()
+    unique = []
+    for v in values:
+        k = v.upper().rstrip() if isinstance(v, str) else v
+        if k not in seen:
+            seen.add(k)
+            unique.append(v)
+    return unique
+
+
+def rd_sql(server, database, table=None, col_names=None, where_in=None, chunksize=None, dtypes=None, **kwargs):
+    '''
+    Same as pdsql.mssql.rd_sql, but where_in lists that are longer than the batch size are split into batches or staged in a
+    temporary table (see above). The number of open connections is limited to max_connections.
+    Large results can be streamed in chunks of chunksize rows, with each chunk converted to dtypes (dictionary with the type per
+    column, e.g. {'Value': 'float32', 'ExtSiteID': 'category'}) before the next chunk is read. Combined with from_date, to_date
+    and date_col (filter on the server), memory use then depends on the requested period and not on the size of the table.
+    If dtypes is given without chunksize, then chunks of chunk_rows rows are used.
+    '''
+    if pdsql is None:
+        raise ImportError('pdsql is required to read %s.%s.%s from the database' %(server, database, table))
+    if dtypes and chunksize is None:
+        chunksize = chunk_rows
+
+    long_keys = [k for k in (where_in or {}) if batch_size > 0 and len(where_in[k]) > batch_size]
+    #-Batches only work with the default AND between the where_in conditions
+    if not long_keys or table is None or kwargs.get('stmt') is not None or kwargs.get('where_op', 'AND').upper() != 'AND':
+        return rd_sql_connection(server, database, table, col_names=col_names, where_in=where_in, chunksize=chunksize, dtypes=dtypes, **kwargs)
+
+    if method == 'temp':
+        with connections:
+            start = time.time()
+            df = rd_sql_stmt(server, database, table, col_names, where_in, long_keys, chunksize=chunksize, dtypes=dtypes, **kwargs)
+            log_query(server, database, table, start, df)
+            return df
+    return rd_sql_batches(server, database, table, col_names, where_in, long_keys, chunksize=chunksize, dtypes=dtypes, **kwargs)
+
+
+def rd_sql_batches(server, database, table, col_names, where_in, long_keys, **kwargs):
+    '''
+    Split the long where_in lists into batches, query all combinations of batches concurrently, and concatenate the results in
+    the order of the batches.
+    '''
+    batches = []
+    for k in long_keys:
+        values = unique_values(where_in[k])
+        batches.append([values[i:i + batch_size] for i in range(0, len(values), batch_size)])
+
+    g = QueryGraph(max_connections)
+    names = []
+    for i, combi in enumerate(itertools.product(*batches)):
+        w = dict(where_in)
+        w.update(zip(long_keys, combi))
+        name = 'batch_%d' %i
+        g.add(name, rd_sql_connection, server, database, table, col_names=col_names, where_in=w, **kwargs)
+        names.append(name)
+    results = g.run()
+
+    return concat_typed([results[n] for n in names], kwargs.get('dtypes'))
+
+
+def rd_sql_connection(server, database, table, col_names=None, where_in=None, chunksize=None, dtypes=None, **kwargs):
+    '''
+    pdsql.mssql.rd_sql using one of the available connections. If the result should be read in chunks or converted to other
+    types, then the statement is executed here instead.
+    '''
+    with connections:
+        start = time.time()
+        if (chunksize or dtypes) and table is not None and kwargs.get('stmt') is None:
+            df = rd_sql_stmt(server, database, table, col_names, where_in, [], chunksize=chunksize, dtypes=dtypes, **kwargs)
+        elif kwargs.get('con') is not None:
+            df = pdsql.mssql.rd_sql(server, database, table, col_names=col_names, where_in=where_in, **kwargs)
+        else:
+            #-Temporary tables for long lists (> 20000 values) are created on the same (pooled) connection as the query
+            with get_engine(server, database, kwargs.get('username'), kwargs.get('password')).begin() as conn:
+                df = pdsql.mssql.rd_sql(server, database, table, col_names=col_names, where_in=where_in, con=conn, **kwargs)
+        log_query(server, database, table, start, df)
+        return df
+
+
+def rd_sql_stmt(server, database, table, col_names, where_in, staged_keys, chunksize=None, dtypes=None, **kwargs):
+    '''
+    Select the records from table, where the where_in lists in staged_keys are staged in temporary tables on the server and joined
+    in the query. The other where_in lists, and the date filter (from_date, to_date, date_col), are added as normal conditions.
+    The result is read in chunks of chunksize rows (all at once if None) and converted to dtypes.
+    '''
+    #-Lists that pdsql would stage itself (> 20000 values) are staged here as well
+    staged_keys = list(staged_keys) + [k for k in (where_in or {}) if k not in staged_keys and len(where_in[k]) > 20000]
+    short_in = dict((k, v) for k, v in (where_in or {}).items() if k not in staged_keys)
+    where_lst = pdsql.mssql.sql_where_stmts(where_in=short_in or None, from_date=kwargs.get('from_date'), to_date=kwargs.get('to_date'), date_col=kwargs.get('date_col'))[0]
+    where_lst = where_lst or []
+    for k in staged_keys:
+        where_lst.append('[%s] IN (SELECT [%s] FROM [#stage_%s])' %(k, k, k.lower().replace(' ', '_')))
+
+    if col_names is not None:
+        col_stmt = ', '.join(['[' + c + ']' for c in col_names])
+    else:
+        col_stmt = '*'
+    stmt = 'SELECT ' + col_stmt + ' FROM ' + table
+    if where_lst:
+        stmt += ' WHERE ' + ' AND '.join(where_lst)
+
+    with get_engine(server, database, kwargs.get('username'), kwargs.get('password')).begin() as conn:
+        #-Temporary tables only live as long as this connection
+        for k in staged_keys:
+            values = unique_values(where_in[k])
+            pd.DataFrame({k: values}).to_sql('#stage_%s' %k.lower().replace(' ', '_'), con=conn, if_exists='replace', index=False, chunksize=1000)
+        if chunksize:
+            df = concat_typed([set_dtypes(chunk, dtypes) for chunk in pd.read_sql(stmt, con=conn, chunksize=chunksize)], dtypes, col_names)
+        else:
+            df = set_dtypes(pd.read_sql(stmt, con=conn), dtypes)
+
+    if kwargs.get('rename_cols') is not None:
+        df.columns = kwargs['rename_cols']
+    return df
+
+
+def set_dtypes(df, dtypes):
+    '''
+    Convert the columns in dtypes (dictionary with column name as key and type as value) of df.
+    '''
+    for c, t in (dtypes or {}).items():
+        if c in df.columns:
+            df[c] = df[c].astype(t)
+    return df
+
+
+def concat_typed(frames, dtypes, col_names=None):
+    '''
+    Concatenate DataFrames that were converted with set_dtypes. Categorical columns are combined with the union of their
+    categories, so they stay categorical (pd.concat would turn them into object columns if the categories differ).
+    '''
+    if not frames:
+        return pd.DataFrame(columns=col_names)
+    columns = frames[0].columns
+    cats = [c for c in columns if isinstance(frames[0][c].dtype, pd.CategoricalDtype)]
+    df = pd.concat([f.drop(cats, axis=1) for f in frames], ignore_index=True)
+    for c in cats:
+        df[c] = pd.Categorical(union_categoricals([f[c] for f in frames]))
+    return df[columns]
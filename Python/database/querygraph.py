@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+#-Authorship information-###################################################################
+__author__ = 'Wilco Terink'
+__copyright__ = 'Wilco Terink'
+__version__ = '1.0'
+__email__ = 'wilco.terink@ecan.govt.nz'
+__date__ ='August 2020'
+############################################################################################
+
+
+class QueryGraph():
+    '''
+    Small dependency graph of database queries that is executed on a thread pool. Queries that do not depend on each other are
+    in flight at the same time, while the number of queries running at once (and so the number of database connections) is
+    limited to max_workers.
+
+    Usage:
+        g = QueryGraph(4)
+        g.add('waps', rd_sql, 'sql02prod', 'DataWarehouse', 'D_SW_WellsDetails', col_names=['WellNo'])
+        g.add('screens', lambda waps: rd_sql('sql03prod', 'Wells', 'SCREEN_DETAILS', where_in={'WELL_NO': waps['WellNo'].tolist()}), depends=['waps'])
+        results = g.run()
+
+    A query with dependencies is called with the results of these dependencies as (first) positional arguments, in the order of
+    depends. run() returns a dictionary with the results by name, so the results can be merged in a fixed order afterwards.
+    '''
+
+    def __init__(self, max_workers=4):
+        self.max_workers = max_workers
+        self.nodes = []
+
+    def add(self, name, func, *args, **kwargs):
+        '''
+        Add a query 'name' that calls func(*results of depends, *args, **kwargs). The names of the queries it depends on are given
+        with the keyword argument depends.
+        '''
+        depends = kwargs.pop('depends', [])
+        for d in depends:
+            if d not in [n[0] for n in self.nodes]:
+                raise ValueError('Query %s depends on %s, which should be added first' %(name, d))
+        self.nodes.append((name, func, args, kwargs, depends))
+
+    def run(self):
+        '''
+        Run all queries and return a dictionary with the results by name. If a query fails, then the queries that have not started
+        yet are cancelled and the error is raised.
+        '''
+        results = {}
+        pending = list(self.nodes)
+        running = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            while pending or running:
+                #-Submit all queries for which the dependencies are available (in the order they were added)
+                for node in list(pending):
+                    name, func, args, kwargs, depends = node
+                    if all(d in results for d in depends):
+                        pending.remove(node)
+                        running[pool.submit(func, *(tuple(results[d] for d in depends) + args), **kwargs)] = name
+                done, not_done = wait(list(running), return_when=FIRST_COMPLETED)
+                for f in done:
+                    name = running.pop(f)
+                    try:
+                        results[name] = f.result()
+                    except Exception:
+                        for r in running:
+                            r.cancel()
+                        raise
+        return results
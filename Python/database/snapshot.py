@@ -0,0 +1,214 @@
+# -*- coding: utf-8 -*-
+
+import pandas as pd
+import sqlite3, json, os, time, threading
+
+from database import query
+
+#-Authorship information-###################################################################
+__author__ = 'Wilco Terink'
+__copyright__ = 'Wilco Terink'
+__version__ = '1.0'
+__email__ = 'wilco.terink@ecan.govt.nz'
+__date__ ='August 2020'
+############################################################################################
+
+'''
+Local snapshot cache for slowly changing database tables (e.g. the DataWarehouse, Wells, and Hydro tables used by get_CRC_DB).
+
+The columns that are requested from a table are mirrored (for all rows) into a local SQLite file. Requests for that table are
+then served from the SQLite file, and the where_in filters are applied locally. A snapshot is refreshed from the database when it
+is older than the time-to-live (TTL) set for that table, or when columns are requested that are not in the snapshot yet (for a
+request of all columns, col_names=None, the snapshot should have been a fetch of all columns). Tables without a TTL are always read
+from the database.
+
+The cache is configured in the [DB_CACHE] section of the config file:
+    use_db_cache = 1
+    db_cache_file = C:\\...\\db_cache.sqlite
+    db_cache_offline = 0                        (1 = never connect to the database; snapshots are used regardless of their age)
+    db_cache_fixtures = C:\\...\\fixtures       (optional directory with csv-files 'server.database.table.csv' to seed the cache with,
+                                                 for the tables that are not in the cache yet)
+    sql02prod.DataWarehouse.F_ACC_Permit = 24   (TTL in hours per table)
+'''
+
+#-Options in the [DB_CACHE] section that are not a table TTL
+cache_options = ['use_db_cache', 'db_cache_file', 'db_cache_offline', 'db_cache_fixtures']
+
+#-Snapshot cache that is used by rd_sql (set by init_snapshot)
+snapshot = None
+
+
+class SnapshotCache():
+
+    def __init__(self, cache_file, ttl, offline=False):
+        '''
+        cache_file: SQLite file to store the snapshots in
+        ttl: dictionary with 'server.database.table' as key and the TTL in hours as value
+        offline: if True, then snapshots are used regardless of their age and the database is never queried
+        '''
+        self.cache_file = cache_file
+        #-Keys are matched case-insensitive (config options are lower case)
+        self.ttl = dict((k.lower(), float(v)) for k, v in ttl.items())
+        self.offline = offline
+        #-The snapshots may be requested from several threads (e.g. by a QueryGraph). The connection is shared, so each read or write of
+        #-the SQLite file is done under self.lock. The refresh of a table is done under the lock of that table only, so requests for other
+        #-tables are not blocked while it is fetched from the database (and a table is not fetched twice at the same time).
+        self.lock = threading.Lock()
+        self.table_locks = {}
+        self.con = sqlite3.connect(cache_file, check_same_thread=False)
+        self.con.execute('CREATE TABLE IF NOT EXISTS snapshots (name TEXT PRIMARY KEY, columns TEXT, datetimes TEXT, fetched REAL, complete INTEGER DEFAULT 0)')
+        #-Cache files of an earlier version have no 'complete' column (all columns fetched); their snapshots are treated as not complete
+        if 'complete' not in [r[1] for r in self.con.execute('PRAGMA table_info(snapshots)')]:
+            self.con.execute('ALTER TABLE snapshots ADD COLUMN complete INTEGER DEFAULT 0')
+        self.con.commit()
+
+    def is_cached(self, server, database, table):
+        '''
+        Returns True if the table is part of the snapshot cache.
+        '''
+        return self.offline or self.key(server, database, table) in self.ttl
+
+    def key(self, server, database, table):
+        return ('%s.%s.%s' %(server, database, table)).lower()
+
+    def table_lock(self, key):
+        '''
+        Returns the lock of a table (created on first use).
+        '''
+        with self.lock:
+            return self.table_locks.setdefault(key, threading.Lock())
+
+    def rd_sql(self, server, database, table, col_names=None, where_in=None):
+        '''
+        Same as pdsql.mssql.rd_sql (for the table, col_names and where_in arguments), but served from the snapshot. The snapshot is
+        refreshed first if it is missing, older than the TTL, or misses some of the col_names or where_in columns. A request of all
+        columns (col_names=None) is only served from a snapshot that was a fetch of all columns.
+        '''
+        key = self.key(server, database, table)
+        with self.table_lock(key):
+            with self.lock:
+                info = self.con.execute('SELECT columns, fetched, complete FROM snapshots WHERE name=?', (key,)).fetchone()
+            columns = json.loads(info[0]) if info else []
+            complete = bool(info[2]) if info else False
+            #-Columns used in the where_in filters are mirrored as well
+            if col_names is None:
+                missing = [] if complete else None
+            else:
+                needed = col_names + [c for c in (where_in or {}) if c not in col_names]
+                missing = [] if complete else [c for c in needed if c not in columns]
+            expired = info is None or (time.time() - info[1]) > self.ttl.get(key, 0) * 3600.
+            if self.offline:
+                if info is None or missing is None or missing:
+                    raise ValueError('%s.%s.%s is not available in the snapshot cache (offline mode) for columns %s' %(server, database, table, missing or col_names or 'all'))
+            elif expired or missing is None or missing:
+                #-Mirror all columns if these are requested (or were mirrored before), otherwise the union of the columns that were
+                #-requested before and now, for all rows of the table
+                fetch_all = col_names is None or complete
+                df = rd_sql_db(server, database, table, col_names=None if fetch_all else columns + missing)
+                self.store(key, df, complete=fetch_all)
+            df = self.load(key)
+
+        if where_in:
+            df = df.loc[filter_where_in(df, where_in)]
+        if col_names is not None:
+            df = df[col_names]
+        return df.reset_index(drop=True)
+
+    def store(self, key, df, complete=False):
+        '''
+        Store (replace) the snapshot of a table. complete should be True if df has all columns of the table.
+        '''
+        datetimes = [c for c in df.columns if pd.api.types.is_datetime64_any_dtype(df[c])]
+        with self.lock:
+            df.to_sql(self.table_name(key), self.con, if_exists='replace', index=False)
+            self.con.execute('INSERT OR REPLACE INTO snapshots VALUES (?, ?, ?, ?, ?)', (key, json.dumps(list(df.columns)), json.dumps(datetimes), time.time(), int(complete)))
+            self.con.commit()
+
+    def load(self, key):
+        '''
+        Load the snapshot of a table.
+        '''
+        with self.lock:
+            datetimes = json.loads(self.con.execute('SELECT datetimes FROM snapshots WHERE name=?', (key,)).fetchone()[0])
+            return pd.read_sql('SELECT * FROM "%s"' %self.table_name(key), self.con, parse_dates=datetimes)
+
+    def table_name(self, key):
+        return 'snapshot_' + key.replace('.', '__')
+
+    def seed(self, fixture_dir):
+        '''
+        Seed the cache with csv-files in fixture_dir. The csv-files should be named 'server.database.table.csv' and contain the
+        columns of the table that are used. Only tables without a snapshot are seeded, so a snapshot (and its fetch time) is not
+        replaced by the fixture each time the cache is initialized.
+        '''
+        for f in sorted(os.listdir(fixture_dir)):
+            if f.lower().endswith('.csv') and f.count('.') == 3:
+                key = f[:-4].lower()
+                with self.table_lock(key):
+                    with self.lock:
+                        seeded = self.con.execute('SELECT name FROM snapshots WHERE name=?', (key,)).fetchone() is not None
+                    if seeded:
+                        continue
+                    print('Seeding snapshot cache with %s...' %f)
+                    self.store(key, pd.read_csv(os.path.join(fixture_dir, f)))
+
+
+def filter_where_in(df, where_in):
+    '''
+    Returns a boolean Series of the rows in df that match all where_in conditions. Strings are compared case-insensitive and
+    without trailing spaces, like SQL Server does with the default collation.
+    '''
+    mask = pd.Series(True, index=df.index)
+    for col, values in where_in.items():
+        if pd.api.types.is_object_dtype(df[col]) or pd.api.types.is_string_dtype(df[col]):
+            values = [str(v).upper().rstrip() for v in values]
+            mask &= df[col].notna() & df[col].astype(str).str.upper().str.rstrip().isin(values)
+        else:
+            mask &= df[col].isin(values)
+    return mask
+
+
+def key_strings(values):
+    '''
+    Returns the values of a key column (Series) as strings, so keys that are read as numbers (floats if the column has missing
+    values) and keys that are read as strings can be compared and used in a where_in list. Whole numbers are written without
+    decimals (123.0 -> '123'); missing values stay missing.
+    '''
+    def to_str(v):
+        if isinstance(v, float) and v.is_integer():
+            return str(int(v))
+        return str(v)
+    return values.map(to_str, na_action='ignore').astype(object)
+
+
+def rd_sql_db(server, database, table=None, col_names=None, where_in=None, **kwargs):
+    '''
+    Read from the database itself (pdsql.mssql.rd_sql, with long where_in lists split in batches or staged; see database.query).
+    '''
+    return query.rd_sql(server, database, table, col_names=col_names, where_in=where_in, **kwargs)
+
+
+def init_snapshot(config):
+    '''
+    Initialize the snapshot cache from the [DB_CACHE] section in the config file. Without this section, or with use_db_cache=0,
+    rd_sql always reads from the database.
+    '''
+    global snapshot
+    snapshot = None
+    if not config.has_section('DB_CACHE') or not config.getint('DB_CACHE', 'use_db_cache'):
+        return
+    ttl = dict((k, v) for k, v in config.items('DB_CACHE') if k not in cache_options)
+    offline = config.has_option('DB_CACHE', 'db_cache_offline') and config.getint('DB_CACHE', 'db_cache_offline')
+    snapshot = SnapshotCache(config.get('DB_CACHE', 'db_cache_file'), ttl, offline=bool(offline))
+    if config.has_option('DB_CACHE', 'db_cache_fixtures') and config.get('DB_CACHE', 'db_cache_fixtures'):
+        snapshot.seed(config.get('DB_CACHE', 'db_cache_fixtures'))
+
+
+def rd_sql(server, database, table=None, col_names=None, where_in=None, **kwargs):
+    '''
+    Drop-in replacement for pdsql.mssql.rd_sql. Tables that are part of the snapshot cache are served from the cache, all other
+    requests (and requests using other rd_sql arguments, e.g. a custom stmt) are read from the database.
+    '''
+    if snapshot is not None and table is not None and not kwargs and snapshot.is_cached(server, database, table):
+        return snapshot.rd_sql(server, database, table, col_names=col_names, where_in=where_in)
+    return rd_sql_db(server, database, table, col_names=col_names, where_in=where_in, **kwargs)
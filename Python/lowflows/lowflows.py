@@ -4,11 +4,14 @@
 Functions to process lowflows database bands
 '''
 
-import os, pdsql
+import os
 import pandas as pd
 import numpy as np
 import datetime as dt
 
+from database.query import rd_sql
+from other_functions.weapcsv import format_dates
+
 
 pd.options.display.max_columns = 100
 
@@ -32,7 +35,7 @@ def getBandInfo(config):
     LF_sites = config.get('LOWFLOWS', 'LF_sites').split(',')
     LF_bandNoLinks = config.get('LOWFLOWS', 'LF_bandNoLinks').split(',')
     #-Get the band information from the Hydro database and calculate the months
-    LF_df = pdsql.mssql.rd_sql('sql2012test01', 'Hydro', 'LowFlowRestrSiteBand', col_names = ['site', 'date', 'band_num', 'waterway','location', 'min_trig','max_trig'], where_col = {'site': LF_sites})#, 'date': [bandDate]})
+    LF_df = rd_sql('sql2012test01', 'Hydro', 'LowFlowRestrSiteBand', col_names = ['site', 'date', 'band_num', 'waterway','location', 'min_trig','max_trig'], where_col = {'site': LF_sites})#, 'date': [bandDate]})
     LF_df['month'] = pd.to_datetime(LF_df['date'])
     LF_df['month'] = LF_df['month'].dt.month
     LF_df.drop('date', axis=1, inplace=True)
@@ -91,7 +94,7 @@ def addIRFsite(WEAP, config, LF_df, sdate, edate):
     #siteNames = list(pd.unique(LF_df['waterway']))
     siteNames = list(pd.unique(LF_df['LF_site_name']))
     #-get the IRF lowflow time-series from the database 
-    LF_df = pdsql.mssql.rd_sql('sql2012test01', 'Hydro', 'LowFlowRestrSite', col_names = ['site', 'date', 'waterway','location', 'flow'], where_col = {'site': siteIDs})#, 'date': [bandDate]})
+    LF_df = rd_sql('sql2012test01', 'Hydro', 'LowFlowRestrSite', col_names = ['site', 'date', 'waterway','location', 'flow'], where_col = {'site': siteIDs})#, 'date': [bandDate]})
     #-select only period of interest
     LF_df = LF_df.loc[(LF_df['date']>=sdate) & (LF_df['date']<=edate)]
     
@@ -103,7 +106,7 @@ def addIRFsite(WEAP, config, LF_df, sdate, edate):
         b= b.AddChild('database')
         #-get time-series of site, write to csv
         ts = LF_df.loc[LF_df['site']==ID,['date', 'flow']]
-        ts['date'] = pd.to_datetime(ts['date']).dt.strftime('%d/%m/%Y')
+        ts['date'] = format_dates(pd.to_datetime(ts['date']))
         ts.set_index('date', inplace=True)
         #-write to csv
         ts.to_csv(os.path.join(LF_dir, ID + '_IRF.csv'))
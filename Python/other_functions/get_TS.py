@@ -2,7 +2,9 @@
 
 import datetime as dt
 import pandas as pd
-import pdsql
+
+from database.query import rd_sql
+from other_functions.weapcsv import format_dates
 
 #-Authorship information-###################################################################
 __author__ = 'Wilco Terink'
@@ -43,8 +45,9 @@ class getTimeSeries():
         dtypes = [self.config.getint('TSPROCESSING','DatasetTypeID')]
         csv = self.config.get('TSPROCESSING','Qobs_csv')
 
-        #-days that should be present in the specified period
-        t = pdsql.mssql.rd_sql(self.server, self.database, self.tsDailyTable, col_names = ['ExtSiteID', 'DateTime', 'Value','DatasetTypeID', 'QualityCode'], where_in = {'DatasetTypeID': dtypes, 'ExtSiteID': sites})
+        #-days that should be present in the specified period (filtered on the server, and read in chunks with float32 values)
+        t = rd_sql(self.server, self.database, self.tsDailyTable, col_names = ['ExtSiteID', 'DateTime', 'Value','DatasetTypeID', 'QualityCode'], where_in = {'DatasetTypeID': dtypes, 'ExtSiteID': sites},
+                   from_date=self.sdate.strftime('%Y-%m-%d'), to_date=self.edate.strftime('%Y-%m-%d'), date_col='DateTime', dtypes={'ExtSiteID': 'category', 'Value': 'float32'})
         #-Remove missing values
         t = t.loc[t['QualityCode']!=100]
         t.sort_values(by=['DateTime', 'QualityCode'], ascending=[True, False], inplace=True)
@@ -52,13 +55,13 @@ class getTimeSeries():
         
         
         #-Select records between fmDate and toDate
-        t = t.loc[(t['DateTime']>=self.sdate) & (t['DateTime']<=self.edate)]
+        t['DateTime'] = pd.to_datetime(t['DateTime'])
+        t = t.loc[(t['DateTime']>=pd.Timestamp(self.sdate)) & (t['DateTime']<=pd.Timestamp(self.edate))]
         t = t[['DateTime', 'Value']]
         
         #-rename and organize columns and write to csv
-        t['DateTime'] = pd.to_datetime(t['DateTime'])
         tt = pd.DataFrame()
-        tt['Date'] = t['DateTime'].dt.strftime('%d/%m/%Y')
+        tt['Date'] = format_dates(t['DateTime'])
         tt['Q [m3/s]'] = t['Value']
         tt.to_csv(csv, index=False) 
 
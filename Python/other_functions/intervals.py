@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+
+'''
+Activity of records (consents or consent/WAP combinations) that are active between fmDate and toDate, and optionally only in the
+months from from_month up to and including to_month. The interval tables are written by the model build (consents/activity.py)
+and read by the results scripts (results/extract.py), so both use the functions below. This module should therefore also run
+on Python 2.
+'''
+
+import pandas as pd
+import numpy as np
+import os
+
+#-Authorship information-###################################################################
+__author__ = 'Wilco Terink'
+__copyright__ = 'Wilco Terink'
+__version__ = '1.0'
+__email__ = 'wilco.terink@ecan.govt.nz'
+__date__ ='August 2020'
+############################################################################################
+
+#-Columns of the interval table
+interval_cols = ['fmDate', 'toDate', 'from_month', 'to_month']
+#-Date format of fmDate and toDate in the interval csv-file
+interval_date_format = '%Y-%m-%d'
+
+
+def interval_file(csv_file):
+    '''
+    Csv-file with the intervals that belongs to the dense activity csv_file.
+    '''
+    return os.path.splitext(csv_file)[0] + '_intervals.csv'
+
+
+def write_intervals(df, csv_file):
+    '''
+    Write the interval table df (the record names as index) to csv_file.
+    '''
+    df = df.copy()
+    for c in ['fmDate', 'toDate']:
+        df[c] = pd.to_datetime(df[c]).dt.strftime(interval_date_format)
+    df.to_csv(csv_file, index_label='Name')
+
+
+def read_intervals(csv_file):
+    '''
+    Read the interval table that was written with write_intervals. Returns a DataFrame with the record names as index.
+    '''
+    df = pd.read_csv(csv_file, index_col=0)
+    for c in ['fmDate', 'toDate']:
+        df[c] = pd.to_datetime(df[c], format=interval_date_format)
+    return df
+
+
+def month_window(month, from_month, to_month):
+    '''
+    Returns True where month is in the window from from_month up to and including to_month. The window is within a year if
+    from_month <= to_month, and wraps around the end of the year otherwise. Missing months are never in the window. The arguments
+    are broadcast against each other.
+    '''
+    fm_m = pd.to_numeric(pd.Series(np.ravel(from_month)), errors='coerce').values.astype(float).reshape(np.shape(from_month))
+    to_m = pd.to_numeric(pd.Series(np.ravel(to_month)), errors='coerce').values.astype(float).reshape(np.shape(to_month))
+    inside = np.where(fm_m <= to_m, (month >= fm_m) & (month <= to_m), (month >= fm_m) | (month <= to_m))
+    return inside & ~np.isnan(fm_m) & ~np.isnan(to_m)
+
+
+def active_matrix(dates, fmDate, toDate, from_month=None, to_month=None):
+    '''
+    Returns a uint8 array (dates x records) with 1 if the record is active on the date and 0 otherwise. A record is active between
+    fmDate and toDate (inclusive), and if from_month and to_month are given, only in the months from from_month up to and including
+    to_month (e.g. from_month=10 and to_month=4 is October to April). Records with missing dates or months are never active.
+    '''
+    d = np.asarray(dates, dtype='datetime64[ns]')[:, None]
+    fm = pd.to_datetime(pd.Series(fmDate)).values.astype('datetime64[ns]')
+    to = pd.to_datetime(pd.Series(toDate)).values.astype('datetime64[ns]')
+    #-NaT compares as False, so records without dates are inactive
+    active = (d >= fm) & (d <= to)
+    if from_month is not None:
+        active &= month_window(pd.DatetimeIndex(dates).month.values[:, None], from_month, to_month)
+    return active.view(np.uint8)
+
+
+class DateIntervalIndex():
+    '''
+    Index over the date intervals (fmDate, toDate; both inclusive) of the records of a table (e.g. crc_df or the interval table) for
+    "active on date" and "active in period" queries. The start and end dates are kept sorted, so the records that start before the end
+    of the period and the records that end after the start of the period are found by binary search, and only the smaller of the two
+    sets is checked against the other end. Queries return positional indices (sorted), to be used with .iloc or on the numpy arrays of the table.
+    Records with a missing fmDate or toDate, or a toDate before the fmDate, are never active.
+
+    Usage:
+        index = DateIntervalIndex(crc_df['fmDate'], crc_df['toDate'])
+        crc_df.iloc[index.active(sdate, edate)]
+    '''
+
+    def __init__(self, fmDate, toDate):
+        self.fm = pd.to_datetime(pd.Series(fmDate)).values.astype('datetime64[ns]')
+        self.to = pd.to_datetime(pd.Series(toDate)).values.astype('datetime64[ns]')
+        valid = np.flatnonzero(~np.isnat(self.fm) & ~np.isnat(self.to) & (self.fm <= self.to))
+        self.by_fm = valid[np.argsort(self.fm[valid], kind='mergesort')]
+        self.by_to = valid[np.argsort(self.to[valid], kind='mergesort')]
+        self.fm_sorted = self.fm[self.by_fm]
+        self.to_sorted = self.to[self.by_to]
+
+    def __len__(self):
+        return len(self.fm)
+
+    def bounds(self, sdate, edate):
+        s = np.datetime64(pd.Timestamp(sdate), 'ns')
+        e = s if edate is None else np.datetime64(pd.Timestamp(edate), 'ns')
+        #-records with fmDate <= e are by_fm[:i], records with toDate >= s are by_to[j:]
+        i = np.searchsorted(self.fm_sorted, e, side='right')
+        j = np.searchsorted(self.to_sorted, s, side='left')
+        return s, e, i, j
+
+    def active(self, sdate, edate=None):
+        '''
+        Positional indices of the records that are active on sdate (edate is None), or on at least one day between sdate and edate.
+        '''
+        s, e, i, j = self.bounds(sdate, edate)
+        if i <= len(self.by_to) - j:
+            pos = self.by_fm[:i]
+            pos = pos[self.to[pos] >= s]
+        else:
+            pos = self.by_to[j:]
+            pos = pos[self.fm[pos] <= e]
+        return np.sort(pos)
+
+    def count(self, sdate, edate=None):
+        '''
+        Number of records that are active on sdate (edate is None), or on at least one day between sdate and edate. Records that end
+        before sdate also start before edate, so these are subtracted from the records that start before edate.
+        '''
+        s, e, i, j = self.bounds(sdate, edate)
+        return int(i - j)
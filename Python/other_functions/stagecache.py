@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+
+'''
+Memoization of the stages of the model build that produce files (e.g. the consent extraction from the databases). Each stage declares
+the config settings and input files it depends on, the stages it depends on, and the output files it writes. A stage is only run
+again if one of these changed since the last run, or if one of its output files changed or is missing. Otherwise the outputs of the
+last run are reused.
+'''
+
+import hashlib, json, os, time
+
+#-Authorship information-###################################################################
+__author__ = 'Wilco Terink'
+__copyright__ = 'Wilco Terink'
+__version__ = '1.0'
+__email__ = 'wilco.terink@ecan.govt.nz'
+__date__ ='August 2020'
+############################################################################################
+
+
+class StageCache():
+
+    def __init__(self, cache_file, config, enabled=True):
+        '''
+        cache_file: json-file in which the hashes of the stages are recorded
+        config: the config file (RawConfigParser) of the model build
+        enabled: if False, then all stages are always run, without hashing files or recording anything
+        '''
+        self.cache_file = cache_file
+        self.config = config
+        self.enabled = enabled
+        self.stages = {}
+        if os.path.isfile(cache_file):
+            with open(cache_file) as f:
+                self.stages = json.load(f)
+        #-Hashes of the stages that were checked or run during this run, used by the stages that depend on them
+        self.current = {}
+
+    def run(self, name, func, config_keys=None, inputs=None, outputs=None, depends=None, load=None, max_age=None):
+        '''
+        Run stage 'name' by calling func(), unless nothing changed since the last run of the stage, in which case load() is called
+        (if given) to restore what func() would set from the outputs.
+            config_keys: list with section names (all options of a section) or (section, option) tuples the stage depends on
+            inputs: list with input files
+            outputs: list with output files, or a function that returns this list (for outputs that are only known from another
+                     output, e.g. the shards listed in a manifest). It is called before the check, and again after func() is run.
+            depends: list with names of stages that were run (or reused) before and that this stage depends on
+            max_age: maximum age [hours] of the outputs (e.g. for data from a database that changes over time). None = no maximum
+        Returns True if the stage was run, and False if the outputs of the last run were reused.
+        '''
+        if not self.enabled:
+            func()
+            return True
+
+        key = self.stage_hash(config_keys or [], inputs or [], depends or [])
+        output_list = outputs if callable(outputs) else lambda: outputs or []
+        last = self.stages.get(name)
+        expired = max_age is not None and last is not None and (time.time() - last.get('time', 0)) > max_age * 3600.
+        if last is not None and not expired and last['key'] == key and all(os.path.isfile(f) and file_hash(f) == last['outputs'].get(f) for f in output_list()):
+            print('Stage "%s" is unchanged since the last run; reusing its outputs.' %name)
+            self.current[name] = key
+            if load is not None:
+                load()
+            return False
+
+        print('Running stage "%s"...' %name)
+        func()
+        self.stages[name] = {'key': key, 'time': time.time(), 'outputs': dict((f, file_hash(f)) for f in output_list() if os.path.isfile(f))}
+        self.current[name] = key
+        self.save()
+        return True
+
+    def stage_hash(self, config_keys, inputs, depends):
+        '''
+        Hash of the config settings, the contents of the input files, and the hashes of the stages this stage depends on.
+        '''
+        h = hashlib.md5()
+        for k in config_keys:
+            if isinstance(k, tuple):
+                items = [(k[1], self.config.get(k[0], k[1]) if self.config.has_option(k[0], k[1]) else None)]
+            else:
+                items = sorted(self.config.items(k)) if self.config.has_section(k) else []
+            h.update(repr((k, items)).encode('utf-8'))
+        for f in inputs:
+            h.update(repr((f, file_hash(f) if os.path.isfile(f) else None)).encode('utf-8'))
+        for d in depends:
+            h.update(repr((d, self.current.get(d))).encode('utf-8'))
+        return h.hexdigest()
+
+    def save(self):
+        with open(self.cache_file, 'w') as f:
+            json.dump(self.stages, f, indent=4)
+
+
+def file_hash(f):
+    '''
+    MD5 hash of the contents of file f.
+    '''
+    h = hashlib.md5()
+    with open(f, 'rb') as fh:
+        for chunk in iter(lambda: fh.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
@@ -0,0 +1,202 @@
+# -*- coding: utf-8 -*-
+
+'''
+Reading and writing of the daily csv-files that are read by WEAP with ReadFromFile. These have the dates as dd/mm/yyyy in the first
+column, followed by one column per time-series. Dates of daily periods are formatted once per period and reused, other dates are
+formatted and parsed once per unique date with the exact format, and time-series with single digit values (e.g. the 0/1 consent
+activity) are written directly as bytes. The files are the same as the ones written by pandas.
+'''
+
+import pandas as pd
+import numpy as np
+import os, json
+from collections import OrderedDict
+
+#-Authorship information-###################################################################
+__author__ = 'Wilco Terink'
+__copyright__ = 'Wilco Terink'
+__version__ = '1.0'
+__email__ = 'wilco.terink@ecan.govt.nz'
+__date__ ='August 2020'
+############################################################################################
+
+#-Date format of the csv-files
+date_format = '%d/%m/%Y'
+#-Formatted dates of daily periods, with (first date, number of days) as key. Only the last max_periods periods are kept.
+formatted_periods = OrderedDict()
+max_periods = 8
+#-Number of rows that are converted to bytes at once by the fast writer
+write_rows = 1000
+
+
+def format_dates(dates):
+    '''
+    Returns the dates formatted as dd/mm/yyyy. If dates is a Series, then a Series with the same index is returned, otherwise a numpy
+    array (a new one for each call, so it can be changed by the caller). Missing dates are returned as nan.
+    '''
+    index = dates.index if isinstance(dates, pd.Series) else None
+    d = pd.DatetimeIndex(dates)
+    if len(d) > 1 and not d.hasnans and (np.diff(d.normalize().values) == np.timedelta64(1, 'D')).all():
+        #-daily period
+        key = (d[0].normalize(), len(d))
+        if key not in formatted_periods:
+            formatted_periods[key] = np.asarray(d.strftime(date_format), dtype=object)
+            if len(formatted_periods) > max_periods:
+                formatted_periods.popitem(last=False)
+        out = formatted_periods[key].copy()
+    else:
+        #-format each unique date once (code -1 is a missing date)
+        codes, uniques = pd.factorize(d)
+        out = np.append(np.asarray(pd.DatetimeIndex(uniques).strftime(date_format), dtype=object), np.nan)[codes]
+    if index is not None:
+        return pd.Series(out, index=index, name=dates.name)
+    return out
+
+
+def parse_dates(values):
+    '''
+    Returns the dd/mm/yyyy strings in values as DatetimeIndex. Each unique string is parsed once with the exact format. If the strings
+    are in another format (e.g. files that were not written by the model build), then they are parsed with dayfirst=True.
+    '''
+    codes, uniques = pd.factorize(np.asarray(values))
+    try:
+        parsed = pd.to_datetime(uniques, format=date_format)
+    except (ValueError, TypeError):
+        parsed = pd.to_datetime(uniques, dayfirst=True)
+    parsed = np.asarray(parsed.values)
+    return pd.DatetimeIndex(np.append(parsed, np.array(['NaT'], dtype=parsed.dtype))[codes])
+
+
+def read_weap_csv(csv_file, index_col=0, **kwargs):
+    '''
+    Read a csv-file with dates (dd/mm/yyyy) in index_col. Returns a DataFrame with the dates as index (DatetimeIndex). Same as
+    pd.read_csv(csv_file, index_col=index_col, parse_dates=True, dayfirst=True, **kwargs).
+    '''
+    df = pd.read_csv(csv_file, index_col=index_col, **kwargs)
+    df.index = parse_dates(df.index).rename(df.index.name)
+    return df
+
+
+def write_weap_csv(df, csv_file, index_label='Date', **kwargs):
+    '''
+    Write df, with the dates as index (DatetimeIndex), to csv_file with the dates as dd/mm/yyyy in the first column (named index_label).
+    Other keyword arguments are passed on to DataFrame.to_csv.
+    '''
+    dates = format_dates(df.index)
+    if not kwargs and len(df.columns) > 0 and not pd.isnull(dates).any() and single_digits(df):
+        write_digits(df, dates, csv_file, index_label)
+        return
+    out = df.copy(deep=False)
+    out.index = pd.Index(dates, name=index_label)
+    out.to_csv(csv_file, **kwargs)
+
+
+def single_digits(df):
+    '''
+    Returns True if all columns of df are integers (or booleans) between 0 and 9.
+    '''
+    if not all(np.issubdtype(t, np.integer) or np.issubdtype(t, np.bool_) for t in df.dtypes):
+        return False
+    values = df.to_numpy()
+    return values.size == 0 or (values.min() >= 0 and values.max() <= 9)
+
+
+def write_digits(df, dates, csv_file, index_label):
+    '''
+    Write the single digit values of df with the formatted dates as bytes, in blocks of write_rows rows.
+    '''
+    #-The header and line terminator are taken from pandas, so the file is the same as the one written by to_csv
+    header = pd.DataFrame(columns=df.columns, index=pd.Index([], name=index_label)).to_csv()
+    eol = '\r\n' if header.endswith('\r\n') else '\n'
+    ncols = len(df.columns)
+    width = 10 + 2 * ncols + len(eol)
+    values = df.to_numpy().astype(np.uint8)
+    with open(csv_file, 'wb') as f:
+        f.write(header.encode('utf-8'))
+        for s in range(0, len(df), write_rows):
+            e = min(s + write_rows, len(df))
+            buf = np.empty((e - s, width), dtype=np.uint8)
+            buf[:, :10] = np.frombuffer(np.asarray(dates[s:e], dtype='S10').tobytes(), dtype=np.uint8).reshape(e - s, 10)
+            buf[:, 10:10 + 2 * ncols:2] = ord(',')
+            buf[:, 11:11 + 2 * ncols:2] = values[s:e] + ord('0')
+            buf[:, 10 + 2 * ncols:] = np.frombuffer(eol.encode('ascii'), dtype=np.uint8)
+            f.write(buf.tobytes())
+
+
+def manifest_file(csv_file):
+    '''
+    Manifest (json-file) of the shards of csv_file.
+    '''
+    return os.path.splitext(csv_file)[0] + '_manifest.json'
+
+
+def write_weap_csv_shards(df, csv_file, shard_size, groups=None):
+    '''
+    Write the columns of df (dates as index) to narrow csv-files (shards) with the same name as csv_file followed by _1, _2, etc., with at
+    most shard_size columns each, so WEAP does not have to read very wide rows for each ReadFromFile. Columns of the same group (groups is
+    a list with a group for each column, e.g. the consent) are written to the same shard, even if that shard gets more than shard_size
+    columns. A manifest with the file and column number of each column (and the file of each group) is written as well, and returned.
+    If shard_size is 0, then the shards and manifest of a previous run are removed and None is returned.
+    '''
+    old = read_manifest(csv_file)
+    if shard_size <= 0:
+        if old is not None:
+            remove_files(old['files'] + [manifest_file(csv_file)])
+        return None
+
+    if groups is None:
+        groups = list(df.columns)
+    #-Positions of the columns of each group, in order of the first column of the group
+    group_pos = pd.Series(np.arange(len(df.columns))).groupby(np.asarray(groups), sort=False).apply(list)
+    #-Groups are added to a shard until it is full
+    shards = [[]]
+    for g, pos in group_pos.items():
+        if shards[-1] and len(shards[-1]) + len(pos) > shard_size:
+            shards.append([])
+        shards[-1].extend(pos)
+
+    base, ext = os.path.splitext(csv_file)
+    manifest = {'source': csv_file, 'files': [], 'columns': {}, 'groups': {}}
+    for i, pos in enumerate(shards):
+        f = '%s_%d%s' %(base, i + 1, ext)
+        write_weap_csv(df.iloc[:, pos], f)
+        manifest['files'].append(f)
+        for j, c in enumerate(df.columns[pos]):
+            manifest['columns'][str(c)] = [f, j + 1]
+        for g in pd.unique(np.asarray(groups)[pos]):
+            manifest['groups'][str(g)] = f
+    #-Remove shards of a previous run that are not used anymore
+    if old is not None:
+        remove_files([f for f in old['files'] if f not in manifest['files']])
+    with open(manifest_file(csv_file), 'w') as f:
+        json.dump(manifest, f, indent=4)
+    return manifest
+
+
+def read_manifest(csv_file):
+    '''
+    Returns the manifest of the shards of csv_file, or None if it was not written to shards.
+    '''
+    f = manifest_file(csv_file)
+    if not os.path.isfile(f):
+        return None
+    with open(f) as fh:
+        return json.load(fh)
+
+
+def read_columns(csv_file):
+    '''
+    Returns a dictionary with the file and column number (as used in ReadFromFile) of each column that was written to csv_file. These
+    are taken from the manifest if the columns were written to shards, and from the header of csv_file otherwise.
+    '''
+    manifest = read_manifest(csv_file)
+    if manifest is not None:
+        return dict((c, tuple(v)) for c, v in manifest['columns'].items())
+    cols = pd.read_csv(csv_file, index_col=0, nrows=0).columns
+    return dict((str(c), (csv_file, i + 1)) for i, c in enumerate(cols))
+
+
+def remove_files(files):
+    for f in files:
+        if os.path.isfile(f):
+            os.remove(f)
@@ -9,6 +9,8 @@ import groundwater
 import consented
 import RIRF_WCO
 import coleridge
+import compliance
+import extract
 
 #-Authorship information-###################################################################
 __author__ = 'Wilco Terink'
@@ -26,129 +28,169 @@ again, so it is assumed that all results of the last run are correct. It uses th
 config = ConfigParser.RawConfigParser()
 config.read('results.cfg')
 
-area = config.get('GENERAL', 'Area')
-scenario = config.get('GENERAL', 'Scenario')
-scenarioName = config.get('GENERAL', 'Scenario_name')
+# Scenarios to extract results for: a list of (area, scenario, name) tuples. If 'Scenarios' is empty, then only Area/Scenario/Scenario_name are used.
+scenarios = []
+if config.has_option('GENERAL', 'Scenarios') and config.get('GENERAL', 'Scenarios').strip():
+    for s in config.get('GENERAL', 'Scenarios').split(';'):
+        if s.strip():
+            scenarios.append(tuple(x.strip() for x in s.split(',')))
+else:
+    scenarios.append((config.get('GENERAL', 'Area'), config.get('GENERAL', 'Scenario'), config.get('GENERAL', 'Scenario_name')))
 
 WEAP = win32com.client.Dispatch('WEAP.WEAPApplication')
 
-WEAP.ActiveArea = area
-WEAP.ActiveScenario = scenario
-
 # Period to analyse
 sYear = config.getint('GENERAL', 'syear')
 eYear = config.getint('GENERAL', 'eyear')
 
 # Get the consents dataframe and only keep the records that are in the SWAZs below Fighting Hill and only keep surface and groundwater takes
 crc_csv = config.get('GENERAL', 'crc_csv')
-crc_df = pd.read_csv(crc_csv)
+crc_df = extract.readConsents(crc_csv)
 keep_SWAZ = config.get('GENERAL', 'keep_SWAZ').split(',')
 crc_df = crc_df.loc[crc_df.SWAZ.isin(keep_SWAZ)]
 crc_df = crc_df.loc[crc_df['Activity'].isin(['Take Surface Water', 'Take Groundwater']), ['crc', 'Activity', 'SWAZ', 'wap', 'wap_name_long', 'in_sw_allo']]
 
-# Get time-series of wap/crc active
-active_crcwap_ts = pd.read_csv(config.get('GENERAL', 'active_csv'), parse_dates=[0], index_col=0, dayfirst=True)
-
-# Streamflow ####################################################################
-
-# Report streamflow?
-report_streamflow = config.getint('STREAMFLOW', 'get_streamflow')
-if report_streamflow:
-    print('Extracting streamflow simulations...')
-    streamflow.getStreamflowTS(WEAP, config, sYear, eYear, scenario, scenarioName)
-
-# SW takes ######################################################################
-
-# Get consented sw takes
-sw_consented_flag = config.getint('SW_TAKES', 'sw_consented_flag')
-if sw_consented_flag:
-    print('Extracting consented surface water takes...')
-    consented.getConsented(WEAP, config, sYear, eYear, scenarioName, 'SW', crc_df, active_crcwap_ts)
-
-# Get maximum allowed sw take (restriction daily volume)
-sw_restriction_flag = config.getint('SW_TAKES', 'sw_restriction_flag')
-if sw_restriction_flag:
-    print('Extracting restriction daily volume for surface water takes...')
-    consented.getRestrictionVolume(WEAP, config, sYear, eYear, scenario, scenarioName, 'SW', crc_df)
-
-# Get abstracted sw (Supplied daily volume)
-sw_abstracted_flag = config.getint('SW_TAKES', 'sw_abstracted_flag')
-if sw_abstracted_flag:
-    print('Extracting surface water abstractions...')
-    consented.getAbstraction(WEAP, config, sYear, eYear, scenario, scenarioName, 'SW', crc_df)
-
-# GW takes ######################################################################
-
-# Get consented gw takes?
-gw_consented_flag = config.getint('GW_TAKES', 'gw_consented_flag')
-if gw_consented_flag:
-    print('Extracting consented groundwater takes...')
-    consented.getConsented(WEAP, config, sYear, eYear, scenarioName, 'GW', crc_df, active_crcwap_ts)
-
-# Get maximum allowed gw take (restriction daily volume)
-gw_restriction_flag = config.getint('GW_TAKES', 'gw_restriction_flag')
-if gw_restriction_flag:
-    print('Extracting restriction daily volume for groundwater takes...')
-    consented.getRestrictionVolume(WEAP, config, sYear, eYear, scenario, scenarioName, 'GW', crc_df)
-
-# Get abstracted gw (Supplied daily volume)
-gw_abstracted_flag = config.getint('GW_TAKES', 'gw_abstracted_flag')
-if gw_abstracted_flag:
-    print('Extracting groundwater abstractions...')
-    consented.getAbstraction(WEAP, config, sYear, eYear, scenario, scenarioName, 'GW', crc_df)
-
-# Get stream depletion
-stream_depletion_flag = config.getint('GW_TAKES', 'stream_depletion_flag')
-if stream_depletion_flag:
-    print('Extracting stream depletion time-series...')
-    SD_ts = pd.read_csv(config.get('GW_TAKES', 'SD_results_csv'), parse_dates=[0], index_col=0, dayfirst=True)
-    SD_ts.index.name = 'Date'
-    consented.getStreamDepletion(config, sYear, eYear, scenarioName, SD_ts)
-
-# Get natural losses from river to groundwater #################################
-
-# Get natural river loss to groundwater?
-get_natural_GW_loss_flag = config.get('GW_LOSS', 'get_natural_GW_loss_flag')
-if get_natural_GW_loss_flag:
-    print('Getting the natural river losses to groundwater...')
-    groundwater.getNaturalLossGW(WEAP, config, sYear, eYear, scenario, scenarioName)
-
-# Band allocation ###############################################################
-
-# Get allocated percentage per band for each day?
-band_allocated_flag = config.getint('BAND_ALLOCATED', 'band_allocated_flag')
-if band_allocated_flag:
-    print('Extracting allocated percentage per band...')
-    consented.getBandAllocated(WEAP, config, sYear, eYear, scenario, scenarioName)
-
-# RIRF and WCO ###############################################################
-
-# Get RIRF per day
-RIRF_flag = config.getint('RIRF_WCO', 'RIRF_flag')
-if RIRF_flag:
-    print('Extracting RIRF...')
-    RIRF_WCO.getRIRF(WEAP, config, sYear, eYear, scenario, scenarioName)
-
-# Get WCO max per day
-WCOmax_flag = config.getint('RIRF_WCO', 'WCOmax_flag')
-if WCOmax_flag:
-    print('Extracting WCOmax...')
-    RIRF_WCO.getWCOmax(WEAP, config, sYear, eYear, scenario, scenarioName)
-
-# Compare WCOmin with simulated streamflow at different locations in the river
-WCO_streamflow_comparison_flag = config.getint('RIRF_WCO', 'WCO_streamflow_comparison_flag')
-if WCO_streamflow_comparison_flag:
-    print('Extracting WCOmin and streamflow simulations...')
-    RIRF_WCO.getWCOStreamflow(WEAP, config, sYear, eYear, scenario, scenarioName)
-
-# LAKE COLERIDGE #################################################################
-
-# Get time-series of lake coleridge
-get_lake_data_flag = config.getint('LAKE', 'get_lake_data_flag')
-if get_lake_data_flag:
-    print('Extracting time-series for Lake Coleridge...')
-    coleridge.getLakeTS(WEAP, config, sYear, eYear, scenario, scenarioName)
-    
-    
-    
-
+# Get time-series (or intervals) of wap/crc active
+active_crcwap_ts = extract.readActive(config.get('GENERAL', 'active_csv'))
+
+# Streamflow simulations and WCOmin for each scenario name, used to compare the compliance with WCOmin between scenarios
+wco_sims = {}
+
+# The crc/wap branches to extract and the weighted proRata of the consented takes are the same for all scenarios, so these are
+# only created once per take type (with the area of the first scenario active)
+WEAP.ActiveArea = scenarios[0][0]
+takes = {}
+for take_type in ['SW', 'GW']:
+    section = take_type + '_TAKES'
+    prefix = take_type.lower()
+    takes[take_type] = {}
+    if config.getint(section, prefix + '_consented_flag'):
+        takes[take_type]['consented'] = consented.getConsentedWeights(WEAP, crc_df, take_type)
+    if config.getint(section, prefix + '_restriction_flag'):
+        takes[take_type]['restriction'] = consented.getConsentJobs(crc_df, take_type, 'Restriction daily volume')
+    if config.getint(section, prefix + '_abstracted_flag'):
+        takes[take_type]['abstracted'] = consented.getConsentJobs(crc_df, take_type, 'Supplied daily volume')
+
+
+def extractScenario(area, scenario, scenarioName, takes):
+
+    """
+    Extract the results for one scenario. The consents, active time-series, crc/wap branches and weights (takes), and WEAP object are
+    shared by all scenarios.
+    """
+
+    WEAP.ActiveArea = area
+    WEAP.ActiveScenario = scenario
+
+    # Streamflow ####################################################################
+
+    # Report streamflow?
+    report_streamflow = config.getint('STREAMFLOW', 'get_streamflow')
+    streamflow_sim_df = None
+    if report_streamflow:
+        print('Extracting streamflow simulations...')
+        streamflow_sim_df = streamflow.getStreamflowTS(WEAP, config, sYear, eYear, scenario, scenarioName)
+
+    # SW takes ######################################################################
+
+    # Get consented sw takes
+    sw_consented_flag = config.getint('SW_TAKES', 'sw_consented_flag')
+    if sw_consented_flag:
+        print('Extracting consented surface water takes...')
+        consented.getConsented(WEAP, config, sYear, eYear, scenarioName, 'SW', crc_df, active_crcwap_ts, takes['SW']['consented'])
+
+    # Get maximum allowed sw take (restriction daily volume)
+    sw_restriction_flag = config.getint('SW_TAKES', 'sw_restriction_flag')
+    if sw_restriction_flag:
+        print('Extracting restriction daily volume for surface water takes...')
+        consented.getRestrictionVolume(WEAP, config, sYear, eYear, scenario, scenarioName, 'SW', crc_df, takes['SW']['restriction'])
+
+    # Get abstracted sw (Supplied daily volume)
+    sw_abstracted_flag = config.getint('SW_TAKES', 'sw_abstracted_flag')
+    if sw_abstracted_flag:
+        print('Extracting surface water abstractions...')
+        consented.getAbstraction(WEAP, config, sYear, eYear, scenario, scenarioName, 'SW', crc_df, takes['SW']['abstracted'])
+
+    # GW takes ######################################################################
+
+    # Get consented gw takes?
+    gw_consented_flag = config.getint('GW_TAKES', 'gw_consented_flag')
+    if gw_consented_flag:
+        print('Extracting consented groundwater takes...')
+        consented.getConsented(WEAP, config, sYear, eYear, scenarioName, 'GW', crc_df, active_crcwap_ts, takes['GW']['consented'])
+
+    # Get maximum allowed gw take (restriction daily volume)
+    gw_restriction_flag = config.getint('GW_TAKES', 'gw_restriction_flag')
+    if gw_restriction_flag:
+        print('Extracting restriction daily volume for groundwater takes...')
+        consented.getRestrictionVolume(WEAP, config, sYear, eYear, scenario, scenarioName, 'GW', crc_df, takes['GW']['restriction'])
+
+    # Get abstracted gw (Supplied daily volume)
+    gw_abstracted_flag = config.getint('GW_TAKES', 'gw_abstracted_flag')
+    if gw_abstracted_flag:
+        print('Extracting groundwater abstractions...')
+        consented.getAbstraction(WEAP, config, sYear, eYear, scenario, scenarioName, 'GW', crc_df, takes['GW']['abstracted'])
+
+    # Get stream depletion
+    stream_depletion_flag = config.getint('GW_TAKES', 'stream_depletion_flag')
+    if stream_depletion_flag:
+        print('Extracting stream depletion time-series...')
+        SD_ts = extract.read_weap_csv(config.get('GW_TAKES', 'SD_results_csv'))
+        SD_ts.index.name = 'Date'
+        consented.getStreamDepletion(config, sYear, eYear, scenarioName, SD_ts)
+
+    # Get natural losses from river to groundwater #################################
+
+    # Get natural river loss to groundwater?
+    get_natural_GW_loss_flag = config.get('GW_LOSS', 'get_natural_GW_loss_flag')
+    if get_natural_GW_loss_flag:
+        print('Getting the natural river losses to groundwater...')
+        groundwater.getNaturalLossGW(WEAP, config, sYear, eYear, scenario, scenarioName)
+
+    # Band allocation ###############################################################
+
+    # Get allocated percentage per band for each day?
+    band_allocated_flag = config.getint('BAND_ALLOCATED', 'band_allocated_flag')
+    if band_allocated_flag:
+        print('Extracting allocated percentage per band...')
+        consented.getBandAllocated(WEAP, config, sYear, eYear, scenario, scenarioName)
+
+    # RIRF and WCO ###############################################################
+
+    # Get RIRF per day
+    RIRF_flag = config.getint('RIRF_WCO', 'RIRF_flag')
+    if RIRF_flag:
+        print('Extracting RIRF...')
+        RIRF_WCO.getRIRF(WEAP, config, sYear, eYear, scenario, scenarioName)
+
+    # Get WCO max per day
+    WCOmax_flag = config.getint('RIRF_WCO', 'WCOmax_flag')
+    if WCOmax_flag:
+        print('Extracting WCOmax...')
+        RIRF_WCO.getWCOmax(WEAP, config, sYear, eYear, scenario, scenarioName)
+
+    # Compare WCOmin with simulated streamflow at different locations in the river
+    WCO_streamflow_comparison_flag = config.getint('RIRF_WCO', 'WCO_streamflow_comparison_flag')
+    if WCO_streamflow_comparison_flag:
+        print('Extracting WCOmin and streamflow simulations...')
+        wco_sims[scenarioName] = RIRF_WCO.getWCOStreamflow(WEAP, config, sYear, eYear, scenario, scenarioName, streamflow_sim_df)
+
+    # LAKE COLERIDGE #################################################################
+
+    # Get time-series of lake coleridge
+    get_lake_data_flag = config.getint('LAKE', 'get_lake_data_flag')
+    if get_lake_data_flag:
+        print('Extracting time-series for Lake Coleridge...')
+        coleridge.getLakeTS(WEAP, config, sYear, eYear, scenario, scenarioName)
+
+
+# Extract the scenarios back to back
+for area, scenario, scenarioName in scenarios:
+    print('Extracting results for %s: %s (%s)...' % (area, scenario, scenarioName))
+    extractScenario(area, scenario, scenarioName, takes)
+
+# Compare the compliance with WCOmin for all scenarios in one go
+if len(wco_sims) > 1:
+    print('Comparing the compliance with WCOmin between scenarios...')
+    outF = os.path.join(config.get('GENERAL', 'resultsDir'), config.get('RIRF_WCO', 'WCO_compliance_scenarios_csv'))
+    compliance.compareScenarios(wco_sims).to_csv(outF)
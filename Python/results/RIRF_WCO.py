@@ -4,6 +4,9 @@ import pandas as pd
 import datetime as dt
 import calendar, os
 
+import compliance
+from extract import getCalendar, getResultValues, read_weap_csv
+
 #-Authorship information-###################################################################
 __author__ = 'Wilco Terink'
 __copyright__ = 'Wilco Terink'
@@ -95,54 +98,49 @@ def getWCOmax(WEAP, config, syear, eyear, scenario, scenario_name):
     final_df.to_csv(outF)
 
 
-def getWCOStreamflow(WEAP, config, syear, eyear, scenario, scenario_name):
+def getWCOStreamflow(WEAP, config, syear, eyear, scenario, scenario_name, streamflow_sim_df=None):
 
     """
-    Get daily WCO min. and streamflow at certain locations and write to csv file
+    Get daily WCO min. and streamflow at certain locations and write to csv file. If streamflow_sim_df (streamflow simulations
+    as returned by streamflow.getStreamflowTS) is not given, then the simulations are read from the streamflow csv-file.
+    The compliance of the streamflow with WCOmin (days below, exceedance frequency, deficit volume and run lengths) is written
+    to a separate csv-file. Returns the streamflow simulations and WCOmin, so scenarios can be compared afterwards.
     """
 
     resultsDir = config.get('GENERAL', 'resultsDir')
 
     if len(scenario_name) > 0:
         outF = os.path.join(resultsDir, scenario_name + '_' + config.get('RIRF_WCO', 'WCO_streamflow_csv'))
+        complianceF = os.path.join(resultsDir, scenario_name + '_' + config.get('RIRF_WCO', 'WCO_compliance_csv'))
         inF = os.path.join(resultsDir, scenario_name + '_' + config.get('STREAMFLOW', 'streamflow_csv'))
     else:
         outF = os.path.join(resultsDir, config.get('RIRF_WCO', 'WCO_streamflow_csv'))
+        complianceF = os.path.join(resultsDir, config.get('RIRF_WCO', 'WCO_compliance_csv'))
         inF = os.path.join(resultsDir, config.get('STREAMFLOW', 'streamflow_csv'))
 
     WCOmin_branch = WEAP.Branch(config.get('RIRF_WCO', 'WCOmin_branch')).FullName
 
-    # File with streamflow simulations
-    streamflow_sim_df = pd.read_csv(inF, parse_dates=[0], index_col=0, dayfirst=True)
-    sites = streamflow_sim_df.columns
-
-    # Final dataframe
-    final_df = streamflow_sim_df.copy()
-
-    # Initialize the time-loop
-    cDate = dt.date(syear, 1, 1)
-    eDate = dt.date(eyear, 12, 31)
-    while cDate <= eDate:
-        # Calculate the day number of the year
-        dayOfYear = cDate.timetuple().tm_yday
-
-        # Is current date not a leap year? If that is true, then dates after 28 February should have a day of the year + 1 day (WEAP always has 366 time-steps)
-        leapY = calendar.isleap(cDate.year)
-        if not leapY:
-            if cDate > dt.date(cDate.year, 2, 28):
-                dayOfYear += 1
-        # Extract the value and convert to %
-        svalue = WEAP.ResultValue(WCOmin_branch, cDate.year, dayOfYear, scenario)
-        final_df.loc[pd.Timestamp(cDate), 'WCOmin [m3/s]'] = svalue
-
-        # Increment date with one day
-        cDate += dt.timedelta(days=1)
-
-    # Calculate the difference between the simualated streamflow and WCOmin
-    for s in sites:
-        colName = s + ' - WCOmin [m3/s]'
-        final_df[colName] = final_df[s] - final_df['WCOmin [m3/s]']
-
+    # Streamflow simulations
+    if streamflow_sim_df is None:
+        streamflow_sim_df = read_weap_csv(inF)
+    streamflow_sim_df = streamflow_sim_df.astype(float)
+    dates, years, timesteps = getCalendar(syear, eyear)
+
+    # WCOmin for the whole period
+    WCOmin = pd.Series(getResultValues(WEAP, WCOmin_branch, years, timesteps, scenario), index=dates, name='WCOmin [m3/s]')
+
+    # Final dataframe with the rows of the streamflow simulations, followed by the dates of the period that are not in these. WCOmin
+    # is missing for the rows outside the period.
+    rows = streamflow_sim_df.index.append(dates.difference(streamflow_sim_df.index)).rename(streamflow_sim_df.index.name)
+    final_df = streamflow_sim_df.reindex(rows)
+    final_df['WCOmin [m3/s]'] = WCOmin.reindex(rows).values
+    diff_df = final_df[streamflow_sim_df.columns].sub(final_df['WCOmin [m3/s]'], axis=0)
+    diff_df.columns = [s + ' - WCOmin [m3/s]' for s in streamflow_sim_df.columns]
+    final_df = pd.concat([final_df, diff_df], axis=1)
     final_df.to_csv(outF)
 
+    # Compliance statistics for all sites over the period
+    streamflow_sim_df = streamflow_sim_df.reindex(dates)
+    compliance.getComplianceStats(streamflow_sim_df, WCOmin.values).to_csv(complianceF)
 
+    return streamflow_sim_df, WCOmin
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+
+import pandas as pd
+import numpy as np
+import os, shutil, tempfile
+
+#-Authorship information-###################################################################
+__author__ = 'Wilco Terink'
+__copyright__ = 'Wilco Terink'
+__version__ = '1.0'
+__email__ = 'wilco.terink@ecan.govt.nz'
+__date__ ='August 2020'
+############################################################################################
+
+
+def unquote_empty(line):
+    return b'' if line == b'""' else line
+
+
+class ColumnBlockWriter():
+
+    """
+    Write a wide csv-file (dates x series) block by block. Each block of columns is written to a temporary csv-file as soon
+    as it is complete, and only a running sum over the columns is kept in memory. When the writer is closed, the temporary
+    files are merged line by line into the final csv-file. Peak memory therefore depends on the block size and the number
+    of dates, and not on the number of series. All values are formatted by pandas, so the final file is the same as writing
+    the full DataFrame in one go with DataFrame.to_csv.
+    """
+
+    def __init__(self, outF, index, sum_label=None):
+        self.outF = outF
+        self.index = index
+        self.sum_label = sum_label
+        self.tempDir = tempfile.mkdtemp(dir=os.path.dirname(os.path.abspath(outF)))
+        self.blocks = []
+        self.total = np.zeros(len(index))
+
+    def write(self, block_df):
+        """
+        Write a block of columns to a temporary csv-file. Rows of block_df should be in the same order as the index of the writer.
+        """
+        blockF = os.path.join(self.tempDir, 'block_%05d.csv' % len(self.blocks))
+        block_df.to_csv(blockF, index=False)
+        self.blocks.append(blockF)
+
+        # Add the columns to the running sum one by one, from left to right (DataFrame.sum(axis=1) may differ in the last digit)
+        if self.sum_label is not None:
+            for c in range(block_df.shape[1]):
+                self.total += np.nan_to_num(block_df.iloc[:, c].to_numpy(dtype=float))
+
+    def close(self):
+        """
+        Merge the index, the blocks, and the sum column into the final csv-file and remove the temporary files.
+        """
+        indexF = os.path.join(self.tempDir, 'index.csv')
+        pd.DataFrame(index=self.index).to_csv(indexF)
+        files = [indexF] + self.blocks
+        if self.sum_label is not None:
+            sumF = os.path.join(self.tempDir, 'sum.csv')
+            pd.DataFrame({self.sum_label: self.total}).to_csv(sumF, index=False)
+            files.append(sumF)
+
+        #-Binary mode, so the line terminators written by pandas are kept as is (also on Python 2, which has no newline argument)
+        handles = [open(f, 'rb') for f in files]
+        try:
+            with open(self.outF, 'wb') as out:
+                for lines in zip(*handles):
+                    line = lines[0]
+                    eol = line[len(line.rstrip(b'\r\n')):]
+                    #-pandas quotes an empty value in a csv-file with one column (so the line is not blank), which is not done in the final file
+                    out.write(b','.join(unquote_empty(l.rstrip(b'\r\n')) for l in lines) + eol)
+        finally:
+            for h in handles:
+                h.close()
+            shutil.rmtree(self.tempDir)
+
+    def discard(self):
+        """
+        Remove the temporary files without writing the final csv-file (e.g. after an error during extraction).
+        """
+        shutil.rmtree(self.tempDir)
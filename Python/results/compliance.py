@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+
+import pandas as pd
+import numpy as np
+
+#-Authorship information-###################################################################
+__author__ = 'Wilco Terink'
+__copyright__ = 'Wilco Terink'
+__version__ = '1.0'
+__email__ = 'wilco.terink@ecan.govt.nz'
+__date__ ='August 2020'
+############################################################################################
+
+
+def getComplianceStats(flow_df, wcomin):
+
+    """
+    Compare daily streamflow with WCOmin for all columns (sites) of flow_df at once.
+    wcomin can be a Series (same WCOmin for all sites) or a DataFrame with the same columns as flow_df. Days where either the
+    streamflow or WCOmin is missing are ignored. Returns a DataFrame with for each site:
+        - Number of days with streamflow below WCOmin
+        - Exceedance frequency: fraction of the days with streamflow equal to or above WCOmin
+        - Deficit volume: the volume below WCOmin summed over all days [m3]
+        - The number of runs (periods of consecutive days) below WCOmin, and the longest and mean run length [days]
+    """
+
+    flow = flow_df.to_numpy(dtype=float)
+    if isinstance(wcomin, pd.DataFrame):
+        wco = wcomin[flow_df.columns].to_numpy(dtype=float)
+    else:
+        wco = np.asarray(wcomin, dtype=float).reshape(-1, 1)
+
+    valid = ~np.isnan(flow) & ~np.isnan(wco)
+    deficit = np.where(valid, wco - flow, 0.)
+    below = deficit > 0
+    n_valid = valid.sum(axis=0)
+    days_below = below.sum(axis=0)
+
+    # Start and end of the runs below WCOmin: pad each site with a day above WCOmin at both ends, so every run has a start and end.
+    # Transposed, so np.nonzero returns the runs sorted by site and then by date, and starts and ends line up.
+    edges = np.diff(np.pad(below.T.astype(np.int8), ((0, 0), (1, 1)), mode='constant'), axis=1)
+    site, start = np.nonzero(edges == 1)
+    end = np.nonzero(edges == -1)[1]
+    run_length = end - start
+
+    n_sites = flow.shape[1]
+    n_runs = np.bincount(site, minlength=n_sites)
+    longest_run = np.zeros(n_sites, dtype=int)
+    np.maximum.at(longest_run, site, run_length)
+
+    stats_df = pd.DataFrame(index=flow_df.columns)
+    if stats_df.index.nlevels == 1:
+        stats_df.index.name = 'Site'
+    stats_df['Days below WCOmin'] = days_below
+    stats_df['Exceedance frequency [-]'] = np.where(n_valid > 0, (n_valid - days_below) / np.maximum(n_valid, 1).astype(float), np.nan)
+    stats_df['Deficit volume [m3]'] = np.where(below, deficit, 0.).sum(axis=0) * 86400
+    stats_df['Number of runs below WCOmin'] = n_runs
+    stats_df['Longest run below WCOmin [days]'] = longest_run
+    stats_df['Mean run below WCOmin [days]'] = np.where(n_runs > 0, days_below / np.maximum(n_runs, 1).astype(float), 0.)
+
+    return stats_df
+
+
+def compareScenarios(scenarios):
+
+    """
+    Get the compliance statistics for several scenarios in one go. scenarios is a dictionary with the scenario name as key and
+    a tuple (flow_df, wcomin) as value (see getComplianceStats). The matrices of all scenarios are placed side by side, so the
+    statistics for all sites and scenarios are calculated in one pass. Returns a DataFrame indexed by scenario and site.
+    """
+
+    flows = []
+    wcomins = []
+    for s in scenarios:
+        flow_df, wcomin = scenarios[s]
+        if not isinstance(wcomin, pd.DataFrame):
+            wcomin = pd.DataFrame(np.repeat(np.asarray(wcomin, dtype=float).reshape(-1, 1), flow_df.shape[1], axis=1), index=flow_df.index, columns=flow_df.columns)
+        flows.append(flow_df)
+        wcomins.append(wcomin[flow_df.columns])
+    flow_df = pd.concat(flows, axis=1, keys=list(scenarios.keys()), names=['Scenario', 'Site'])
+    wcomin_df = pd.concat(wcomins, axis=1, keys=list(scenarios.keys()), names=['Scenario', 'Site'])
+
+    return getComplianceStats(flow_df, wcomin_df)
@@ -1,9 +1,14 @@
 # -*- coding: utf-8 -*-
 
 import pandas as pd
+import numpy as np
 import datetime as dt
 import calendar, os
 
+from extract import getCalendar, getActive
+from blockwriter import ColumnBlockWriter
+from pipeline import ResultsPipeline, comFactory
+
 #-Authorship information-###################################################################
 __author__ = 'Wilco Terink'
 __copyright__ = 'Wilco Terink'
@@ -13,11 +18,62 @@ __date__ ='August 2020'
 ############################################################################################
 
 
-def getConsented(WEAP, config, syear, eyear, scenario_name, take_type, crc_df, active_ts):
+def selectTakes(crc_df, take_type):
+
+    """
+    Select the crc & wap records of crc_df for take_type ('SW' or 'GW').
+    """
+
+    if take_type == 'SW':
+        return crc_df.loc[crc_df.Activity == 'Take Surface Water']
+    return crc_df.loc[crc_df.Activity == 'Take Groundwater']
+
+
+def getConsentedWeights(WEAP, crc_df, take_type):
+
+    """
+    Get the names of the crc/waps of take_type and their max pro rata rates, weighted for the ones that are in surface water allocation
+    (first column) and the ones that are not (second column), so both sums come out of one matrix product with the active matrix. These
+    are the same for all scenarios, so can be passed to getConsented for each scenario. Like getConsentJobs, a crc/wap with more than one
+    record is taken once (at its first record), and it is counted in each of the two sums it has a record for.
+    """
+
+    crc_wap_df = selectTakes(crc_df, take_type)
+    names = crc_wap_df['crc'] + '_' + crc_wap_df['wap_name_long']
+    in_sw_allo = set(names[(crc_wap_df['in_sw_allo'] != 0).to_numpy()])
+    not_in_sw_allo = set(names[(crc_wap_df['in_sw_allo'] == 0).to_numpy()])
+    crc_wap_df = crc_wap_df.loc[~names.duplicated().to_numpy()]
+    crc_wap = names.drop_duplicates().tolist()
+
+    # Get the proRata for all the crc/waps in one pass over the consent branches
+    proRata = np.array([float(WEAP.Branch('\Other Assumptions\Consents\%s\%s\Max daily rate pro rata' % (crc, wap)).Variables('Annual Activity Level').Expression)
+                        for crc, wap in zip(crc_wap_df['crc'], crc_wap_df['wap_name_long'])], dtype=float)
+
+    weights = np.zeros((len(crc_wap), 2))
+    weights[:, 0] = np.where([c in in_sw_allo for c in crc_wap], proRata, 0.)
+    weights[:, 1] = np.where([c in not_in_sw_allo for c in crc_wap], proRata, 0.)
+
+    return crc_wap, weights
+
+
+def getConsentJobs(crc_df, take_type, variable):
+
+    """
+    Get the (crc_wap, branch) of variable (e.g. 'Supplied daily volume') for each crc/wap of take_type (once, at its first record), to be
+    extracted with getConsentVariable. These are the same for all scenarios.
+    """
+
+    crc_wap_df = selectTakes(crc_df, take_type).drop_duplicates(subset=['crc', 'wap_name_long'], keep='first')
+    return [(crc + '_' + wap, '\\Other Assumptions\\Consents\\%s\\%s\\%s' % (crc, wap, variable)) for crc, wap in zip(crc_wap_df['crc'], crc_wap_df['wap_name_long'])]
+
+
+def getConsented(WEAP, config, syear, eyear, scenario_name, take_type, crc_df, active_ts, weights=None):
 
     """
     Get time-series of consented volume for each day for take_type. Consented volume for each day is calculated as
-    the sum of all WAP max pro rata rates of that take_type multiplied with the Active for each WAP.
+    the sum of all WAP max pro rata rates of that take_type multiplied with the Active for each WAP. active_ts is the result of
+    extract.readActive (the daily time-series or the intervals of the crc/waps). weights is the result of getConsentedWeights; if
+    it is not given, then it is calculated from crc_df.
     """
 
     resultsDir = config.get('GENERAL', 'resultsDir')
@@ -33,56 +89,26 @@ def getConsented(WEAP, config, syear, eyear, scenario_name, take_type, crc_df, a
         else:
             outF = os.path.join(resultsDir, config.get('GW_TAKES', 'gw_consented_csv'))
 
-    active_ts = active_ts.loc[(active_ts.index >= pd.Timestamp(syear, 1, 1)) & (active_ts.index <= pd.Timestamp(eyear, 12, 31))]
+    # Names of the crc/waps and their weighted proRata
+    if weights is None:
+        weights = getConsentedWeights(WEAP, crc_df, take_type)
+    crc_wap, weights = weights
+    dates, active = getActive(active_ts, syear, eyear, crc_wap)
 
-    # Select crc & wap based on take_type
-    if take_type == 'SW':
-        crc_wap_df = crc_df.loc[crc_df.Activity == 'Take Surface Water']
-    else:
-        crc_wap_df = crc_df.loc[crc_df.Activity == 'Take Groundwater']
-    crc_df = None
-    del crc_df
+    # Convert to l/s
+    consented = active.dot(weights) / 86.4
 
     # Final dataframe
-    final_df = pd.DataFrame(index=active_ts.index)
-
-    # Calculate the allocated for only "in_sw_allo" and not in sw_allo
-    for k in range(2):
-        if k == 0:
-            # First only the ones that are in surface water allocation
-            crc_wap_df_sel = crc_wap_df.loc[crc_wap_df.in_sw_allo != 0]
-        else:
-            # Then the ones that are not in sw allo
-            crc_wap_df_sel = crc_wap_df.loc[crc_wap_df.in_sw_allo == 0]
-
-        # Dataframe to be filled
-        df = pd.DataFrame(index=active_ts.index)
-
-        # Get the proRata for the crc/wap
-        for i in crc_wap_df_sel.iterrows():
-            crc = i[1]['crc']
-            wap = i[1]['wap_name_long']
-            proRata = WEAP.Branch('\Other Assumptions\Consents\%s\%s\Max daily rate pro rata' % (crc, wap)).Variables('Annual Activity Level').Expression
-            crc_wap = crc + '_' + wap
-            df[[crc_wap]] = active_ts[[crc_wap]] * float(proRata)
-
-        # Convert to l/s
-        df['Sum [l/s]'] = df.sum(axis=1)
-        df = df['Sum [l/s]'] / 86.4
-
-        if k == 0:
-            final_df['Sum in_sw_allo [l/s]'] = df
-        else:
-            final_df['Sum not in_sw_allo [l/s]'] = df
-
+    final_df = pd.DataFrame(consented, index=dates, columns=['Sum in_sw_allo [l/s]', 'Sum not in_sw_allo [l/s]'])
     final_df['Sum all [l/s'] = final_df['Sum in_sw_allo [l/s]'] + final_df['Sum not in_sw_allo [l/s]']
     final_df.to_csv(outF, header=True)
 
 
-def getRestrictionVolume(WEAP, config, syear, eyear, scenario, scenario_name, take_type, crc_df):
+def getRestrictionVolume(WEAP, config, syear, eyear, scenario, scenario_name, take_type, crc_df, jobs=None):
 
     """
-    Get time-series of restriction daily volume for each day for take_type.
+    Get time-series of restriction daily volume for each day for take_type. jobs is the result of getConsentJobs; if it is not given,
+    then it is created from crc_df.
     """
 
     resultsDir = config.get('GENERAL', 'resultsDir')
@@ -98,53 +124,18 @@ def getRestrictionVolume(WEAP, config, syear, eyear, scenario, scenario_name, ta
         else:
             outF = os.path.join(resultsDir, config.get('GW_TAKES', 'gw_restriction_csv'))
 
-    # Select crc & wap based on take_type
-    if take_type == 'SW':
-        crc_wap_df = crc_df.loc[crc_df.Activity == 'Take Surface Water']
-    else:
-        crc_wap_df = crc_df.loc[crc_df.Activity == 'Take Groundwater']
-    crc_df = None
-    del crc_df
+    # Branches of the crc/waps of take_type
+    if jobs is None:
+        jobs = getConsentJobs(crc_df, take_type, 'Restriction daily volume')
 
-    # Final dataframe
-    final_df = pd.DataFrame(index=pd.date_range(pd.Timestamp(syear, 1, 1), pd.Timestamp(eyear, 12, 31), freq='D'))
-    final_df.index.name = 'Date'
+    getConsentVariable(WEAP, config, syear, eyear, scenario, jobs, 'Getting maximum allowed for %s', outF)
 
-    # Get the restriction daily volume for the crc/wap
-    for i in crc_wap_df.iterrows():
-        crc = i[1]['crc']
-        wap = i[1]['wap_name_long']
-        crc_wap = crc + '_' + wap
-        br = WEAP.Branch('\Other Assumptions\Consents\%s\%s\Restriction daily volume' % (crc, wap)).FullName
-        print('Getting maximum allowed for %s' % crc_wap)
 
-        # Initialize the time-loop
-        cDate = dt.date(syear, 1, 1)
-        eDate = dt.date(eyear, 12, 31)
-        while cDate <= eDate:
-            # Calculate the day number of the year
-            dayOfYear = cDate.timetuple().tm_yday
-
-            # Is current date not a leap year? If that is true, then dates after 28 February should have a day of the year + 1 day (WEAP always has 366 time-steps)
-            leapY = calendar.isleap(cDate.year)
-            if not leapY:
-                if cDate > dt.date(cDate.year, 2, 28):
-                    dayOfYear += 1
-            # Extract the value and convert from m3/d to l/s
-            svalue = WEAP.ResultValue(br, cDate.year, dayOfYear, scenario) / 86.4
-            final_df.loc[pd.Timestamp(cDate), crc_wap] = svalue
-
-            # Increment date with one day
-            cDate += dt.timedelta(days=1)
-
-    final_df['Sum [l/s]'] = final_df.sum(axis=1)
-    final_df.to_csv(outF)
-
-
-def getAbstraction(WEAP, config, syear, eyear, scenario, scenario_name, take_type, crc_df):
+def getAbstraction(WEAP, config, syear, eyear, scenario, scenario_name, take_type, crc_df, jobs=None):
 
     """
-    Get time-series of daily abstractions for take_type.
+    Get time-series of daily abstractions for take_type. jobs is the result of getConsentJobs; if it is not given, then it is created
+    from crc_df.
     """
 
     resultsDir = config.get('GENERAL', 'resultsDir')
@@ -160,47 +151,43 @@ def getAbstraction(WEAP, config, syear, eyear, scenario, scenario_name, take_typ
         else:
             outF = os.path.join(resultsDir, config.get('GW_TAKES', 'gw_abstracted_csv'))
 
-    # Select crc & wap based on take_type
-    if take_type == 'SW':
-        crc_wap_df = crc_df.loc[crc_df.Activity == 'Take Surface Water']
-    else:
-        crc_wap_df = crc_df.loc[crc_df.Activity == 'Take Groundwater']
-    crc_df = None
-    del crc_df
+    # Branches of the crc/waps of take_type
+    if jobs is None:
+        jobs = getConsentJobs(crc_df, take_type, 'Supplied daily volume')
 
-    # Final dataframe
-    final_df = pd.DataFrame(index=pd.date_range(pd.Timestamp(syear, 1, 1), pd.Timestamp(eyear, 12, 31), freq='D'))
-    final_df.index.name = 'Date'
+    getConsentVariable(WEAP, config, syear, eyear, scenario, jobs, 'Getting abstraction for %s', outF)
 
-    # Get the abstraction daily volume for the crc/wap
-    for i in crc_wap_df.iterrows():
-        crc = i[1]['crc']
-        wap = i[1]['wap_name_long']
-        crc_wap = crc + '_' + wap
-        br = WEAP.Branch('\Other Assumptions\Consents\%s\%s\Supplied daily volume' % (crc, wap)).FullName
-        print('Getting abstraction for %s' % crc_wap)
 
-        # Initialize the time-loop
-        cDate = dt.date(syear, 1, 1)
-        eDate = dt.date(eyear, 12, 31)
-        while cDate <= eDate:
-            # Calculate the day number of the year
-            dayOfYear = cDate.timetuple().tm_yday
-
-            # Is current date not a leap year? If that is true, then dates after 28 February should have a day of the year + 1 day (WEAP always has 366 time-steps)
-            leapY = calendar.isleap(cDate.year)
-            if not leapY:
-                if cDate > dt.date(cDate.year, 2, 28):
-                    dayOfYear += 1
-            # Extract the value and convert from m3/d to l/s
-            svalue = WEAP.ResultValue(br, cDate.year, dayOfYear, scenario) / 86.4
-            final_df.loc[pd.Timestamp(cDate), crc_wap] = svalue
+def getConsentVariable(WEAP, config, syear, eyear, scenario, jobs, message, outF):
 
-            # Increment date with one day
-            cDate += dt.timedelta(days=1)
+    """
+    Get time-series of a daily volume variable (e.g. 'Supplied daily volume') in l/s for each (crc_wap, branch) in jobs and write these,
+    together with the sum over all crc/waps, to outF. The crc/waps are extracted and written to disk in blocks of 'block_size'
+    columns, so memory use does not grow with the number of crc/waps.
+    """
 
-    final_df['Sum [l/s]'] = final_df.sum(axis=1)
-    final_df.to_csv(outF)
+    block_size = config.getint('GENERAL', 'block_size')
+
+    dates, years, timesteps = getCalendar(syear, eyear)
+    writer = ColumnBlockWriter(outF, dates, 'Sum [l/s]')
+
+    # The values are extracted on a COM thread, while the blocks are filled and written to disk on a worker thread
+    block = {}
+    def consume(crc_wap, values):
+        # Convert from m3/d to l/s
+        block[crc_wap] = values / 86.4
+        if len(block) == block_size:
+            writer.write(pd.DataFrame(block, columns=list(block.keys())))
+            block.clear()
+    try:
+        ResultsPipeline(comFactory(WEAP), scenario, years, timesteps).run(jobs, consume, message)
+    except Exception:
+        writer.discard()
+        raise
+    if block:
+        writer.write(pd.DataFrame(block, columns=list(block.keys())))
+
+    writer.close()
 
 
 def getStreamDepletion(config, syear, eyear, scenario_name, sdTS):
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+
+import pandas as pd
+import numpy as np
+import os, sys
+
+# The consent table, consent activity intervals, and the reading of the daily csv-files are shared with the model build
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from other_functions.intervals import interval_file, read_intervals, active_matrix, DateIntervalIndex
+from other_functions.weapcsv import read_weap_csv
+from consents.crctable import read_crc_table
+
+#-Authorship information-###################################################################
+__author__ = 'Wilco Terink'
+__copyright__ = 'Wilco Terink'
+__version__ = '1.0'
+__email__ = 'wilco.terink@ecan.govt.nz'
+__date__ ='August 2020'
+############################################################################################
+
+#-Calendars that were calculated before, with (syear, eyear) as key
+calendars = {}
+
+
+def getCalendar(syear, eyear):
+
+    """
+    Get the daily dates between 1 January of syear and 31 December of eyear, together with the year and WEAP time-step for each date.
+    Returns the dates (DatetimeIndex named 'Date'), and lists with the years and time-steps. These are shared between calls, so should not be modified.
+    """
+
+    # The calendar is the same for all results and scenarios of a period, so only calculate it once
+    if (syear, eyear) not in calendars:
+        dates = pd.date_range(pd.Timestamp(syear, 1, 1), pd.Timestamp(eyear, 12, 31), freq='D', name='Date')
+        years, timesteps = getTimesteps(dates)
+        calendars[(syear, eyear)] = (dates, years, timesteps)
+
+    return calendars[(syear, eyear)]
+
+
+def getTimesteps(dates):
+
+    """
+    Get the year and WEAP time-step for each date in dates (DatetimeIndex).
+    WEAP always has 366 time-steps, so in a non-leap year the dates after 28 February have a time-step of the day of the year + 1 day.
+    """
+
+    timesteps = dates.dayofyear.to_numpy().copy()
+    timesteps[~dates.is_leap_year & (dates.month > 2)] += 1
+
+    # Plain python integers are passed to the WEAP API
+    return dates.year.tolist(), timesteps.tolist()
+
+
+def getResultValues(WEAP, branch, years, timesteps, scenario):
+
+    """
+    Get the result values of a WEAP branch (variable) for each year and time-step as a numpy array
+    """
+
+    return np.array([WEAP.ResultValue(branch, y, t, scenario) for y, t in zip(years, timesteps)], dtype=float)
+
+
+def readConsents(crc_csv):
+
+    """
+    Read the consent table with consents.crctable.read_crc_table (from the Parquet file next to crc_csv if it is not older than crc_csv).
+    The results scripts only select records on Activity and SWAZ, so these are read as categories (and the months as nullable integers).
+    """
+
+    return read_crc_table(crc_csv, categorical=True)
+
+
+def readActive(active_csv):
+
+    """
+    Read the activity of the crc/wap combinations. If the intervals file that is written next to active_csv by the model build (same name
+    followed by '_intervals.csv') is not older than active_csv, then only the intervals are read: a DataFrame with the crc/waps as index and
+    the columns fmDate, toDate, from_month and to_month. Otherwise the daily time-series in active_csv are read. Use getActive to get the
+    daily activity from either of them.
+    """
+
+    intervalF = interval_file(active_csv)
+    if os.path.isfile(intervalF) and os.path.getmtime(intervalF) >= os.path.getmtime(active_csv):
+        return read_intervals(intervalF)
+    return read_weap_csv(active_csv)
+
+
+def getActive(active, syear, eyear, crc_wap):
+
+    """
+    Get the daily activity (1=Active, 0=Inactive) between 1 January of syear and 31 December of eyear for the list of crc_wap from the
+    result of readActive. Returns the dates and a numpy array (dates x crc_wap). For intervals, only the activity of the crc_waps that are
+    active in the period is calculated (found with a DateIntervalIndex); the other crc_waps are inactive on all dates.
+    """
+
+    if 'fmDate' not in active.columns:
+        active = active.loc[(active.index >= pd.Timestamp(syear, 1, 1)) & (active.index <= pd.Timestamp(eyear, 12, 31))]
+        return active.index, np.nan_to_num(active[crc_wap].to_numpy(dtype=float))
+
+    dates = getCalendar(syear, eyear)[0]
+    df = active.loc[crc_wap]
+    pos = DateIntervalIndex(df['fmDate'], df['toDate']).active(dates[0], dates[-1])
+    df = df.iloc[pos]
+    # Active between fmDate and toDate, and in the months from from_month up to and including to_month (which can wrap around the end of the year)
+    matrix = np.zeros((len(dates), len(crc_wap)), dtype=np.uint8)
+    matrix[:, pos] = active_matrix(dates, df['fmDate'], df['toDate'], df['from_month'], df['to_month'])
+    return dates, matrix
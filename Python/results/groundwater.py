@@ -1,8 +1,9 @@
 # -*- coding: utf-8 -*-
 
 import pandas as pd
-import datetime as dt
-import calendar, os
+import os
+
+from extract import getCalendar, getResultValues
 
 #-Authorship information-###################################################################
 __author__ = 'Wilco Terink'
@@ -29,40 +30,18 @@ def getNaturalLossGW(WEAP, config, syear, eyear, scenario, scenario_name):
 
     # Get the locations
     locations_df = pd.read_csv(inF)
-    gw_perc_locations = locations_df['WEAP resultvalue outflow percentage'].tolist()
-    location_names = locations_df['Name'].tolist()
-
-    date_range = pd.date_range(pd.Timestamp(syear, 1, 1), pd.Timestamp(eyear, 12, 31), freq='D')
-    df_final = pd.DataFrame(index=date_range, columns=location_names)
-    df_final.index.name = 'Date'
-
-    # Loop over the locations for which streamflow time-series are required
-    for i in locations_df.iterrows():
-        gw_perc_loc = i[1]['WEAP resultvalue outflow percentage']
-        streamflow_loc = i[1]['WEAP resultvalue streamflow']
-
-        # Initialize the loop
-        cDate = dt.date(syear, 1, 1)
-        eDate = dt.date(eyear, 12, 31)
-        while cDate <= eDate:
-            print(cDate)
-            # Calculate the day number of the year
-            dayOfYear = cDate.timetuple().tm_yday
-
-            # Is current date not a leap year? If that is true, then dates after 28 February should have a day of the year + 1 day (WEAP always has 366 time-steps)
-            leapY = calendar.isleap(cDate.year)
-            if not leapY:
-                if cDate > dt.date(cDate.year, 2, 28):
-                    dayOfYear += 1
 
-            perc_outflow = WEAP.ResultValue(gw_perc_loc, cDate.year, dayOfYear, scenario)
-            streamflow = WEAP.ResultValue(streamflow_loc, cDate.year, dayOfYear, scenario)
+    dates, years, timesteps = getCalendar(syear, eyear)
+    df_final = pd.DataFrame(index=dates)
 
-            # Add the value to the dataframe
-            df_final.loc[pd.Timestamp(cDate), location_names[gw_perc_locations.index(gw_perc_loc)]] = streamflow * perc_outflow * 0.01
+    # Loop over the locations for which the natural losses are required
+    for name, gw_perc_loc, streamflow_loc in zip(locations_df['Name'], locations_df['WEAP resultvalue outflow percentage'], locations_df['WEAP resultvalue streamflow']):
+        print('Getting natural losses to groundwater for %s' % name)
+        perc_outflow = getResultValues(WEAP, gw_perc_loc, years, timesteps, scenario)
+        streamflow = getResultValues(WEAP, streamflow_loc, years, timesteps, scenario)
 
-            # Increment date with one day
-            cDate += dt.timedelta(days=1)
+        # Loss for the whole period in one go
+        df_final[name] = streamflow * perc_outflow * 0.01
 
     df_final['Sum [m3/s]'] = df_final.sum(axis=1)
     df_final.to_csv(outF)
@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+
+import numpy as np
+import threading
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+try:
+    import pythoncom
+    import win32com.client
+except ImportError:
+    pythoncom = None
+
+#-Authorship information-###################################################################
+__author__ = 'Wilco Terink'
+__copyright__ = 'Wilco Terink'
+__version__ = '1.0'
+__email__ = 'wilco.terink@ecan.govt.nz'
+__date__ ='August 2020'
+############################################################################################
+
+
+def comFactory(WEAP):
+
+    """
+    Returns a function that gives access to the WEAP object from another thread. A COM object can only be used in the apartment
+    it was created in, so the interface is marshalled here (calling thread) and unmarshalled by the returned function (COM thread).
+    Objects that are not COM objects (e.g. a fake WEAP object for testing) are returned as is.
+    """
+
+    if pythoncom is None or not hasattr(WEAP, '_oleobj_'):
+        return lambda: WEAP
+
+    stream = pythoncom.CoMarshalInterThreadInterfaceInStream(pythoncom.IID_IDispatch, WEAP._oleobj_)
+    def factory():
+        return win32com.client.Dispatch(pythoncom.CoGetInterfaceAndReleaseStream(stream, pythoncom.IID_IDispatch))
+    return factory
+
+
+class ResultsPipeline():
+
+    """
+    Extract WEAP results on a COM thread while the results are processed on a worker thread. The COM thread only calls
+    WEAP.ResultValue and fills a fixed set of buffers (ring buffer), the worker thread converts, aggregates and writes the
+    filled buffers and hands them back to the COM thread. This way the blocking COM calls and the pandas/csv work overlap.
+
+    weapFactory is called on the COM thread and should return the WEAP object (see comFactory). The number of buffers limits
+    how far the COM thread can run ahead of the worker thread.
+    """
+
+    def __init__(self, weapFactory, scenario, years, timesteps, n_buffers=4):
+        self.weapFactory = weapFactory
+        self.scenario = scenario
+        self.years = years
+        self.timesteps = timesteps
+        self.n_buffers = n_buffers
+
+    def run(self, jobs, consume, message=None):
+        """
+        Extract the time-series for each (key, branch) in jobs and call consume(key, values) on the worker thread for each
+        of them, in the order of jobs. values is a numpy array that is re-used after consume returns, so consume should copy
+        what it wants to keep. Exceptions raised on either thread are raised again here.
+        """
+        self.free = queue.Queue()
+        self.full = queue.Queue()
+        for i in range(self.n_buffers):
+            self.free.put(np.empty(len(self.years)))
+        self.stop = threading.Event()
+        self.errors = []
+
+        producer = threading.Thread(target=self._produce, args=(jobs, message))
+        consumer = threading.Thread(target=self._consume, args=(consume,))
+        producer.start()
+        consumer.start()
+        producer.join()
+        consumer.join()
+
+        if self.errors:
+            raise self.errors[0]
+
+    def _produce(self, jobs, message):
+        if pythoncom is not None:
+            pythoncom.CoInitialize()
+        try:
+            WEAP = self.weapFactory()
+            for key, branch in jobs:
+                if self.stop.is_set():
+                    break
+                if message is not None:
+                    print(message % key)
+                br = WEAP.Branch(branch).FullName
+                buf = self.free.get()
+                for i, (y, t) in enumerate(zip(self.years, self.timesteps)):
+                    buf[i] = WEAP.ResultValue(br, y, t, self.scenario)
+                self.full.put((key, buf))
+        except Exception as e:
+            self.errors.append(e)
+            self.stop.set()
+        finally:
+            # Tell the worker thread there is nothing more to come
+            self.full.put(None)
+            if pythoncom is not None:
+                pythoncom.CoUninitialize()
+
+    def _consume(self, consume):
+        while True:
+            item = self.full.get()
+            if item is None:
+                break
+            key, buf = item
+            # After an error keep handing back buffers so the COM thread can finish
+            if not self.stop.is_set():
+                try:
+                    consume(key, buf)
+                except Exception as e:
+                    self.errors.append(e)
+                    self.stop.set()
+            self.free.put(buf)
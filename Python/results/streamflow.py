@@ -1,8 +1,10 @@
 # -*- coding: utf-8 -*-
 
 import pandas as pd
-import datetime as dt
-import calendar, os
+import numpy as np
+import os
+
+from extract import getCalendar, getResultValues
 
 #-Authorship information-###################################################################
 __author__ = 'Wilco Terink'
@@ -15,7 +17,7 @@ __date__ ='August 2020'
 
 def getStreamflowTS(WEAP, config, syear, eyear, scenario, scenario_name):
     '''
-    Function is imported in Get_WEAP_results.py
+    Function is imported in Get_WEAP_results.py. Returns the dataframe with streamflow simulations.
     '''
 
     inF = config.get('STREAMFLOW', 'locations_csv')
@@ -35,34 +37,14 @@ def getStreamflowTS(WEAP, config, syear, eyear, scenario, scenario_name):
     # get the labels that should be used for each resultvalue
     labels_df = locations_df[label_val_col].tolist()
 
-    date_range = pd.date_range(pd.Timestamp(syear, 1, 1), pd.Timestamp(eyear, 12, 31), freq='D')
-    df_final = pd.DataFrame(index=date_range, columns=labels_df)
-    df_final.index.name = 'Date'
-
-    # Initialize the loop
-    cDate = dt.date(syear, 1, 1)
-    eDate = dt.date(eyear, 12, 31)
-    while cDate <= eDate:
-        # Calculate the day number of the year
-        dayOfYear = cDate.timetuple().tm_yday
-
-        # Is current date not a leap year? If that is true, then dates after 28 February should have a day of the year + 1 day (WEAP always has 366 time-steps)
-        leapY = calendar.isleap(cDate.year)
-        if not leapY:
-            if cDate > dt.date(cDate.year, 2, 28):
-                dayOfYear += 1
+    dates, years, timesteps = getCalendar(syear, eyear)
 
-        # Loop over the locations for which streamflow time-series are required
-        for i in locations_df.iterrows():
-            v = i[1][result_val_col]
-            l = i[1][label_val_col]
-            svalue = WEAP.ResultValue(v, cDate.year, dayOfYear, scenario)
-            # Add the value to the dataframe
-            df_final.loc[df_final.index == pd.Timestamp(cDate), l] = svalue
-
-        # Increment date with one day
-        cDate += dt.timedelta(days=1)
+    # Loop over the locations for which streamflow time-series are required
+    values = [getResultValues(WEAP, v, years, timesteps, scenario) for v in locations_df[result_val_col]]
+    df_final = pd.DataFrame(np.column_stack(values) if values else None, index=dates, columns=labels_df)
 
     print('Writing results to %s' % outF)
     df_final.to_csv(outF)
     print('Streamflow simulations succesfully written.')
+
+    return df_final
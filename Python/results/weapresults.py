@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+
+import pandas as pd
+import numpy as np
+from collections import OrderedDict
+
+from extract import getTimesteps, getResultValues
+
+#-Authorship information-###################################################################
+__author__ = 'Wilco Terink'
+__copyright__ = 'Wilco Terink'
+__version__ = '1.0'
+__email__ = 'wilco.terink@ecan.govt.nz'
+__date__ ='August 2020'
+############################################################################################
+
+
+class WeapResults():
+
+    """
+    Lazy access to the daily results of a WEAP area and scenario. Results are only fetched from WEAP when they are requested, and
+    only for the months that cover the requested period. Fetched months are kept in memory (least recently used months are dropped
+    when more than max_months are kept), so asking for the same period again does not call WEAP again.
+
+    Usage:
+        res = WeapResults('Rakaia - Scenario 1', 'Reference')
+        s = res['\\Demand Sites and Catchments\\X:Supply Delivered[m^3]', '2010-10':'2011-04']
+
+    The period is a slice of dates (strings or timestamps), where a partial date as end includes the whole year, month or day
+    (e.g. '2010':'2012' is 1 January 2010 up to and including 31 December 2012). A single date string gives that year, month or day.
+    Without a period the full simulation period of the area is returned. The result is a pandas Series with the dates as index.
+    """
+
+    def __init__(self, area, scenario, WEAP=None, max_months=1200):
+        if WEAP is None:
+            import win32com.client
+            WEAP = win32com.client.Dispatch('WEAP.WEAPApplication')
+        if area is not None:
+            WEAP.ActiveArea = area
+        self.WEAP = WEAP
+        self.area = area
+        self.scenario = scenario
+        self.max_months = max_months
+        self.cache = OrderedDict()
+
+    def __getitem__(self, key):
+        if isinstance(key, tuple):
+            branch, period = key
+        else:
+            branch, period = key, slice(None, None)
+
+        if isinstance(period, slice):
+            if period.start is None:
+                start = pd.Timestamp(self.WEAP.BaseYear, 1, 1)
+            else:
+                start = pd.Period(period.start).start_time if isinstance(period.start, str) else pd.Timestamp(period.start)
+            if period.stop is None:
+                end = pd.Timestamp(self.WEAP.EndYear, 12, 31)
+            else:
+                end = pd.Period(period.stop).end_time.normalize() if isinstance(period.stop, str) else pd.Timestamp(period.stop)
+        else:
+            p = pd.Period(period)
+            start, end = p.start_time, p.end_time.normalize()
+
+        return self.getSeries(branch, start, end)
+
+    def getSeries(self, branch, start, end):
+        """
+        Get the daily values of branch between start and end (both included) as a pandas Series.
+        """
+        dates = pd.date_range(start.normalize(), end.normalize(), freq='D', name='Date')
+        if len(dates) == 0:
+            return pd.Series(np.array([], dtype=float), index=dates, name=branch)
+
+        months = pd.period_range(dates[0], dates[-1], freq='M')
+        values = np.concatenate([self.getMonth(branch, m.year, m.month) for m in months])
+
+        # Cut off the days of the first and last month that are outside the requested period
+        first = dates[0].day - 1
+        return pd.Series(values[first:first + len(dates)], index=dates, name=branch)
+
+    def getMonth(self, branch, year, month):
+        """
+        Get the daily values of branch for one month, from memory if it was fetched before.
+        """
+        key = (branch, year, month)
+        if key in self.cache:
+            values = self.cache.pop(key)
+        else:
+            dates = pd.date_range(pd.Timestamp(year, month, 1), periods=pd.Timestamp(year, month, 1).days_in_month, freq='D')
+            years, timesteps = getTimesteps(dates)
+            values = getResultValues(self.WEAP, branch, years, timesteps, self.scenario)
+            # Drop the least recently used month if the memory is full
+            if len(self.cache) >= self.max_months:
+                self.cache.popitem(last=False)
+        # (Re-)insert as most recently used
+        self.cache[key] = values
+        return values
+
+    def clear(self):
+        """
+        Forget all fetched results (e.g. after the model was run again).
+        """
+        self.cache.clear()
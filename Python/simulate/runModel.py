@@ -5,6 +5,7 @@ import calendar, os, time
 
 import datetime as dt
 from groundwater.stream_depletion import *
+from other_functions.weapcsv import format_dates
 
 #-Authorship information-###################################################################
 __author__ = 'Wilco Terink'
@@ -125,7 +126,7 @@ def runModel(self):
                         qpump = self.WEAP.ResultValue(br.FullName + ':Supply Delivered[m^3]', curdate.year, t)
                         gw_supply_delivered_df.loc[gw_supply_delivered_df.index == pd.Timestamp(curdate), wap] = qpump
                     curdate = curdate + dt.timedelta(days=1)
-                gw_supply_delivered_df.index = gw_supply_delivered_df.index.strftime('%d/%m/%Y')
+                gw_supply_delivered_df.index = pd.Index(format_dates(gw_supply_delivered_df.index), name=gw_supply_delivered_df.index.name)
                 gw_supply_delivered_df.to_csv(os.path.join(simDir, self.config.get('RUNNING', 'pump_csv')))
 
                 gw_sd_df = gw_supply_delivered_df.copy() * 0.
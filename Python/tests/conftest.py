@@ -0,0 +1,9 @@
+# -*- coding: utf-8 -*-
+
+import os, sys
+
+#-The packages are imported from the Python folder, and the results scripts (flat imports) from the results folder
+here = os.path.dirname(os.path.abspath(__file__))
+for p in [os.path.dirname(here), os.path.join(os.path.dirname(here), 'results')]:
+    if p not in sys.path:
+        sys.path.insert(0, p)
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+
+'''
+Fake WEAP object for testing the extraction of results without WEAP. Each ResultValue call sleeps for a while, like a COM call to
+WEAP, and returns a value that is derived from the branch, year and time-step, so the results can be checked.
+'''
+
+import time
+
+
+class FakeVariable():
+
+    def __init__(self, expression):
+        self.Expression = expression
+
+
+class FakeBranch():
+
+    def __init__(self, name, expressions=None):
+        self.FullName = name
+        self.expressions = expressions or {}
+
+    def Variables(self, name):
+        return FakeVariable(self.expressions.get((self.FullName, name), '0'))
+
+
+class FakeWEAP():
+
+    def __init__(self, latency=0.0001, fail_branch=None):
+        '''
+        latency: seconds that each ResultValue call takes
+        fail_branch: ResultValue raises a RuntimeError for this branch (FullName)
+        '''
+        self.latency = latency
+        self.fail_branch = fail_branch
+        self.values = {}
+        #-Expressions of the variables, with (branch, variable) as key ('0' if not set)
+        self.expressions = {}
+
+    def Branch(self, name):
+        return FakeBranch(name, self.expressions)
+
+    def ResultValue(self, branch, year, timestep, scenario):
+        time.sleep(self.latency)
+        if branch == self.fail_branch:
+            raise RuntimeError('ResultValue failed for %s' % branch)
+        return self.value(branch, year, timestep)
+
+    def value(self, branch, year, timestep):
+        '''
+        Value that is returned by ResultValue.
+        '''
+        if branch not in self.values:
+            self.values[branch] = len(self.values) + 1
+        return self.values[branch] * 1000. + (year % 100) * 366 + timestep
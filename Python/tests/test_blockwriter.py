@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+
+import pandas as pd
+import numpy as np
+import pytest
+
+from blockwriter import ColumnBlockWriter
+
+
+@pytest.mark.parametrize('ncols', [0, 1, 250])
+def test_same_as_to_csv(tmpdir, ncols):
+    index = pd.date_range('2010-01-01', periods=40, freq='D', name='Date')
+    rng = np.random.RandomState(1)
+    df = pd.DataFrame(rng.rand(len(index), ncols) * 100, index=index, columns=['WAP%d' % i for i in range(ncols)])
+    df.iloc[3, :min(ncols, 5)] = np.nan
+    #-the writer sums the columns from left to right
+    df['Total'] = np.nan_to_num(df.to_numpy()).cumsum(axis=1)[:, -1] if ncols else 0.
+
+    outF = str(tmpdir.join('out.csv'))
+    w = ColumnBlockWriter(outF, index, sum_label='Total')
+    for s in range(0, ncols, 64):
+        w.write(df.iloc[:, s:min(s + 64, ncols)])
+    w.close()
+
+    expF = str(tmpdir.join('expected.csv'))
+    df.to_csv(expF)
+    with open(outF, 'rb') as f1, open(expF, 'rb') as f2:
+        assert f1.read() == f2.read()
+    #-only the two csv-files are left
+    assert sorted(p.basename for p in tmpdir.listdir()) == ['expected.csv', 'out.csv']
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+
+import pandas as pd
+import numpy as np
+try:
+    import configparser
+except ImportError:
+    import ConfigParser as configparser
+
+import compliance
+import RIRF_WCO
+from extract import getCalendar
+from fakeweap import FakeWEAP
+
+
+def test_getComplianceStats():
+    dates = pd.date_range('2011-01-01', periods=9, freq='D')
+    flow_df = pd.DataFrame({'A': [5, 1, 1, 5, 2, np.nan, 2, 2, 5], 'B': [4.] * 9, 'C': [0.] * 9}, index=dates)
+    stats = compliance.getComplianceStats(flow_df, np.full(9, 3.))
+
+    #-A: 8 valid days, below on days 1-2, 4, and 6-7 (the missing day 5 ends the run), deficits 2+2+1+1+1 m3/s
+    #-B: never below, C: below on all days (the run starts on the first and ends on the last day)
+    assert list(stats['Days below WCOmin']) == [5, 0, 9]
+    np.testing.assert_allclose(stats['Exceedance frequency [-]'], [3. / 8, 1., 0.])
+    np.testing.assert_allclose(stats['Deficit volume [m3]'], [7 * 86400., 0., 27 * 86400.])
+    assert list(stats['Number of runs below WCOmin']) == [3, 0, 1]
+    assert list(stats['Longest run below WCOmin [days]']) == [2, 0, 9]
+    np.testing.assert_allclose(stats['Mean run below WCOmin [days]'], [5 / 3., 0., 9.])
+
+
+def test_compareScenarios():
+    dates = pd.date_range('2011-01-01', periods=4, freq='D')
+    flow_df = pd.DataFrame({'A': [1., 5., 1., 1.]}, index=dates)
+    stats = compliance.compareScenarios({'S1': (flow_df, np.full(4, 3.)), 'S2': (flow_df + 3, np.full(4, 3.))})
+    assert list(stats.index) == [('S1', 'A'), ('S2', 'A')]
+    assert list(stats['Days below WCOmin']) == [3, 0]
+    assert list(stats['Longest run below WCOmin [days]']) == [2, 0]
+
+
+def test_getWCOStreamflow_rows(tmpdir):
+    config = configparser.RawConfigParser()
+    for section, items in [('GENERAL', {'resultsDir': str(tmpdir)}), ('STREAMFLOW', {'streamflow_csv': 'streamflow.csv'}),
+                           ('RIRF_WCO', {'WCO_streamflow_csv': 'wco.csv', 'WCO_compliance_csv': 'compliance.csv', 'WCOmin_branch': 'WCOmin'})]:
+        config.add_section(section)
+        for k, v in items.items():
+            config.set(section, k, v)
+    #-the streamflow csv-file starts before and ends within the period
+    flow_df = pd.DataFrame({'A': np.arange(400.)}, index=pd.date_range('2010-12-01', periods=400, freq='D', name='Date'))
+    WEAP = FakeWEAP(latency=0)
+
+    RIRF_WCO.getWCOStreamflow(WEAP, config, 2011, 2011, 'Reference', '', flow_df)
+    df = pd.read_csv(str(tmpdir.join('wco.csv')), index_col=0, parse_dates=True)
+
+    #-the rows of the streamflow csv-file are kept, and the missing dates of the period added at the end
+    dates, years, timesteps = getCalendar(2011, 2011)
+    assert (df.index == flow_df.index.append(dates[dates > flow_df.index[-1]])).all()
+    wcomin = pd.Series([WEAP.value('WCOmin', y, t) for y, t in zip(years, timesteps)], index=dates).reindex(df.index)
+    np.testing.assert_allclose(df['WCOmin [m3/s]'], wcomin)
+    np.testing.assert_allclose(df['A - WCOmin [m3/s]'], df['A'] - wcomin)
@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+
+import pandas as pd
+import numpy as np
+try:
+    import configparser
+except ImportError:
+    import ConfigParser as configparser
+
+import consented
+from fakeweap import FakeWEAP
+
+
+def make_weap():
+    WEAP = FakeWEAP()
+    for crc, wap, proRata in [('CRC1', 'WAP1', '86.4'), ('CRC1', 'WAP2', '172.8'), ('CRC2', 'WAP1', '864')]:
+        WEAP.expressions[('\\Other Assumptions\\Consents\\%s\\%s\\Max daily rate pro rata' % (crc, wap), 'Annual Activity Level')] = proRata
+    return WEAP
+
+
+def test_duplicate_crc_wap(tmpdir):
+    #-CRC1/WAP1 has two records: in surface water allocation and not. CRC1/WAP2 has two records in surface water allocation.
+    crc_df = pd.DataFrame({'crc': ['CRC1', 'CRC1', 'CRC2', 'CRC1', 'CRC1'], 'wap_name_long': ['WAP1', 'WAP2', 'WAP1', 'WAP1', 'WAP2'],
+                           'Activity': ['Take Surface Water'] * 5, 'in_sw_allo': [1, 1, 0, 0, 1]})
+
+    jobs = consented.getConsentJobs(crc_df, 'SW', 'Supplied daily volume')
+    assert [j[0] for j in jobs] == ['CRC1_WAP1', 'CRC1_WAP2', 'CRC2_WAP1']
+
+    crc_wap, weights = consented.getConsentedWeights(make_weap(), crc_df, 'SW')
+    assert crc_wap == [j[0] for j in jobs]
+    #-each crc/wap is counted once in each sum it has a record for
+    np.testing.assert_allclose(weights, [[86.4, 86.4], [172.8, 0.], [0., 864.]])
+
+    config = configparser.RawConfigParser()
+    config.add_section('GENERAL')
+    config.set('GENERAL', 'resultsDir', str(tmpdir))
+    config.add_section('SW_TAKES')
+    config.set('SW_TAKES', 'sw_consented_csv', 'consented.csv')
+    active = pd.DataFrame({'CRC1_WAP1': [1, 1, 0], 'CRC1_WAP2': [1, 0, 0], 'CRC2_WAP1': [0, 1, 1]}, index=pd.date_range('2011-12-30', periods=3, freq='D', name='Date'))
+    consented.getConsented(None, config, 2011, 2012, '', 'SW', crc_df, active, weights=(crc_wap, weights))
+    df = pd.read_csv(str(tmpdir.join('consented.csv')), index_col=0)
+    #-l/s of the active crc/waps on each day
+    np.testing.assert_allclose(df['Sum in_sw_allo [l/s]'], [3., 1., 0.])
+    np.testing.assert_allclose(df['Sum not in_sw_allo [l/s]'], [1., 11., 10.])
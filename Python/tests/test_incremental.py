@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+
+import pandas as pd
+import datetime as dt
+
+from consents import incremental
+from consents.crctable import write_crc_table
+
+
+def test_previous_consents(tmpdir):
+    stamp_file = str(tmpdir.join('run_stamp.json'))
+    crc_csv = str(tmpdir.join('crcs.csv'))
+    permits = pd.DataFrame({'B1_ALT_ID': ['CRC1', 'CRC2'], 'fmDate': pd.to_datetime(['2001-01-01', '2002-01-01'])})
+    allo = pd.DataFrame({'RecordNumber': ['CRC1', 'CRC2'], 'MaxRate_ls': [10., None]})
+    values = [dt.date(2010, 1, 1), dt.date(2011, 12, 31), ['SWAZ1']]
+    h = incremental.frames_hash([permits, allo], values)
+    assert incremental.frames_hash([permits.copy(), allo.copy()], values) == h
+    #-a changed value, column, table, or period gives another hash
+    changed = allo.copy(); changed.loc[1, 'MaxRate_ls'] = 5.
+    assert incremental.frames_hash([permits, changed], values) != h
+    assert incremental.frames_hash([permits, allo.rename(columns={'MaxRate_ls': 'Rate'})], values) != h
+    assert incremental.frames_hash([permits], values) != h
+    assert incremental.frames_hash([permits, allo], values[1:]) != h
+
+    #-without a run stamp, or with another hash, the consent details are derived again
+    assert incremental.previous_consents(stamp_file, crc_csv, h) is None
+    crc_df = pd.DataFrame({'crc': ['CRC1', 'CRC2'], 'fmDate': ['01/01/2001', '01/01/2002'], 'wap': ['J38/0001', None], 'metered': [1., 0.],
+                           'metered_fmDate': ['01/01/2010', None], 'metered_toDate': ['31/12/2011', None]})
+    write_crc_table(crc_df, crc_csv)
+    incremental.write_run_stamp(stamp_file, values[0], values[1], values[2], h)
+    assert incremental.previous_consents(stamp_file, crc_csv, incremental.frames_hash([permits, changed], values)) is None
+    #-otherwise the previous consent table is returned without the metered columns
+    df = incremental.previous_consents(stamp_file, crc_csv, h)
+    assert list(df.columns) == ['crc', 'fmDate', 'wap']
+    assert list(df['fmDate']) == list(pd.to_datetime(['2001-01-01', '2002-01-01']))
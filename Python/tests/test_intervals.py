@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+
+import pandas as pd
+import numpy as np
+
+import extract
+from consents.activity import ConsentActivity, read_activity, interval_file
+from other_functions.intervals import DateIntervalIndex
+
+
+def make_intervals():
+    return pd.DataFrame({'fmDate': pd.to_datetime(['2010-03-15', '2009-01-01', '2011-01-01', None]),
+                         'toDate': pd.to_datetime(['2011-06-30', '2012-12-31', '2011-12-31', '2012-12-31']),
+                         'from_month': [1, 10, np.nan, 1], 'to_month': [12, 4, 6, 12]},
+                         index=pd.Index(['CRC1_W1', 'CRC2_W1', 'CRC3_W1', 'CRC4_W1'], name='Name'))
+
+
+def test_model_build_and_results_agree(tmpdir):
+    active_csv = str(tmpdir.join('crc_wap_active.csv'))
+    pd.DataFrame(columns=['Date']).to_csv(active_csv, index=False)
+    ConsentActivity(make_intervals()).write(interval_file(active_csv))
+
+    crc_wap = ['CRC2_W1', 'CRC1_W1', 'CRC3_W1', 'CRC4_W1']
+    dates, active = extract.getActive(extract.readActive(active_csv), 2010, 2011, crc_wap)
+    expected = read_activity(interval_file(active_csv)).matrix(dates, crc_wap)
+    assert (active == expected).all()
+
+    #-October up to and including April, between the dates, and never with a missing month or date
+    df = pd.DataFrame(active, index=dates, columns=crc_wap)
+    assert df['CRC2_W1'].groupby(dates.month).max().tolist() == [1, 1, 1, 1, 0, 0, 0, 0, 0, 1, 1, 1]
+    assert df.loc['2010-03-14', 'CRC1_W1'] == 0 and df.loc['2010-03-15', 'CRC1_W1'] == 1 and df.loc['2011-07-01', 'CRC1_W1'] == 0
+    assert df['CRC3_W1'].sum() == 0 and df['CRC4_W1'].sum() == 0
+
+
+def test_DateIntervalIndex():
+    rng = np.random.RandomState(3)
+    n = 300
+    fm = pd.Series(pd.Timestamp('2010-01-01') + pd.to_timedelta(rng.randint(0, 1000, n), 'D'))
+    to = fm + pd.to_timedelta(rng.randint(-30, 400, n), 'D')
+    fm[rng.rand(n) < 0.05] = pd.NaT
+    to[rng.rand(n) < 0.05] = pd.NaT
+    index = DateIntervalIndex(fm, to)
+    assert len(index) == n
+
+    #-compare with checking each record (NaT compares as False; toDate before fmDate is never active)
+    for s, e in [('2009-06-01', '2009-12-31'), ('2010-05-01', '2010-05-01'), ('2011-01-01', '2011-03-31'), ('2010-01-01', '2014-01-01'), ('2013-01-01', None)]:
+        s = pd.Timestamp(s)
+        e_ = s if e is None else pd.Timestamp(e)
+        expected = np.flatnonzero(((fm <= e_) & (to >= s) & (fm <= to)).values)
+        assert index.active(s, e).tolist() == expected.tolist()
+        assert index.count(s, e) == len(expected)
+    #-both ends are inclusive
+    index = DateIntervalIndex(['2010-01-01'], ['2010-01-31'])
+    assert index.active('2010-01-01').tolist() == [0] and index.active('2010-01-31').tolist() == [0]
+    assert index.active('2010-02-01').tolist() == [] and index.count('2009-12-01', '2009-12-31') == 0
@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+
+import pandas as pd
+
+from database import loader
+
+table = pd.DataFrame({'RecordNumber': ['CRC1', 'CRC2', 'CRC3', 'CRC3', 'CRC4', None],
+                      'B1_PER_ID3': ['P1', 'P2', 'P3', 'P3', 'P4', 'P5'],
+                      'Vol': [1., 2., 3., 3., 4., 5.]})
+
+
+def test_fetch_once_per_column(monkeypatch):
+    requests = []
+    def rd_sql(server, database, table_name, col_names=None, where_in=None, **kwargs):
+        #-fake database; only single-column filters, so the queries can be batched and cached
+        requests.append((where_in, kwargs))
+        assert len(where_in) == 1 and not kwargs
+        return table.loc[loader.filter_where_in(table, where_in), col_names].reset_index(drop=True)
+    monkeypatch.setattr(loader, 'rd_sql', rd_sql)
+
+    tables = loader.TableLoader()
+    tables.request('sql02prod', 'DataWarehouse', 'AssociatedPermits', col_names=['RecordNumber', 'Vol'], where_in={'RecordNumber': ['CRC1', 'crc3']})
+    tables.request('sql02prod', 'DataWarehouse', 'AssociatedPermits', col_names=['B1_PER_ID3', 'RecordNumber'], where_in={'B1_PER_ID3': ['P3', 'P4', 'P5']})
+
+    df = tables.rd_sql('sql02prod', 'DataWarehouse', 'AssociatedPermits', col_names=['B1_PER_ID3', 'RecordNumber'], where_in={'B1_PER_ID3': ['P3', 'P4', 'P5']})
+    #-the duplicate CRC3 rows of the table are kept, but only fetched once
+    assert df.fillna('NULL').values.tolist() == [['P3', 'CRC3'], ['P3', 'CRC3'], ['P4', 'CRC4'], ['P5', 'NULL']]
+    df = tables.rd_sql('sql02prod', 'DataWarehouse', 'AssociatedPermits', col_names=['RecordNumber', 'Vol'], where_in={'RecordNumber': ['CRC1', 'CRC3']})
+    assert df.values.tolist() == [['CRC1', 1.], ['CRC3', 3.], ['CRC3', 3.]]
+    assert len(requests) == 2
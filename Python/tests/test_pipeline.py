@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+
+import pandas as pd
+import numpy as np
+import pytest
+try:
+    import configparser
+except ImportError:
+    import ConfigParser as configparser
+
+import consented
+from extract import getCalendar
+from fakeweap import FakeWEAP
+
+
+def make_config(block_size):
+    config = configparser.RawConfigParser()
+    config.add_section('GENERAL')
+    config.set('GENERAL', 'block_size', str(block_size))
+    return config
+
+
+def jobs():
+    #-the duplicate crc/wap is only extracted once, and the groundwater take is left out
+    crc_df = pd.DataFrame({'crc': ['CRC3', 'CRC1', 'CRC2', 'CRC1', 'CRC3', 'CRC4'], 'wap_name_long': ['W1', 'W2', 'W1', 'W1', 'W1', 'W1'],
+                           'Activity': ['Take Surface Water'] * 5 + ['Take Groundwater']})
+    return consented.getConsentJobs(crc_df, 'SW', 'Supplied daily volume')
+
+
+def branch(crc, wap, variable='Supplied daily volume'):
+    return '\\Other Assumptions\\Consents\\%s\\%s\\%s' % (crc, wap, variable)
+
+
+def test_getConsentVariable(tmpdir):
+    WEAP = FakeWEAP()
+    outF = str(tmpdir.join('abstracted.csv'))
+    consented.getConsentVariable(WEAP, make_config(3), 2011, 2012, 'Reference', jobs(), None, outF)
+
+    df = pd.read_csv(outF, index_col=0, parse_dates=True)
+    assert list(df.columns) == ['CRC3_W1', 'CRC1_W2', 'CRC2_W1', 'CRC1_W1', 'Sum [l/s]']
+    dates, years, timesteps = getCalendar(2011, 2012)
+    assert (df.index == dates).all()
+    for c in df.columns[:-1]:
+        crc, wap = c.split('_')
+        expected = np.array([WEAP.value(branch(crc, wap), y, t) for y, t in zip(years, timesteps)]) / 86.4
+        np.testing.assert_allclose(df[c].values, expected)
+    np.testing.assert_allclose(df['Sum [l/s]'].values, df.iloc[:, :-1].sum(axis=1).values)
+    #-the temporary block files are removed
+    assert [p.basename for p in tmpdir.listdir()] == ['abstracted.csv']
+
+
+def test_error_on_com_thread(tmpdir):
+    WEAP = FakeWEAP(fail_branch=branch('CRC2', 'W1'))
+    outF = str(tmpdir.join('abstracted.csv'))
+    with pytest.raises(RuntimeError, match='ResultValue failed'):
+        consented.getConsentVariable(WEAP, make_config(1), 2011, 2011, 'Reference', jobs(), None, outF)
+    assert tmpdir.listdir() == []
+
+
+def test_error_on_worker_thread(tmpdir, monkeypatch):
+    def write(self, block_df):
+        raise IOError('disk full')
+    monkeypatch.setattr(consented.ColumnBlockWriter, 'write', write)
+    outF = str(tmpdir.join('abstracted.csv'))
+    with pytest.raises(IOError, match='disk full'):
+        consented.getConsentVariable(FakeWEAP(), make_config(2), 2011, 2011, 'Reference', jobs(), None, outF)
+    assert tmpdir.listdir() == []
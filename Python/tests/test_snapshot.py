@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+
+import pandas as pd
+import pytest, threading
+try:
+    import configparser
+except ImportError:
+    import ConfigParser as configparser
+
+from database import snapshot
+
+
+def make_config(tmpdir, offline, fixtures=None, ttl=None):
+    config = configparser.RawConfigParser()
+    config.add_section('DB_CACHE')
+    config.set('DB_CACHE', 'use_db_cache', '1')
+    config.set('DB_CACHE', 'db_cache_file', str(tmpdir.join('db_cache.sqlite')))
+    config.set('DB_CACHE', 'db_cache_offline', str(int(offline)))
+    if fixtures is not None:
+        config.set('DB_CACHE', 'db_cache_fixtures', fixtures)
+    if ttl is not None:
+        config.set('DB_CACHE', 'sql02prod.DataWarehouse.F_ACC_Permit', str(ttl))
+    return config
+
+
+@pytest.fixture
+def fixtures(tmpdir):
+    d = tmpdir.mkdir('fixtures')
+    pd.DataFrame({'B1_ALT_ID': ['CRC1', 'crc2 ', 'CRC3'], 'fmDate': ['2001-01-01', '2002-01-01', '2003-01-01']}).to_csv(
+        str(d.join('sql02prod.DataWarehouse.F_ACC_Permit.csv')), index=False)
+    return str(d)
+
+
+@pytest.fixture
+def database(monkeypatch):
+    '''
+    Fake database: records the requests and returns a table with three columns.
+    '''
+    requests = []
+    def rd_sql_db(server, database, table=None, col_names=None, where_in=None, **kwargs):
+        requests.append(col_names)
+        df = pd.DataFrame({'B1_ALT_ID': ['CRC1', 'CRC2'], 'fmDate': ['2001-01-01', '2002-01-01'], 'toDate': ['2010-01-01', '2011-01-01']})
+        return df if col_names is None else df[col_names]
+    monkeypatch.setattr(snapshot, 'rd_sql_db', rd_sql_db)
+    yield requests
+    snapshot.snapshot = None
+
+
+def test_offline_fixtures(tmpdir, fixtures, database):
+    snapshot.init_snapshot(make_config(tmpdir, True, fixtures))
+    df = snapshot.rd_sql('sql02prod', 'DataWarehouse', 'F_ACC_Permit', col_names=['B1_ALT_ID', 'fmDate'], where_in={'B1_ALT_ID': ['CRC2', 'crc3']})
+    assert list(df['B1_ALT_ID']) == ['crc2 ', 'CRC3']
+    #-columns that are not in the fixture, or all columns, are not available offline
+    with pytest.raises(ValueError):
+        snapshot.rd_sql('sql02prod', 'DataWarehouse', 'F_ACC_Permit', col_names=['B1_ALT_ID', 'toDate'])
+    with pytest.raises(ValueError):
+        snapshot.rd_sql('sql02prod', 'DataWarehouse', 'F_ACC_Permit')
+    assert database == []
+
+
+def test_seed_only_once(tmpdir, fixtures, database):
+    snapshot.init_snapshot(make_config(tmpdir, True, fixtures))
+    fetched = snapshot.snapshot.con.execute('SELECT fetched FROM snapshots').fetchone()[0]
+    snapshot.snapshot.con.close()
+    snapshot.init_snapshot(make_config(tmpdir, True, fixtures))
+    assert snapshot.snapshot.con.execute('SELECT fetched FROM snapshots').fetchone()[0] == fetched
+
+
+def test_all_columns(tmpdir, database):
+    snapshot.init_snapshot(make_config(tmpdir, False, ttl=24))
+    df = snapshot.rd_sql('sql02prod', 'DataWarehouse', 'F_ACC_Permit', col_names=['B1_ALT_ID'])
+    assert list(df.columns) == ['B1_ALT_ID']
+    #-the snapshot only has B1_ALT_ID, so all columns are fetched from the database
+    df = snapshot.rd_sql('sql02prod', 'DataWarehouse', 'F_ACC_Permit')
+    assert list(df.columns) == ['B1_ALT_ID', 'fmDate', 'toDate']
+    #-which are then served from the snapshot, for all columns and for a subset
+    df = snapshot.rd_sql('sql02prod', 'DataWarehouse', 'F_ACC_Permit')
+    assert list(df.columns) == ['B1_ALT_ID', 'fmDate', 'toDate']
+    df = snapshot.rd_sql('sql02prod', 'DataWarehouse', 'F_ACC_Permit', col_names=['toDate'], where_in={'B1_ALT_ID': ['crc2']})
+    assert list(df['toDate']) == ['2011-01-01']
+    assert database == [['B1_ALT_ID'], None]
+
+
+def test_key_strings():
+    #-B1_PER_ID3 read as numbers (with a missing value) in one table, and as strings in the other
+    numeric = pd.Series([123.0, None, 456.0])
+    strings = pd.DataFrame({'B1_PER_ID3': ['123', '789'], 'RecordNumberASIT': ['CRC1', 'CRC2']})
+    keys = snapshot.key_strings(numeric)
+    assert list(keys.dropna()) == ['123', '456'] and keys.isna()[1]
+    assert list(snapshot.key_strings(strings['B1_PER_ID3'])) == ['123', '789']
+    #-without the conversion, the numeric keys do not match any of the string keys
+    assert not snapshot.filter_where_in(strings, {'B1_PER_ID3': numeric.dropna().astype(str).tolist()}).any()
+    assert list(snapshot.filter_where_in(strings, {'B1_PER_ID3': keys.dropna().tolist()})) == [True, False]
+    #-and the other way around: string keys in a numeric column
+    df = pd.DataFrame({'B1_PER_ID3': numeric})
+    df['B1_PER_ID3'] = snapshot.key_strings(df['B1_PER_ID3'])
+    assert list(snapshot.filter_where_in(df, {'B1_PER_ID3': ['456']})) == [False, False, True]
+
+
+def test_fetch_does_not_block_other_tables(tmpdir, monkeypatch):
+    cache = snapshot.SnapshotCache(str(tmpdir.join('db_cache.sqlite')), {'sql02prod.DataWarehouse.F_ACC_Permit': 24, 'sql02prod.DataWarehouse.D_ACC_Act_Water_AssociatedPermits': 24})
+    fetching = threading.Event()
+    release = threading.Event()
+    def rd_sql_db(server, database, table=None, col_names=None, where_in=None, **kwargs):
+        #-the fetch of F_ACC_Permit is slow: it waits until it is released
+        if table == 'F_ACC_Permit':
+            fetching.set()
+            release.wait(10)
+        return pd.DataFrame({'B1_PER_ID3': ['1', '2']})
+    monkeypatch.setattr(snapshot, 'rd_sql_db', rd_sql_db)
+    slow = threading.Thread(target=cache.rd_sql, args=('sql02prod', 'DataWarehouse', 'F_ACC_Permit', ['B1_PER_ID3']))
+    slow.start()
+    assert fetching.wait(10)
+    #-another table is fetched and read while F_ACC_Permit is still being fetched
+    other = threading.Thread(target=cache.rd_sql, args=('sql02prod', 'DataWarehouse', 'D_ACC_Act_Water_AssociatedPermits', ['B1_PER_ID3']))
+    other.start()
+    other.join(5)
+    blocked = other.is_alive()
+    release.set()
+    slow.join(10)
+    other.join(10)
+    assert not blocked
+    assert len(cache.rd_sql('sql02prod', 'DataWarehouse', 'F_ACC_Permit', ['B1_PER_ID3'])) == 2
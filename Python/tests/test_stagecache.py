@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+
+import pandas as pd
+try:
+    import configparser
+except ImportError:
+    import ConfigParser as configparser
+
+from other_functions.stagecache import StageCache
+from other_functions.weapcsv import write_weap_csv_shards, manifest_file, read_manifest
+
+
+def test_shard_outputs(tmpdir):
+    csv_file = str(tmpdir.join('active.csv'))
+    df = pd.DataFrame({'A': [1, 0], 'B': [0, 1], 'C': [1, 1]}, index=pd.to_datetime(['2010-01-01', '2010-01-02']))
+    runs = []
+    def write():
+        runs.append(1)
+        write_weap_csv_shards(df, csv_file, 1)
+    def outputs():
+        manifest = read_manifest(csv_file)
+        return [manifest_file(csv_file)] + (manifest['files'] if manifest is not None else [])
+
+    stages = StageCache(str(tmpdir.join('stage_cache.json')), configparser.RawConfigParser())
+    assert stages.run('active', write, outputs=outputs)
+    assert not stages.run('active', write, outputs=outputs)
+    #-a changed shard is detected, although the manifest itself did not change
+    shard = read_manifest(csv_file)['files'][1]
+    with open(shard, 'a') as f:
+        f.write('03/01/2010,1\n')
+    assert stages.run('active', write, outputs=outputs)
+    assert len(runs) == 2
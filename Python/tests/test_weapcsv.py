@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+
+import pandas as pd
+import numpy as np
+
+from other_functions import weapcsv
+
+
+def test_format_dates_copy():
+    dates = pd.date_range('2010-01-01', periods=30, freq='D')
+    out = weapcsv.format_dates(dates)
+    out[0] = 'changed'
+    assert weapcsv.format_dates(dates)[0] == '01/01/2010'
+    #-the cache of daily periods is limited
+    for i in range(weapcsv.max_periods + 3):
+        weapcsv.format_dates(pd.date_range('2000-01-01', periods=10 + i, freq='D'))
+    assert len(weapcsv.formatted_periods) == weapcsv.max_periods
+
+
+def test_read_write(tmpdir):
+    df = pd.DataFrame({'A': [1, 0, 1], 'B': [0, 0, 1]}, index=pd.to_datetime(['2010-01-31', '2010-02-01', '2010-02-02']))
+    f = str(tmpdir.join('active.csv'))
+    weapcsv.write_weap_csv(df, f)
+    assert open(f).read().splitlines()[:2] == ['Date,A,B', '31/01/2010,1,0']
+    out = weapcsv.read_weap_csv(f)
+    assert (out.index == df.index).all() and out.index.name == 'Date'
+    assert (out.values == df.values).all()
+    #-missing dates are NaT
+    assert weapcsv.parse_dates(['01/02/2010', np.nan, '01/02/2010']).isnull().tolist() == [False, True, False]
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+
+import pandas as pd
+import numpy as np
+
+from weapresults import WeapResults
+from extract import getTimesteps
+from fakeweap import FakeWEAP
+
+
+class CountingWEAP(FakeWEAP):
+
+    BaseYear = 2011
+    EndYear = 2012
+
+    def __init__(self):
+        FakeWEAP.__init__(self, latency=0)
+        self.calls = 0
+
+    def ResultValue(self, branch, year, timestep, scenario):
+        self.calls += 1
+        return FakeWEAP.ResultValue(self, branch, year, timestep, scenario)
+
+
+def expected(WEAP, branch, dates):
+    years, timesteps = getTimesteps(dates)
+    return np.array([WEAP.value(branch, y, t) for y, t in zip(years, timesteps)])
+
+
+def test_periods():
+    WEAP = CountingWEAP()
+    res = WeapResults(None, 'Reference', WEAP=WEAP)
+    s = res['A', '2011-02-20':'2011-03']
+    dates = pd.date_range('2011-02-20', '2011-03-31', freq='D')
+    assert (s.index == dates).all() and s.name == 'A'
+    np.testing.assert_allclose(s.values, expected(WEAP, 'A', dates))
+    #-only February and March were fetched
+    assert WEAP.calls == 28 + 31
+    #-a single date string gives that day, month or year
+    assert len(res['A', '2011-03-05']) == 1 and len(res['A', '2012-02']) == 29 and len(res['A', '2012']) == 366
+    #-without a period the simulation period of the area
+    s = res['A']
+    assert s.index[0] == pd.Timestamp(2011, 1, 1) and s.index[-1] == pd.Timestamp(2012, 12, 31)
+    np.testing.assert_allclose(s.values, expected(WEAP, 'A', s.index))
+    assert len(res['A', pd.Timestamp(2011, 5, 2):pd.Timestamp(2011, 5, 1)]) == 0
+
+
+def test_cache():
+    WEAP = CountingWEAP()
+    res = WeapResults(None, 'Reference', WEAP=WEAP, max_months=2)
+    res['A', '2011-01':'2011-02']
+    calls = WEAP.calls
+    #-the same months are not fetched again
+    res['A', '2011-01-10':'2011-02-10']
+    assert WEAP.calls == calls
+    #-March pushes out January (the least recently used month)
+    res['A', '2011-03']
+    assert list(res.cache.keys()) == [('A', 2011, 2), ('A', 2011, 3)]
+    calls = WEAP.calls
+    res['A', '2011-01']
+    assert WEAP.calls == calls + 31
+    res.clear()
+    assert len(res.cache) == 0